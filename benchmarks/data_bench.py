@@ -0,0 +1,224 @@
+"""Микробенчмарки EmergencyData: поиск и рендеринг на исходных и увеличенных данных
+
+Запуск:
+    python -m benchmarks.data_bench
+    python -m benchmarks.data_bench --scales 1 10 100 --iterations 500 --output data_bench.json
+    python -m benchmarks.data_bench --baseline data_bench.json --max-regression 0.25
+    python -m benchmarks.data_bench --thresholds thresholds.json
+
+Файл порогов - JSON вида {"search_in_database@100": 2500, ...} (мкс на вызов, p95).
+При превышении порога или допустимой регрессии относительно --baseline
+процесс завершается с кодом 1.
+"""
+import argparse
+import copy
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+from benchmarks.harness import PROJECT_ROOT, latency_summary
+
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from data.emergency_data import EmergencyData
+
+# Словари EmergencyData, которые увеличиваются синтетически
+SCALED_SECTIONS = ("drugs", "poisons", "criminal_code", "admin_code")
+
+
+def build_data(scale: int, seed: int) -> EmergencyData:
+    """EmergencyData с каждой секцией, увеличенной в scale раз
+
+    Копии записей получают уникальные ключи и слегка измененные значения,
+    чтобы поиск и рендеринг работали с реалистичным объемом текста.
+    Номера синтетических статей лежат выше максимального реального
+    номера ("228.1" -> "1228.1", "2228.1", ...) и не пересекаются с ним.
+    """
+    data = EmergencyData()
+    if scale <= 1:
+        return data
+    rng = random.Random(seed)
+    for section in SCALED_SECTIONS:
+        original = getattr(data, section)
+        enlarged = dict(original)
+        items = list(original.items())
+        if section in ("criminal_code", "admin_code"):
+            max_number = max(int(key.split(".")[0]) for key in original)
+            offset = (max_number // 1000 + 1) * 1000
+        for copy_index in range(1, scale):
+            for key, value in items:
+                entry = copy.deepcopy(value)
+                if "dose_per_kg" in entry:
+                    entry["dose_per_kg"] = round(entry["dose_per_kg"] * rng.uniform(0.5, 1.5), 4)
+                if section in ("criminal_code", "admin_code"):
+                    number, dot, rest = key.partition(".")
+                    new_key = f"{int(number) + offset * copy_index}{dot}{rest}"
+                else:
+                    new_key = f"{key} {copy_index}"
+                enlarged[new_key] = entry
+        setattr(data, section, enlarged)
+    # Синтетические статьи должны попасть в индексы номеров, иначе поиск их не найдет
+    data.rebuild_indexes()
+    return data
+
+
+def build_cases(data: EmergencyData, rng: random.Random):
+    """Набор измеряемых вызовов: имя -> функция без аргументов"""
+    drugs = list(data.drugs)
+    poisons = list(data.poisons)
+    articles = list(data.criminal_code)
+    queries = ["шок", "судороги", "отравление", "кража", "оружие", "наркотических", "пожар", "несуществующее"]
+    search_results = data.search_in_database("шок")
+
+    return {
+        "calculate_dose": lambda: data.calculate_dose(rng.choice(drugs), rng.randint(5, 120)),
+        "calculate_dose_miss": lambda: data.calculate_dose("несуществующее", 70),
+        "get_poison_info": lambda: data.get_poison_info(rng.choice(poisons)),
+        "get_criminal_article": lambda: data.get_criminal_article(rng.choice(articles)),
+        "search_in_database": lambda: data.search_in_database(rng.choice(queries)),
+        "format_search_results": lambda: data.format_search_results(search_results, "шок"),
+        "get_all_drugs": data.get_all_drugs,
+        "get_all_poisons": data.get_all_poisons,
+        "get_all_criminal_articles": data.get_all_criminal_articles,
+        "get_all_admin_articles": data.get_all_admin_articles,
+        "get_all_fire_classes": data.get_all_fire_classes,
+    }
+
+
+def measure_latency(func, iterations: int, warmup: int):
+    """Время каждого вызова (секунды)"""
+    for _ in range(warmup):
+        func()
+    timings = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(iterations):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return timings
+
+
+def measure_allocations(func, iterations: int):
+    """Выделения памяти на вызов: пик и оставшиеся после вызова байты"""
+    tracemalloc.start()
+    try:
+        func()
+        baseline_current, _ = tracemalloc.get_traced_memory()
+        peak_total = 0
+        for _ in range(iterations):
+            tracemalloc.reset_peak()
+            func()
+            _, peak = tracemalloc.get_traced_memory()
+            peak_total += max(0, peak - baseline_current)
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "peak_bytes_per_call": round(peak_total / iterations),
+        "retained_bytes_per_call": round(max(0, current - baseline_current) / iterations)
+    }
+
+
+def run(args):
+    results = []
+    for scale in args.scales:
+        data = build_data(scale, args.seed)
+        sizes = {section: len(getattr(data, section)) for section in SCALED_SECTIONS}
+        cases = build_cases(data, random.Random(args.seed))
+        for name, func in cases.items():
+            if args.only and name not in args.only:
+                continue
+            timings = measure_latency(func, args.iterations, args.warmup)
+            summary = latency_summary(timings)
+            result_text = func()
+            results.append({
+                "name": name,
+                "scale": scale,
+                "key": f"{name}@{scale}",
+                "dataset": sizes,
+                "iterations": args.iterations,
+                "latency_us": {key.replace("_ms", "_us"): round(value * 1000, 2) for key, value in summary.items()},
+                "allocations": measure_allocations(func, args.alloc_iterations),
+                "output_size": len(result_text or "")
+            })
+    return results
+
+
+def check_regressions(results, thresholds: dict, baseline: dict, max_regression: float):
+    """Список нарушений порогов и регрессий относительно базового отчета"""
+    violations = []
+    baseline_p95 = {}
+    if baseline:
+        baseline_p95 = {item["key"]: item["latency_us"]["p95_us"] for item in baseline.get("results", [])}
+    for item in results:
+        p95 = item["latency_us"]["p95_us"]
+        limit = thresholds.get(item["key"])
+        if limit is not None and p95 > limit:
+            violations.append(f"{item['key']}: p95 {p95} мкс > порога {limit} мкс")
+        previous = baseline_p95.get(item["key"])
+        if previous and p95 > previous * (1 + max_regression):
+            violations.append(f"{item['key']}: p95 {p95} мкс, было {previous} мкс (+{(p95 / previous - 1) * 100:.0f}%)")
+    return violations
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Микробенчмарки EmergencyData")
+    parser.add_argument("--scales", nargs="+", type=int, default=[1, 10, 100], help="множители размера данных")
+    parser.add_argument("--iterations", type=int, default=300, help="измерений времени на случай")
+    parser.add_argument("--alloc-iterations", type=int, default=50, help="измерений памяти на случай")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--only", nargs="+", default=None, help="запустить только указанные случаи")
+    parser.add_argument("--seed", type=int, default=112)
+    parser.add_argument("--thresholds", default=None, help="JSON с порогами p95 (мкс) по ключу name@scale")
+    parser.add_argument("--baseline", default=None, help="прошлый отчет для сравнения")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="допустимый рост p95 относительно baseline")
+    parser.add_argument("--output", default=None, help="файл для JSON результата")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    thresholds = {}
+    if args.thresholds:
+        with open(args.thresholds, encoding="utf-8") as f:
+            thresholds = json.load(f)
+    baseline = None
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    results = run(args)
+    violations = check_regressions(results, thresholds, baseline, args.max_regression)
+    report = {
+        "benchmark": "data_bench",
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "config": {"scales": args.scales, "iterations": args.iterations, "seed": args.seed},
+        "results": results,
+        "violations": violations
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        sys.stdout.write(text + "\n")
+    for violation in violations:
+        sys.stderr.write(f"❌ {violation}\n")
+    return 1 if violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
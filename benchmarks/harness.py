@@ -0,0 +1,211 @@
+"""Общие части нагрузочных тестов: бот с заглушкой Telegram API и настройка хранилищ"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from aiogram.client.session.base import BaseSession
+from aiogram.types import Chat, Message, Update
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# Токен в формате Telegram, реальные запросы не выполняются
+FAKE_BOT_TOKEN = "123456789:AAFakeTokenForLoadTestingOnly_000000"
+
+BACKENDS = ("text", "json", "mongo")
+
+
+class FakeSession(BaseSession):
+    """Сессия, отвечающая на методы Bot API без сети
+
+    api_latency - искусственная задержка ответа Telegram (секунды)
+    """
+
+    def __init__(self, api_latency: float = 0.0):
+        super().__init__()
+        self.api_latency = api_latency
+        self.requests = 0
+        self._message_id = 0
+
+    async def make_request(self, bot, method, timeout=None):
+        self.requests += 1
+        if self.api_latency:
+            await asyncio.sleep(self.api_latency)
+        if method.__returning__ is Message:
+            self._message_id += 1
+            chat_id = getattr(method, "chat_id", None) or 0
+            return Message(
+                message_id=getattr(method, "message_id", None) or self._message_id,
+                date=int(time.time()),
+                chat=Chat(id=chat_id if isinstance(chat_id, int) else 0, type="private"),
+                text=getattr(method, "text", None)
+            ).as_(bot)
+        return True
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def close(self):
+        pass
+
+
+def load_bot(workdir: str = None, api_latency: float = 0.0, respect_rate_limit: bool = False):
+    """Импорт main.py с заглушкой Telegram API
+
+    Рабочая директория (хранилища users.txt/local_users.json, logs/, data/state)
+    переносится во временную папку, чтобы тест не трогал данные бота.
+    """
+    workdir = workdir or tempfile.mkdtemp(prefix="112help-bench-")
+    os.chdir(workdir)
+    os.environ.setdefault("STATE_DIR", os.path.join(workdir, "state"))
+    os.environ.setdefault("BOT_TOKEN", FAKE_BOT_TOKEN)
+    # Медленные апдейты под нагрузкой ожидаемы, не засоряем вывод
+    os.environ.setdefault("SLOW_UPDATE_THRESHOLD_MS", "60000")
+    # Лимиты отправки Telegram ограничили бы пропускную способность заглушки
+    if not respect_rate_limit:
+        os.environ.setdefault("SEND_QUEUE_ENABLED", "false")
+    if str(PROJECT_ROOT) not in sys.path:
+        sys.path.insert(0, str(PROJECT_ROOT))
+
+    import main
+
+    session = FakeSession(api_latency)
+    # Middleware сессии (трассировка, очередь отправки) переносятся в заглушку
+    session.middleware = main.bot.session.middleware
+    main.bot.session = session
+    if not respect_rate_limit:
+        main.MAX_REQUESTS_PER_MINUTE = 10 ** 9
+    return main
+
+
+def reset_state(main):
+    """Сброс состояния процесса между прогонами на разных хранилищах
+
+    Без сброса второй прогон попадал бы в кэш экранов и статистики
+    первого и получал бы другое число запросов к Telegram API.
+    """
+    from utils.screens import screen_cache
+
+    main.user_requests.clear()
+    main.banned_users.clear()
+    screen_cache.clear()
+    main.activity_series.clear()
+    main.user_stats.clear()
+    main.overload_guard.degraded = False
+    main.overload_guard._healthy_since = None
+
+
+async def configure_backend(main, backend: str, mongodb_url: str = None):
+    """Переключение хранилища пользователей: text, json или mongo"""
+    database = main.Database
+    database.connected = False
+    database.text_storage_file = os.path.abspath("users.txt")
+    database.local_storage_file = os.path.abspath("local_users.json")
+    for path in (database.text_storage_file, database.local_storage_file):
+        if os.path.exists(path):
+            os.remove(path)
+
+    if backend == "text":
+        database.use_mongodb = False
+    elif backend == "json":
+        database.use_mongodb = True
+    elif backend == "mongo":
+        from motor.motor_asyncio import AsyncIOMotorClient
+        database.use_mongodb = True
+        mongodb_url = mongodb_url or os.getenv("MONGODB_URL", "")
+        if not mongodb_url or mongodb_url.lower() == "disabled":
+            mongodb_url = "mongodb://localhost:27017"
+        database.client = AsyncIOMotorClient(mongodb_url, serverSelectionTimeoutMS=3000)
+        await database.client.admin.command("ping")
+        database.db = database.client["112help_loadtest"]
+        await database.db.users.drop()
+        await database.db.users.create_index("user_id")
+        database.connected = True
+    else:
+        raise ValueError(f"Неизвестное хранилище: {backend}")
+    return database.storage_type()
+
+
+async def cleanup_backend(main, backend: str):
+    """Удаление тестовых данных после прогона"""
+    if backend == "mongo" and main.Database.connected:
+        await main.Database.db.users.drop()
+        main.Database.client.close()
+        main.Database.connected = False
+
+
+def message_update(update_id: int, user_id: int, text: str, chat_id: int = None,
+                   chat_type: str = "private") -> Update:
+    """Синтетический апдейт с текстовым сообщением"""
+    return Update(update_id=update_id, message={
+        "message_id": update_id,
+        "date": int(time.time()),
+        "chat": {"id": chat_id or user_id, "type": chat_type},
+        "from": {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"},
+        "text": text
+    })
+
+
+def callback_update(update_id: int, user_id: int, data: str, chat_id: int = None,
+                    chat_type: str = "private") -> Update:
+    """Синтетический апдейт с нажатием inline-кнопки"""
+    return Update(update_id=update_id, callback_query={
+        "id": str(update_id),
+        "from": {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"},
+        "chat_instance": str(user_id),
+        "data": data,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id or user_id, "type": chat_type},
+            "text": "menu"
+        }
+    })
+
+
+def percentile(sorted_values, fraction: float) -> float:
+    """Перцентиль по отсортированному списку (ближайший ранг)"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def latency_summary(latencies) -> dict:
+    """p50/p95/p99/max в миллисекундах"""
+    values = sorted(latencies)
+    return {
+        "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(values, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3) if values else 0.0,
+        "mean_ms": round(sum(values) / len(values) * 1000, 3) if values else 0.0
+    }
+
+
+def storage_snapshot(backend_name: str) -> dict:
+    """Суммарное время и число операций хранилища из метрик"""
+    from utils.metrics import storage_duration
+    snapshot = {}
+    for operation in ("get_user", "create_user", "update_activity", "get_user_stats"):
+        total, count = storage_duration.snapshot(backend_name, operation)
+        snapshot[operation] = (total, count)
+    return snapshot
+
+
+def storage_delta(before: dict, after: dict) -> dict:
+    """Разница снимков хранилища: количество, общее и среднее время"""
+    result = {}
+    for operation, (total_after, count_after) in after.items():
+        total_before, count_before = before.get(operation, (0.0, 0))
+        count = count_after - count_before
+        total = total_after - total_before
+        if count:
+            result[operation] = {
+                "count": count,
+                "total_ms": round(total * 1000, 3),
+                "mean_ms": round(total / count * 1000, 4)
+            }
+    return result
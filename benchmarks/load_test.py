@@ -0,0 +1,151 @@
+"""Нагрузочный тест: реальный Dispatcher из main.py + синтетические апдейты
+
+Запуск:
+    python -m benchmarks.load_test --users 200 --updates 5000 --backends text json
+    python -m benchmarks.load_test --backends mongo --mongodb-url mongodb://localhost:27017
+
+Результат печатается в stdout (или в --output) в виде JSON.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime
+
+from benchmarks.harness import (
+    BACKENDS, callback_update, cleanup_backend, configure_backend, latency_summary,
+    load_bot, message_update, reset_state, storage_delta, storage_snapshot
+)
+
+# Смесь трафика: (вес, генератор текста команды или callback_data)
+DOSE_DRUGS = ["адреналин", "атропин", "морфин", "налоксон", "диазепам", "амиодарон"]
+POISONS = ["метанол", "угарный газ", "фос", "цианиды", "парацетамол", "мышьяк"]
+ARTICLES = ["105", "158", "161", "228", "228.1", "264", "318"]
+MENU_CALLBACKS = ["med", "fire", "police", "rescue", "med_dose", "med_poison",
+                  "med_resus", "police_criminal", "police_admin", "pg:law:1", "pg:dose:1",
+                  "contacts", "back"]
+
+TRAFFIC_MIX = (
+    (30, "message", lambda rng: f"/dose {rng.choice(DOSE_DRUGS)} {rng.randint(5, 120)}"),
+    (25, "message", lambda rng: f"/poison {rng.choice(POISONS)}"),
+    (15, "message", lambda rng: f"/law {rng.choice(ARTICLES)}"),
+    (30, "callback", lambda rng: rng.choice(MENU_CALLBACKS)),
+)
+
+
+def build_traffic(updates: int, users: int, seed: int):
+    """Детерминированная последовательность (тип, user_id, payload)"""
+    rng = random.Random(seed)
+    weights = [weight for weight, _, _ in TRAFFIC_MIX]
+    traffic = []
+    for _ in range(updates):
+        _, kind, make_payload = rng.choices(TRAFFIC_MIX, weights=weights)[0]
+        traffic.append((kind, rng.randint(1, users), make_payload(rng)))
+    return traffic
+
+
+async def run_backend(main, backend: str, traffic, concurrency: int, mongodb_url: str = None):
+    """Прогон трафика через dp.feed_update на одном хранилище"""
+    backend_name = await configure_backend(main, backend, mongodb_url)
+    reset_state(main)
+
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def feed(update):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await main.dp.feed_update(main.bot, update)
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    updates = [
+        message_update(index, user_id, payload) if kind == "message" else callback_update(index, user_id, payload)
+        for index, (kind, user_id, payload) in enumerate(traffic, 1)
+    ]
+
+    storage_before = storage_snapshot(backend_name)
+    api_requests_before = main.bot.session.requests
+    started = time.perf_counter()
+    await asyncio.gather(*(feed(update) for update in updates))
+    elapsed = time.perf_counter() - started
+    storage_after = storage_snapshot(backend_name)
+
+    await cleanup_backend(main, backend)
+
+    return {
+        "backend": backend_name,
+        "updates": len(updates),
+        "errors": errors,
+        "duration_s": round(elapsed, 4),
+        "throughput_ups": round(len(updates) / elapsed, 2) if elapsed else 0.0,
+        "latency": latency_summary(latencies),
+        "storage": storage_delta(storage_before, storage_after),
+        "api_requests": main.bot.session.requests - api_requests_before
+    }
+
+
+async def run(args):
+    main = load_bot(api_latency=args.api_latency_ms / 1000, respect_rate_limit=args.respect_rate_limit)
+    traffic = build_traffic(args.updates, args.users, args.seed)
+
+    results = []
+    for backend in args.backends:
+        try:
+            results.append(await run_backend(main, backend, traffic, args.concurrency, args.mongodb_url))
+        except Exception as e:
+            results.append({"backend": backend, "error": str(e)})
+
+    return {
+        "benchmark": "load_test",
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "config": {
+            "users": args.users,
+            "updates": args.updates,
+            "concurrency": args.concurrency,
+            "api_latency_ms": args.api_latency_ms,
+            "seed": args.seed,
+            "respect_rate_limit": args.respect_rate_limit
+        },
+        "results": results
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Нагрузочный тест диспетчера 112help")
+    parser.add_argument("--users", type=int, default=100, help="число симулируемых пользователей")
+    parser.add_argument("--updates", type=int, default=2000, help="число апдейтов на хранилище")
+    parser.add_argument("--concurrency", type=int, default=50, help="одновременно обрабатываемых апдейтов")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=["text", "json"])
+    parser.add_argument("--mongodb-url", default=None, help="MongoDB для бэкенда mongo (по умолчанию MONGODB_URL)")
+    parser.add_argument("--api-latency-ms", type=float, default=0.0, help="задержка ответа заглушки Telegram API")
+    parser.add_argument("--respect-rate-limit", action="store_true", help="не отключать антиспам и лимиты отправки")
+    parser.add_argument("--seed", type=int, default=112)
+    parser.add_argument("--output", default=None, help="файл для JSON результата")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.output:
+        args.output = os.path.abspath(args.output)
+    report = asyncio.run(run(args))
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        sys.stdout.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""Генератор синтетической базы пользователей в форматах хранилищ бота
+
+Запуск:
+    python -m benchmarks.populate_users --users 100000 --backends text json --output-dir /tmp/pop
+    python -m benchmarks.populate_users --users 1000000 --backends mongo --mongodb-url mongodb://localhost:27017
+
+Активность распределена неравномерно (закон Ципфа): небольшая доля
+пользователей дает большую часть команд и заходила недавно, основная
+масса зарегистрировалась давно и почти не пользуется ботом.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+# user_id синтетических пользователей начинаются отсюда (ранг 1 - самый активный)
+BASE_USER_ID = 100_000_000
+# Показатель степени распределения активности
+ZIPF_EXPONENT = 1.1
+MAX_COMMANDS = 50_000
+BLOCKED_SHARE = 0.005
+MONGO_BATCH = 10_000
+
+FIRST_NAMES = ["Алексей", "Мария", "Иван", "Ольга", "Дмитрий", "Анна", "Сергей", "Елена", "Павел", "Наталья"]
+LAST_NAMES = ["Иванов", "Смирнова", "Кузнецов", "Попова", "Соколов", "Лебедева", "Новиков", None, None, None]
+
+
+def user_id_for_rank(rank: int) -> int:
+    """user_id пользователя с заданным рангом активности (1..N)"""
+    return BASE_USER_ID + rank
+
+
+def zipf_rank(rng: random.Random, count: int, exponent: float = ZIPF_EXPONENT) -> int:
+    """Случайный ранг 1..count, чаще выпадают самые активные пользователи"""
+    # Хвост Ципфа с показателем s - распределение Парето с alpha = s - 1
+    alpha = max(exponent - 1, 0.1)
+    while True:
+        rank = int(rng.paretovariate(alpha))
+        if 1 <= rank <= count:
+            return rank
+
+
+def generate_users(count: int, seed: int = 112, now: datetime = None):
+    """Пользователи в порядке ранга активности (генератор, без списка в памяти)"""
+    rng = random.Random(seed)
+    now = now or datetime.now()
+    for rank in range(1, count + 1):
+        command_count = max(0, int(MAX_COMMANDS / rank ** ZIPF_EXPONENT * rng.uniform(0.5, 1.5)))
+        # Активные пользователи заходили недавно, неактивные - давно
+        idle_days = min(720.0, rng.expovariate(1.0) * (1 + 200 * (1 - 1 / (1 + rank / 1000))))
+        last_activity = now - timedelta(days=idle_days, seconds=rng.randint(0, 86_399))
+        registration_date = last_activity - timedelta(days=rng.uniform(0, 365))
+        first_name = rng.choice(FIRST_NAMES)
+        yield {
+            "_id": user_id_for_rank(rank),
+            "user_id": user_id_for_rank(rank),
+            "username": f"user{rank}" if rng.random() < 0.7 else None,
+            "first_name": first_name,
+            "last_name": rng.choice(LAST_NAMES),
+            "registration_date": registration_date,
+            "is_blocked": rng.random() < BLOCKED_SHARE,
+            "last_activity": last_activity,
+            "command_count": command_count,
+            "warnings_count": 0
+        }
+
+
+def write_text(path: str, users) -> int:
+    """Запись в формате users.txt (как Database._save_text_storage)"""
+    written = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for user_data in users:
+            f.write(
+                f"{user_data['user_id']}|{user_data.get('username', 'None')}|{user_data.get('first_name', 'None')}"
+                f"|{user_data.get('last_name', 'None')}|{user_data['registration_date'].isoformat()}"
+                f"|{user_data['last_activity'].isoformat()}|{user_data.get('command_count', 0)}"
+                f"|{user_data.get('is_blocked', False)}\n"
+            )
+            written += 1
+    return written
+
+
+def write_json(path: str, users) -> int:
+    """Запись в формате local_users.json (как Database._save_local_storage) без сборки словаря в памяти"""
+    written = 0
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("{")
+        for user_data in users:
+            record = dict(user_data)
+            record["registration_date"] = record["registration_date"].isoformat()
+            record["last_activity"] = record["last_activity"].isoformat()
+            body = json.dumps(record, ensure_ascii=False, indent=2).replace("\n", "\n  ")
+            f.write(f"{',' if written else ''}\n  \"{user_data['user_id']}\": {body}")
+            written += 1
+        f.write("\n}" if written else "}")
+    return written
+
+
+async def write_mongo(collection, users, batch_size: int = MONGO_BATCH) -> int:
+    """Вставка в коллекцию users пачками"""
+    written = 0
+    batch = []
+    for user_data in users:
+        batch.append(user_data)
+        if len(batch) >= batch_size:
+            await collection.insert_many(batch, ordered=False)
+            written += len(batch)
+            batch = []
+    if batch:
+        await collection.insert_many(batch, ordered=False)
+        written += len(batch)
+    return written
+
+
+async def populate_mongo(mongodb_url: str, database_name: str, count: int, seed: int) -> int:
+    """Пересоздание коллекции users в отдельной базе и заполнение"""
+    from motor.motor_asyncio import AsyncIOMotorClient
+    client = AsyncIOMotorClient(mongodb_url, serverSelectionTimeoutMS=3000)
+    try:
+        await client.admin.command("ping")
+        collection = client[database_name].users
+        await collection.drop()
+        written = await write_mongo(collection, generate_users(count, seed))
+        await collection.create_index("user_id")
+        return written
+    finally:
+        client.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Генерация синтетических пользователей 112help")
+    parser.add_argument("--users", type=int, default=10_000, help="размер популяции (10k - 5M)")
+    parser.add_argument("--backends", nargs="+", choices=("text", "json", "mongo"), default=["text", "json"])
+    parser.add_argument("--output-dir", default=".", help="куда писать users.txt и local_users.json")
+    parser.add_argument("--mongodb-url", default="mongodb://localhost:27017")
+    parser.add_argument("--database", default="112help_loadtest", help="база для бэкенда mongo")
+    parser.add_argument("--seed", type=int, default=112)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    os.makedirs(args.output_dir, exist_ok=True)
+    for backend in args.backends:
+        started = time.perf_counter()
+        if backend == "text":
+            path = os.path.join(args.output_dir, "users.txt")
+            written = write_text(path, generate_users(args.users, args.seed))
+        elif backend == "json":
+            path = os.path.join(args.output_dir, "local_users.json")
+            written = write_json(path, generate_users(args.users, args.seed))
+        else:
+            path = f"{args.mongodb_url}/{args.database}"
+            written = asyncio.run(populate_mongo(args.mongodb_url, args.database, args.users, args.seed))
+        elapsed = time.perf_counter() - started
+        size = os.path.getsize(path) if backend != "mongo" else 0
+        size_text = f", {size / 1024 / 1024:.1f} МБ" if size else ""
+        sys.stdout.write(f"✅ {backend}: {written} пользователей -> {path} за {elapsed:.1f}с{size_text}\n")
+
+
+if __name__ == "__main__":
+    main()
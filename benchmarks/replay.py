@@ -0,0 +1,176 @@
+"""Воспроизведение записанного трафика (UPDATE_CAPTURE_FILE) через реальный Dispatcher
+
+Запуск:
+    python -m benchmarks.replay logs/updates.jsonl                  # в исходном темпе
+    python -m benchmarks.replay logs/updates.jsonl --speed 10       # в 10 раз быстрее
+    python -m benchmarks.replay logs/updates.jsonl --speed 0        # максимально быстро
+    python -m benchmarks.replay logs/updates.jsonl --backends text json --limit 50000
+
+Telegram API заменен заглушкой из harness.py. Результат - JSON с
+распределением задержек в целом и по командам, а также с опозданием
+старта апдейтов относительно расписания (признак перегрузки event loop).
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from benchmarks.harness import (
+    BACKENDS, callback_update, cleanup_backend, configure_backend, latency_summary,
+    load_bot, message_update, reset_state, storage_delta, storage_snapshot
+)
+
+
+def load_capture(path: str, limit: int = None):
+    """Чтение записи: список (смещение от начала в секундах, запись)"""
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line_num, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                sys.stderr.write(f"⚠️ Пропущена строка {line_num}: не JSON\n")
+                continue
+            if entry.get("kind") in ("message", "callback_query") and entry.get("user"):
+                entries.append(entry)
+            if limit and len(entries) >= limit:
+                break
+    entries.sort(key=lambda entry: entry["t"])
+    start = entries[0]["t"] if entries else 0
+    return [(entry["t"] - start, entry) for entry in entries]
+
+
+def build_update(update_id: int, entry: dict):
+    """Апдейт aiogram из записи захвата"""
+    chat_id = entry.get("chat") or entry["user"]
+    chat_type = entry.get("chat_type") or "private"
+    if entry["kind"] == "message":
+        return message_update(update_id, entry["user"], entry.get("text") or "", chat_id, chat_type)
+    return callback_update(update_id, entry["user"], entry.get("data") or "", chat_id, chat_type)
+
+
+async def replay_backend(main, backend: str, capture, speed: float, mongodb_url: str = None):
+    """Подача записи в dp.feed_update по расписанию на одном хранилище"""
+    backend_name = await configure_backend(main, backend, mongodb_url)
+    reset_state(main)
+
+    updates = [(offset, build_update(index, entry)) for index, (offset, entry) in enumerate(capture, 1)]
+    latencies = []
+    lateness = []
+    by_name = defaultdict(list)
+    errors = 0
+
+    async def feed(update, scheduled):
+        nonlocal errors
+        started = time.perf_counter()
+        if scheduled is not None:
+            lateness.append(max(0.0, started - scheduled))
+        try:
+            await main.dp.feed_update(main.bot, update)
+        except Exception:
+            errors += 1
+        elapsed = time.perf_counter() - started
+        latencies.append(elapsed)
+        by_name[main.get_update_name(update)].append(elapsed)
+
+    storage_before = storage_snapshot(backend_name)
+    api_requests_before = main.bot.session.requests
+    started = time.perf_counter()
+    tasks = []
+    for offset, update in updates:
+        scheduled = None
+        if speed > 0:
+            scheduled = started + offset / speed
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(feed(update, scheduled)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    storage_after = storage_snapshot(backend_name)
+
+    await cleanup_backend(main, backend)
+
+    return {
+        "backend": backend_name,
+        "updates": len(updates),
+        "errors": errors,
+        "duration_s": round(elapsed, 4),
+        "throughput_ups": round(len(updates) / elapsed, 2) if elapsed else 0.0,
+        "latency": latency_summary(latencies),
+        "start_lateness": latency_summary(lateness) if lateness else None,
+        "by_update": {
+            name: dict(count=len(values), **latency_summary(values))
+            for name, values in sorted(by_name.items(), key=lambda item: -len(item[1]))
+        },
+        "storage": storage_delta(storage_before, storage_after),
+        "api_requests": main.bot.session.requests - api_requests_before
+    }
+
+
+async def run(args):
+    capture = load_capture(args.capture, args.limit)
+    if not capture:
+        raise SystemExit(f"В {args.capture} нет апдейтов для воспроизведения")
+    main = load_bot(api_latency=args.api_latency_ms / 1000, respect_rate_limit=args.respect_rate_limit)
+
+    results = []
+    for backend in args.backends:
+        try:
+            results.append(await replay_backend(main, backend, capture, args.speed, args.mongodb_url))
+        except Exception as e:
+            results.append({"backend": backend, "error": str(e)})
+
+    return {
+        "benchmark": "replay",
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "config": {
+            "capture": args.capture,
+            "updates": len(capture),
+            "captured_span_s": round(capture[-1][0], 3),
+            "speed": args.speed,
+            "api_latency_ms": args.api_latency_ms,
+            "respect_rate_limit": args.respect_rate_limit
+        },
+        "results": results
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Воспроизведение записанных апдейтов 112help")
+    parser.add_argument("capture", help="JSONL файл, записанный с UPDATE_CAPTURE_FILE")
+    parser.add_argument("--speed", type=float, default=1.0, help="множитель темпа; 0 - без пауз")
+    parser.add_argument("--limit", type=int, default=None, help="воспроизвести только первые N апдейтов")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=["text"])
+    parser.add_argument("--mongodb-url", default=None, help="MongoDB для бэкенда mongo (по умолчанию MONGODB_URL)")
+    parser.add_argument("--api-latency-ms", type=float, default=0.0, help="задержка ответа заглушки Telegram API")
+    parser.add_argument("--respect-rate-limit", action="store_true", help="не отключать антиспам и лимиты отправки")
+    parser.add_argument("--output", default=None, help="файл для JSON результата")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    args.capture = os.path.abspath(args.capture)
+    if args.output:
+        args.output = os.path.abspath(args.output)
+    report = asyncio.run(run(args))
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        sys.stdout.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
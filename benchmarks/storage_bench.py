@@ -0,0 +1,231 @@
+"""Бенчмарк хранилищ пользователей на синтетических популяциях
+
+Запуск:
+    python -m benchmarks.storage_bench --sizes 10000 100000 --backends text json
+    python -m benchmarks.storage_bench --sizes 1000000 5000000 --backends mongo --mongodb-url mongodb://localhost:27017
+
+Каждая пара (размер, хранилище) выполняется в отдельном процессе, чтобы
+пик памяти (ru_maxrss) относился только к ней. Для каждой операции
+(get_user, update_activity, create_user, get_user_stats) измеряются:
+задержка, пик выделений Python (tracemalloc) и байты, записанные
+процессом (/proc/self/io wchar). Для mongo wchar учитывает только
+клиентскую сторону, запись на сервере не видна.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from benchmarks.harness import PROJECT_ROOT, cleanup_backend, configure_backend, latency_summary
+from benchmarks.populate_users import (
+    generate_users, populate_mongo, user_id_for_rank, write_json, write_text, zipf_rank
+)
+
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+OPERATIONS = ("get_user", "update_activity", "create_user", "get_user_stats")
+
+
+def written_bytes():
+    """Байты, записанные процессом (None, если /proc недоступен)"""
+    try:
+        with open("/proc/self/io", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("wchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def max_rss_mb() -> float:
+    """Пик резидентной памяти процесса (МБ)"""
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдает килобайты, macOS - байты
+    return round(usage / 1024 / (1024 if sys.platform == "darwin" else 1), 1)
+
+
+async def populate(models, backend: str, size: int, seed: int, mongodb_url: str):
+    """Заполнение выбранного хранилища популяцией заданного размера"""
+    started = time.perf_counter()
+    if backend == "text":
+        write_text(models.Database.text_storage_file, generate_users(size, seed))
+    elif backend == "json":
+        write_json(models.Database.local_storage_file, generate_users(size, seed))
+    else:
+        # Коллекция уже пересоздана configure_backend, заполняем ту же базу
+        await populate_mongo(mongodb_url, models.Database.db.name, size, seed)
+    return time.perf_counter() - started
+
+
+def make_operations(models, size: int, rng: random.Random):
+    """Операции хранилища: имя -> корутинная функция без аргументов"""
+    User = models.User
+    next_new_id = [user_id_for_rank(size) + 1]
+
+    async def get_user():
+        await User.get_user(user_id_for_rank(zipf_rank(rng, size)))
+
+    async def update_activity():
+        user = User(user_id_for_rank(zipf_rank(rng, size)))
+        await user.update_activity()
+
+    async def create_user():
+        await User.create_user(next_new_id[0], f"new{next_new_id[0]}", "Новый")
+        next_new_id[0] += 1
+
+    async def get_user_stats():
+        await User.get_user_stats()
+
+    return {
+        "get_user": get_user,
+        "update_activity": update_activity,
+        "create_user": create_user,
+        "get_user_stats": get_user_stats
+    }
+
+
+async def measure_operation(func, iterations: int, track_allocations: bool):
+    """Задержки, пик tracemalloc и записанные байты для одной операции"""
+    latencies = []
+    wchar_before = written_bytes()
+    for _ in range(iterations):
+        started = time.perf_counter()
+        await func()
+        latencies.append(time.perf_counter() - started)
+    wchar_after = written_bytes()
+
+    result = {
+        "iterations": iterations,
+        "latency": latency_summary(latencies),
+        "bytes_written_per_op": (
+            round((wchar_after - wchar_before) / iterations) if wchar_before is not None else None
+        )
+    }
+    if track_allocations:
+        # Отдельный вызов: tracemalloc искажает время, поэтому не смешиваем с замером задержки
+        tracemalloc.start()
+        try:
+            await func()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        result["python_peak_mb"] = round(peak / 1024 / 1024, 2)
+    result["max_rss_mb"] = max_rss_mb()
+    return result
+
+
+async def run_case(args):
+    """Один прогон (размер, хранилище) в текущем процессе"""
+    import database.models as models
+
+    workdir = tempfile.mkdtemp(prefix="112help-storage-")
+    os.chdir(workdir)
+    backend_name = await configure_backend(models, args.backend, args.mongodb_url)
+    mongodb_url = args.mongodb_url or "mongodb://localhost:27017"
+    populate_s = await populate(models, args.backend, args.size, args.seed, mongodb_url)
+    storage_bytes = 0
+    for path in (models.Database.text_storage_file, models.Database.local_storage_file):
+        if os.path.exists(path):
+            storage_bytes = os.path.getsize(path)
+
+    rss_before = max_rss_mb()
+    operations = make_operations(models, args.size, random.Random(args.seed))
+    results = {}
+    try:
+        for name in args.operations:
+            results[name] = await measure_operation(operations[name], args.iterations, not args.no_tracemalloc)
+    finally:
+        await cleanup_backend(models, args.backend)
+        for path in (models.Database.text_storage_file, models.Database.local_storage_file):
+            if os.path.exists(path):
+                os.remove(path)
+
+    return {
+        "backend": backend_name,
+        "users": args.size,
+        "populate_s": round(populate_s, 2),
+        "storage_mb": round(storage_bytes / 1024 / 1024, 2),
+        "max_rss_mb_before": rss_before,
+        "operations": results
+    }
+
+
+def run_isolated(args, size: int, backend: str):
+    """Запуск прогона в дочернем процессе и разбор его JSON"""
+    command = [
+        sys.executable, "-m", "benchmarks.storage_bench", "--child",
+        "--size", str(size), "--backend", backend,
+        "--iterations", str(args.iterations), "--seed", str(args.seed),
+        "--operations", *args.operations
+    ]
+    if args.mongodb_url:
+        command += ["--mongodb-url", args.mongodb_url]
+    if args.no_tracemalloc:
+        command.append("--no-tracemalloc")
+    completed = subprocess.run(command, cwd=PROJECT_ROOT, capture_output=True, text=True, timeout=args.timeout)
+    if completed.returncode != 0:
+        error = completed.stderr.strip().splitlines()
+        return {"backend": backend, "users": size, "error": error[-1][:300] if error else f"exit {completed.returncode}"}
+    return json.loads(completed.stdout)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк хранилищ пользователей 112help")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10_000, 100_000], help="размеры популяций")
+    parser.add_argument("--backends", nargs="+", choices=("text", "json", "mongo"), default=["text", "json"])
+    parser.add_argument("--operations", nargs="+", choices=OPERATIONS, default=list(OPERATIONS))
+    parser.add_argument("--iterations", type=int, default=20, help="вызовов каждой операции")
+    parser.add_argument("--mongodb-url", default=None, help="MongoDB для бэкенда mongo")
+    parser.add_argument("--no-tracemalloc", action="store_true", help="не измерять пик выделений Python")
+    parser.add_argument("--timeout", type=float, default=3600, help="лимит времени одного прогона (секунды)")
+    parser.add_argument("--seed", type=int, default=112)
+    parser.add_argument("--output", default=None, help="файл для JSON результата")
+    # Внутренние параметры дочернего процесса
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--backend", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.child:
+        sys.stdout.write(json.dumps(asyncio.run(run_case(args)), ensure_ascii=False) + "\n")
+        return
+
+    results = []
+    for size in args.sizes:
+        for backend in args.backends:
+            try:
+                results.append(run_isolated(args, size, backend))
+            except subprocess.TimeoutExpired:
+                results.append({"backend": backend, "users": size, "error": f"таймаут {args.timeout}с"})
+
+    report = {
+        "benchmark": "storage_bench",
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "config": {"sizes": args.sizes, "iterations": args.iterations, "seed": args.seed},
+        "results": results
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        sys.stdout.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
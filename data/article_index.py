@@ -0,0 +1,83 @@
+import math
+import re
+from bisect import bisect_left, bisect_right
+
+# "228", "228.1", "20.3.1"
+_NUMBER = r"\d+(?:\.\d+)*"
+# Необязательное "ст." / "статья" перед номером
+_PREFIX = r"(?:ст(?:атья|\.)?\s*)?"
+# "228 ч.2", "228 ч. 2", "228ч2", "228 часть 2"
+_SINGLE = re.compile(rf"^{_PREFIX}({_NUMBER})\s*(?:ч(?:асть|\.)?\s*(\d+))?$")
+# "158-161", "20.1–20.3", "158..161"
+_RANGE = re.compile(rf"^{_PREFIX}({_NUMBER})\s*(?:-|–|—|\.\.)\s*({_NUMBER})$")
+
+
+def parse_article_key(number: str):
+    """Номер статьи как кортеж чисел: "228.1" -> (228, 1); None - не номер"""
+    number = number.strip()
+    if not re.fullmatch(_NUMBER, number):
+        return None
+    return tuple(int(part) for part in number.split("."))
+
+
+def parse_article_query(query: str):
+    """Разбор запроса /law и /admin
+
+    Возвращает ("article", ключ, часть или None), ("range", от, до)
+    или None, если запрос не похож на номер статьи.
+    """
+    query = query.strip().lower()
+    match = _SINGLE.match(query)
+    if match:
+        part = int(match.group(2)) if match.group(2) else None
+        return "article", parse_article_key(match.group(1)), part
+    match = _RANGE.match(query)
+    if match:
+        low, high = parse_article_key(match.group(1)), parse_article_key(match.group(2))
+        if low > high:
+            low, high = high, low
+        return "range", low, high
+    return None
+
+
+def _distance(key, other):
+    """Близость номеров: сначала основной номер, затем подстатья"""
+    return (abs(key[0] - other[0]), abs((key[1] if len(key) > 1 else 0) - (other[1] if len(other) > 1 else 0)))
+
+
+class ArticleIndex:
+    """Отсортированный индекс номеров статей кодекса
+
+    Номера сравниваются как кортежи чисел, поэтому 20.20 идет после 20.3,
+    а 228.1 - сразу после 228. Точный поиск, диапазоны и ближайшие
+    статьи - двоичным поиском по списку ключей.
+    """
+
+    def __init__(self, numbers):
+        pairs = sorted((parse_article_key(number), number) for number in numbers)
+        self.keys = [key for key, _ in pairs]
+        self.numbers = [number for _, number in pairs]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def get(self, key):
+        """Номер статьи в записи кодекса по ключу (None - нет такой)"""
+        position = bisect_left(self.keys, key)
+        if position < len(self.keys) and self.keys[position] == key:
+            return self.numbers[position]
+        return None
+
+    def range(self, low, high):
+        """Статьи от low до high включительно, с подстатьями high (161 -> 161.1)"""
+        start = bisect_left(self.keys, low)
+        end = bisect_right(self.keys, high + (math.inf,))
+        return self.numbers[start:end]
+
+    def nearest(self, key, count: int = 3):
+        """Ближайшие к key статьи по возрастанию номера"""
+        position = bisect_left(self.keys, key)
+        start = max(0, position - count)
+        candidates = range(start, min(len(self.keys), position + count))
+        closest = sorted(candidates, key=lambda index: _distance(self.keys[index], key))[:count]
+        return [self.numbers[index] for index in sorted(closest)]
@@ -1,3 +1,12 @@
+from data.article_index import ArticleIndex, parse_article_query
+from data.facilities import FACILITY_TYPES, NEAREST_MAX_DISTANCE_KM, facility_index
+from data import texts
+from data.hazmat import HAZARD_CLASSES, hazmat_db
+from utils.pagination import paginate
+from utils.rich_text import code_span, compile_markdown
+from utils.tracing import traced
+
+
 class EmergencyData:
     def __init__(self):
         # База данных лекарств и дозировок
@@ -534,6 +543,52 @@ class EmergencyData:
             "003": "Скорая помощь (со стационарного)"
         }
 
+        self.rebuild_indexes()
+
+    def rebuild_indexes(self):
+        """Индексы номеров статей: подстатьи, диапазоны и ближайшие номера
+
+        Вызывается после любого изменения criminal_code или admin_code.
+        """
+        self.criminal_index = ArticleIndex(self.criminal_code)
+        self.admin_index = ArticleIndex(self.admin_code)
+
+    def prerender_cards(self):
+        """Подготовка текстов карточек для упрощенного режима при перегрузке
+        и страниц каталогов
+
+        Ключи - имя списка ("fire_classes", "contacts") или пара (раздел, ключ
+        в нижнем регистре) для отдельных записей.
+        """
+        cards = {
+            "fire_classes": self.get_all_fire_classes(),
+            "contacts": self.get_emergency_contacts()
+        }
+        for poison_name in self.poisons:
+            cards[("poison", poison_name.lower())] = self.get_poison_info(poison_name)
+        for fire_class in list(self.fire_classes) + ["электро"]:
+            cards[("fire", fire_class.lower())] = self.get_fire_class_info(fire_class)
+        for article_number in self.criminal_code:
+            cards[("law", article_number)] = self.get_criminal_article(article_number)
+        for article_number in self.admin_code:
+            cards[("koap", article_number)] = self.get_admin_article(article_number)
+        self.cards = cards
+        self.catalog_pages = {
+            section: paginate(*self.catalog_parts(section)) for section in self.CATALOGS
+        }
+        return cards
+
+    def get_catalog_page(self, section, page):
+        """Страница каталога: текст, номер страницы и число страниц
+
+        Номер вне диапазона (курсор от прежней версии каталога) приводится
+        к ближайшей странице.
+        """
+        pages = self.catalog_pages[section]
+        page = min(max(page, 0), len(pages) - 1)
+        return pages[page], page, len(pages)
+
+    @traced("data")
     def calculate_dose(self, drug_name, weight):
         """Расчет дозировки лекарства по весу пациента"""
         # Поиск препарата без учета регистра
@@ -570,6 +625,7 @@ class EmergencyData:
         
         return dose_info.strip()
 
+    @traced("data")
     def get_poison_info(self, poison_name):
         """Получение информации о яде и противоядии"""
         # Поиск яда без учета регистра
@@ -602,6 +658,7 @@ class EmergencyData:
         
         return poison_info.strip()
 
+    @traced("data")
     def get_fire_class_info(self, fire_class):
         """Получение информации о классе пожара"""
         fire_class = fire_class.lower()
@@ -638,20 +695,90 @@ class EmergencyData:
         
         return fire_info.strip()
 
+    # Статей в карточке диапазона (/law 158-161)
+    ARTICLE_RANGE_LIMIT = 10
+
+    def _codex(self, section):
+        """Кодекс раздела: записи, индекс, значок, название и команда"""
+        if section == "law":
+            return self.criminal_code, self.criminal_index, "⚖️", "УК РФ", "/law"
+        return self.admin_code, self.admin_index, "📋", "КоАП РФ", "/admin"
+
+    def _find_article(self, section, query):
+        """Карточка статьи, части статьи или диапазона статей по запросу"""
+        code, index, icon, code_title, command = self._codex(section)
+        query = str(query).strip()
+        parsed = parse_article_query(query)
+        suggestions = []
+        result = f"ℹ️ **Статья {code_title} не найдена:** {code_span(query)}"
+        if parsed and parsed[0] == "range":
+            title = "-".join(".".join(map(str, key)) for key in parsed[1:])
+            numbers = index.range(parsed[1], parsed[2])
+            if numbers:
+                return self._range_card(section, title, numbers)
+            result = f"ℹ️ **Статьи {title} {code_title} не найдены.**"
+            suggestions = index.nearest(parsed[1])
+        elif parsed:
+            _, key, part = parsed
+            article_number = index.get(key)
+            if article_number is not None:
+                article = code[article_number]
+                card = f"{icon} **Статья {article_number} {code_title}: {article['title']}**"
+                if part:
+                    card += f"\n\n**Часть {part}:** в справочнике приведено описание статьи целиком"
+                return card + f"\n\n**Описание:** {article['description']}\n\n**Наказание:** {article['punishment']}\n\n**Примечание:** Данная информация носит справочный характер."
+            suggestions = index.nearest(key)
+        if suggestions:
+            result += "\n\n🔎 **Ближайшие статьи:** " + ", ".join(f"`{command} {number}`" for number in suggestions)
+        return result + f"\n\n💡 **Используйте:** `{command} [номер]` для поиска\n\n💡 **Совет:** Нажмите на команду чтобы скопировать её"
+
+    def _range_card(self, section, title, numbers):
+        """Краткая карточка нескольких статей: название и наказание"""
+        code, _, icon, code_title, command = self._codex(section)
+        result = f"{icon} **Статьи {title} {code_title}:**\n\n"
+        for article_number in numbers[:self.ARTICLE_RANGE_LIMIT]:
+            article = code[article_number]
+            result += f"**Ст. {article_number}** - {article['title']}\n_{article['punishment']}_\n\n"
+        if len(numbers) > self.ARTICLE_RANGE_LIMIT:
+            result += f"...и еще {len(numbers) - self.ARTICLE_RANGE_LIMIT} (уточните диапазон)\n\n"
+        return result + f"💡 **Подробнее:** `{command} [номер статьи]`\n\n💡 **Совет:** Нажмите на команду чтобы скопировать её"
+
+    @traced("data")
     def get_criminal_article(self, article_number):
-        """Получение информации о статье УК РФ"""
-        if article_number in self.criminal_code:
-            article = self.criminal_code[article_number]
-            return f"⚖️ **Статья {article_number} УК РФ: {article['title']}**\n\n**Описание:** {article['description']}\n\n**Наказание:** {article['punishment']}\n\n**Примечание:** Данная информация носит справочный характер."
-        return f"ℹ️ **Статья {article_number} УК РФ не найдена.**\n\n💡 **Используйте:** `/law [номер]` для поиска\n\n💡 **Совет:** Нажмите на команду чтобы скопировать её"
+        """Получение информации о статье УК РФ ("228", "228.1", "228 ч.2", "158-161")"""
+        return self._find_article("law", article_number)
 
+    @traced("data")
     def get_admin_article(self, article_number):
-        """Получение информации о статье КоАП РФ"""
-        if article_number in self.admin_code:
-            article = self.admin_code[article_number]
-            return f"📋 **Статья {article_number} КоАП РФ: {article['title']}**\n\n**Описание:** {article['description']}\n\n**Наказание:** {article['punishment']}\n\n**Примечание:** Данная информация носит справочный характер."
-        return f"ℹ️ **Статья {article_number} КоАП РФ не найдена.**\n\n💡 **Используйте:** `/admin [номер]` для поиска\n\n💡 **Совет:** Нажмите на команду чтобы скопировать её"
+        """Получение информации о статье КоАП РФ ("20.1", "20.1-20.3")"""
+        return self._find_article("admin", article_number)
+
+    @traced("data")
+    def get_hazmat_info(self, query):
+        """Карточка опасного вещества по номеру ООН или наименованию"""
+        matches = hazmat_db.search(query)
+        if not matches:
+            return f"ℹ️ **Вещество не найдено:** {code_span(query)}\n\n💡 **Используйте:** `/hazmat [номер ООН или название]`, например `/hazmat 1017` или `/hazmat хлор`\n\n💡 **Совет:** Нажмите на команду чтобы скопировать её"
+        if len(matches) > 1:
+            result = f"☣️ **Найдено веществ: {len(matches)}**\n\n"
+            for record in matches:
+                result += f"• `/hazmat {record['un']}` - {record['name']} (класс {record['class']})\n"
+            return result + "\n💡 **Совет:** Нажмите на команду чтобы скопировать её"
+        record = matches[0]
+        guide = hazmat_db.guides.get(record["guide"])
+        result = f"☣️ **UN {record['un']:04d} - {record['name']}**\n\n"
+        result += f"**Класс опасности:** {record['class']} ({HAZARD_CLASSES[record['class']]})\n"
+        if record["aliases"]:
+            result += f"**Другие названия:** {', '.join(record['aliases'])}\n"
+        if guide:
+            result += f"**Аварийная карточка:** {record['guide']} - {guide['title']}\n\n"
+            result += f"**⚠️ Опасность:** {guide['hazards']}\n\n"
+            result += f"**🛡️ Действия:** {guide['actions']}\n\n"
+            result += f"**📏 Изоляция:** не менее {guide['isolation_m']} м во все стороны\n"
+            result += f"**🔥 Пожар цистерны/вагона:** изоляция и эвакуация {guide['fire_evacuation_m']} м\n"
+        return result + "\n**Примечание:** Расстояния ориентировочные (по ERG); уточняйте по аварийной карточке груза."
 
+    @traced("render")
     def get_all_fire_classes(self):
         """Получение информации о всех классах пожаров"""
         result = "🔥 **Классы пожаров**:\n\n"
@@ -662,6 +789,27 @@ class EmergencyData:
             
         return result.strip()
 
+    @traced("data")
+    def get_nearest_facilities(self, facility_type, lat, lon):
+        """Ближайшие экстренные службы типа к точке"""
+        title = FACILITY_TYPES[facility_type]
+        nearest = facility_index.nearest(facility_type, lat, lon)
+        if not nearest:
+            # Объект за сотни километров хуже, чем никакого: человек поедет не туда
+            return (
+                f"ℹ️ **{title}: нет данных для вашего района** (в радиусе {NEAREST_MAX_DISTANCE_KM:.0f} км).\n\n"
+                "📞 Звоните **112** - диспетчер направит ближайшую службу"
+            )
+        result = f"📍 **{title} - ближайшие к вам:**\n\n"
+        for number, (facility, distance) in enumerate(nearest, 1):
+            result += f"**{number}. {facility['name']}** - {distance:.1f} км\n"
+            result += f"{facility['address']}"
+            if facility["phone"]:
+                result += f", ☎️ {facility['phone']}"
+            result += f"\n[На карте](https://yandex.ru/maps/?pt={facility['lon']},{facility['lat']}&z=16)\n\n"
+        return result + "🌍 При угрозе жизни звоните **112**"
+
+    @traced("render")
     def get_emergency_contacts(self):
         """Получение списка экстренных контактов"""
         result = "📞 **Экстренные службы**:\n\n"
@@ -673,6 +821,7 @@ class EmergencyData:
         
         return result
     
+    @traced("render")
     def get_rescue_protocols(self):
         """Получение протоколов спасательных операций"""
         return """🔍 **Протоколы поисково-спасательных операций:**
@@ -698,6 +847,7 @@ class EmergencyData:
 • Деблокирование пострадавших
 • Первая медицинская помощь"""
 
+    @traced("render")
     def get_survival_times(self):
         """Получение времени выживания в различных условиях"""
         return """⏱️ **Время выживания человека:**
@@ -726,6 +876,7 @@ class EmergencyData:
 
 
 
+    @traced("render")
     def get_resuscitation_algorithm(self):
         """Алгоритм сердечно-легочной реанимации"""
         algorithm = """
@@ -765,38 +916,155 @@ class EmergencyData:
         
         return algorithm.strip()
 
+    # Каталоги со списком записей по страницам: раздел - команда просмотра записи
+    CATALOGS = ("law", "admin", "dose", "poison")
+
+    def catalog_parts(self, section):
+        """Заголовок, строки записей и подвал каталога"""
+        if section == "law":
+            header = "⚖️ **Основные статьи УК РФ:**\n\n"
+            lines = [f"**Ст. {article_num}** - {self.criminal_code[article_num]['title']}\n" for article_num in self.criminal_index.numbers]
+            usage = "`/law [номер статьи]` для подробной информации"
+        elif section == "admin":
+            header = "📋 **Основные статьи КоАП РФ:**\n\n"
+            lines = [f"**Ст. {article_num}** - {self.admin_code[article_num]['title']}\n" for article_num in self.admin_index.numbers]
+            usage = "`/admin [номер статьи]` для подробной информации"
+        elif section == "dose":
+            header = "💊 **Доступные лекарства для расчета дозировок:**\n\n"
+            lines = [f"• **{drug_name.title()}** - {drug_info['indication']}\n" for drug_name, drug_info in self.drugs.items()]
+            usage = "`/dose [лекарство] [вес]` для расчета дозировки"
+        elif section == "poison":
+            header = "☠️ **Доступная информация о ядах и противоядиях:**\n\n"
+            lines = [f"• **{poison_name.title()}** - {poison_info['danger']}\n" for poison_name, poison_info in self.poisons.items()]
+            usage = "`/poison [название]` для получения информации о противоядии"
+        else:
+            raise KeyError(section)
+        footer = f"\n💡 **Используйте:** {usage}\n\n💡 **Совет:** Нажмите на команду чтобы скопировать её"
+        return header, lines, footer
+
+    def _full_catalog(self, section):
+        header, lines, footer = self.catalog_parts(section)
+        return header + "".join(lines) + footer
+
+    @traced("render")
     def get_all_criminal_articles(self):
-        """Получение списка всех статей УК РФ"""
-        result = "⚖️ **Основные статьи УК РФ:**\n\n"
-        for article_num, article in self.criminal_code.items():
-            result += f"**Ст. {article_num}** - {article['title']}\n"
-        result += "\n💡 **Используйте:** `/law [номер статьи]` для подробной информации\n\n💡 **Совет:** Нажмите на команду чтобы скопировать её"
-        return result
+        """Получение списка всех статей УК РФ (одним сообщением)"""
+        return self._full_catalog("law")
 
+    @traced("render")
     def get_all_admin_articles(self):
-        """Получение списка всех статей КоАП РФ"""
-        result = "📋 **Основные статьи КоАП РФ:**\n\n"
-        for article_num, article in self.admin_code.items():
-            result += f"**Ст. {article_num}** - {article['title']}\n"
-        result += "\n💡 **Используйте:** `/admin [номер статьи]` для подробной информации\n\n💡 **Совет:** Нажмите на команду чтобы скопировать её"
-        return result
+        """Получение списка всех статей КоАП РФ (одним сообщением)"""
+        return self._full_catalog("admin")
 
+    @traced("render")
     def get_all_drugs(self):
-        """Получение списка всех доступных лекарств"""
-        result = "💊 **Доступные лекарства для расчета дозировок:**\n\n"
-        for drug_name, drug_info in self.drugs.items():
-            result += f"• **{drug_name.title()}** - {drug_info['indication']}\n"
-        result += "\n💡 **Используйте:** `/dose [лекарство] [вес]` для расчета дозировки\n\n💡 **Совет:** Нажмите на команду чтобы скопировать её"
-        return result
+        """Получение списка всех доступных лекарств (одним сообщением)"""
+        return self._full_catalog("dose")
 
+    @traced("render")
     def get_all_poisons(self):
-        """Получение списка всех ядов"""
-        result = "☠️ **Доступная информация о ядах и противоядиях:**\n\n"
+        """Получение списка всех ядов (одним сообщением)"""
+        return self._full_catalog("poison")
+
+    # Экраны с алгоритмами и протоколами для поиска по справочнику: текст и callback_data
+    PROTOCOL_SCREENS = (
+        (texts.MED_ALGO, "med_algo"),
+        (texts.FIRE_EXTINGUISH, "fire_extinguish"),
+        (texts.FIRE_HAZMAT, "fire_hazmat"),
+        (texts.FIRE_EVAC, "fire_evac"),
+        (texts.POLICE_RIGHTS, "police_rights"),
+        (texts.POLICE_PROTOCOLS, "police_protocols"),
+        (texts.RESCUE_SEARCH, "rescue_search"),
+        (texts.RESCUE_SURVIVAL, "rescue_survival"),
+        (texts.RESCUE_WEATHER, "rescue_weather"),
+        (texts.RESCUE_COMMS, "rescue_comms")
+    )
+
+    def retrieval_documents(self):
+        """Документы для поиска по справочнику (utils/retrieval.py): все карточки базы
+
+        kind - тип карточки, key - ключ для ее показа, command - команда
+        для копирования, callback - экран с протоколом.
+        """
+        documents = []
+        for drug_name, drug_info in self.drugs.items():
+            documents.append({
+                "kind": "drug", "key": drug_name, "title": drug_name.title(),
+                "text": f"{drug_info['indication']} {drug_info['contraindications']} {drug_info['route']}",
+                "command": f"/dose {drug_name} [вес]"
+            })
         for poison_name, poison_info in self.poisons.items():
-            result += f"• **{poison_name.title()}** - {poison_info['danger']}\n"
-        result += "\n💡 **Используйте:** `/poison [название]` для получения информации о противоядии\n\n💡 **Совет:** Нажмите на команду чтобы скопировать её"
-        return result
+            documents.append({
+                "kind": "poison", "key": poison_name, "title": poison_name.title(),
+                "text": f"{poison_info['symptoms']} {poison_info['first_aid']} {poison_info['antidote']}",
+                "command": f"/poison {poison_name}"
+            })
+        for fire_class, fire_info in self.fire_classes.items():
+            documents.append({
+                "kind": "fire", "key": fire_class, "title": f"Класс пожара {fire_class.upper()}",
+                "text": " ".join(fire_info.values()), "command": f"/fire {fire_class.upper()}"
+            })
+        for kind, code, command in (("law", self.criminal_code, "/law"), ("koap", self.admin_code, "/admin")):
+            for article_number, article in code.items():
+                documents.append({
+                    "kind": kind, "key": article_number, "title": f"Ст. {article_number} - {article['title']}",
+                    "text": f"{article['description']} {article['punishment']}",
+                    "command": f"{command} {article_number}"
+                })
+        if hazmat_db.loaded:
+            for number in range(hazmat_db.count):
+                record = hazmat_db.record(number)
+                guide = hazmat_db.guides.get(record["guide"], {})
+                documents.append({
+                    "kind": "hazmat", "key": str(record["un"]), "title": f"UN {record['un']:04d} - {record['name']}",
+                    "text": " ".join([HAZARD_CLASSES[record["class"]], guide.get("title", "")] + record["aliases"]),
+                    "command": f"/hazmat {record['un']}"
+                })
+        screens = ((compile_markdown(self.get_resuscitation_algorithm()), "med_resus"),) + self.PROTOCOL_SCREENS
+        for screen, callback in screens:
+            title, _, body = screen.text.partition("\n")
+            documents.append({"kind": "protocol", "key": callback, "title": title, "text": body, "callback": callback})
+        return documents
+
+    def _retrieval_card(self, document):
+        """Полная карточка лучшего результата поиска по справочнику"""
+        kind, key = document["kind"], document["key"]
+        if kind == "drug":
+            drug_info = self.drugs[key]
+            return (
+                f"💊 **{key.title()}** - {drug_info['indication']}\n**Путь введения:** {drug_info['route']}\n"
+                f"**Противопоказания:** {drug_info['contraindications']}\n`{document['command']}`"
+            )
+        if kind == "poison":
+            return self.get_poison_info(key)
+        if kind == "fire":
+            return self.get_fire_class_info(key)
+        if kind == "law":
+            return self.get_criminal_article(key)
+        if kind == "koap":
+            return self.get_admin_article(key)
+        if kind == "hazmat":
+            return self.get_hazmat_info(key)
+        return f"**{document['title']}** - откройте кнопкой ниже"
+
+    @traced("render")
+    def format_retrieval_answer(self, results, title):
+        """Ответ на свободный запрос: карточка лучшего совпадения и другие варианты"""
+        if not results:
+            return f"ℹ️ **{title}: в справочнике ничего не найдено.**\n\nОпишите ситуацию другими словами: симптомы, вещество, действие.\n\n📞 При угрозе жизни звоните **112**"
+        best, _ = results[0]
+        result = f"🔎 **{title}**\n\n{self._retrieval_card(best)}\n\n"
+        if len(results) > 1:
+            result += "**Также подходит:**\n"
+            for document, _ in results[1:]:
+                if "command" in document:
+                    result += f"• {document['title']} - `{document['command']}`\n"
+                else:
+                    result += f"• {document['title']} (кнопка ниже)\n"
+            result += "\n"
+        return result + "💡 Ответ подобран по справочнику бота без обращения к сети; сверяйтесь с официальными источниками."
 
+    @traced("data")
     def search_in_database(self, query):
         """Поиск по ключевым словам во всей базе данных"""
         results = []
@@ -854,6 +1122,7 @@ class EmergencyData:
         
         return results
 
+    @traced("render")
     def format_search_results(self, results, query):
         """Форматирование результатов поиска"""
         if not results:
@@ -0,0 +1,152 @@
+import heapq
+import logging
+import math
+import os
+from array import array
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Экстренные службы с координатами: тип, название, адрес, телефон, широта, долгота
+FACILITIES_FILE = os.getenv("FACILITIES_FILE", str(Path(__file__).resolve().parent / "facilities.tsv"))
+# Сколько ближайших объектов показывать
+NEAREST_COUNT = int(os.getenv("NEAREST_COUNT", "5"))
+# Дальше этого расстояния объект не считается ближайшим: в районе нет данных (км)
+NEAREST_MAX_DISTANCE_KM = float(os.getenv("NEAREST_MAX_DISTANCE_KM", "50"))
+
+FACILITY_TYPES = {
+    "hospital": "🏥 Больницы",
+    "fire": "🚒 Пожарные части",
+    "police": "👮 Полиция"
+}
+
+EARTH_RADIUS_KM = 6371.0
+
+logger = logging.getLogger(__name__)
+
+
+def to_vector(lat: float, lon: float):
+    """Точка на единичной сфере: хорда монотонна по расстоянию по поверхности"""
+    lat, lon = math.radians(lat), math.radians(lon)
+    return math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat)
+
+
+def chord_to_km(squared_chord: float) -> float:
+    """Расстояние по поверхности Земли по квадрату хорды между единичными векторами"""
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(squared_chord) / 2))
+
+
+class KDTree:
+    """KD-дерево по трехмерным точкам без отдельных узлов
+
+    Точки переупорядочены так, что медиана каждого отрезка - корень
+    поддерева, ось чередуется по глубине. Поиск k ближайших отбрасывает
+    поддеревья дальше текущего k-го результата - O(log n) в среднем.
+    """
+
+    def __init__(self, vectors):
+        order = list(range(len(vectors)))
+        self._build(order, vectors, 0, len(order), 0)
+        # Координаты по осям в порядке дерева - плотные массивы вместо кортежей
+        self.axes = [array("d", (vectors[i][axis] for i in order)) for axis in range(3)]
+        self.ids = array("i", order)
+
+    @classmethod
+    def _build(cls, order, vectors, low, high, axis):
+        # Стек вместо рекурсии: глубина не ограничена лимитом рекурсии
+        stack = [(low, high, axis)]
+        while stack:
+            low, high, axis = stack.pop()
+            if high - low <= 1:
+                continue
+            order[low:high] = sorted(order[low:high], key=lambda i: vectors[i][axis])
+            middle = (low + high) // 2
+            next_axis = (axis + 1) % 3
+            stack.append((low, middle, next_axis))
+            stack.append((middle + 1, high, next_axis))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def nearest(self, vector, count: int):
+        """Номера и квадраты хорд count ближайших точек по возрастанию расстояния"""
+        xs, ys, zs = self.axes
+        qx, qy, qz = vector
+        heap = []  # (-квадрат хорды, номер) - на вершине самый дальний из найденных
+        stack = [(0, len(self.ids), 0)]
+        while stack:
+            low, high, axis = stack.pop()
+            if low >= high:
+                continue
+            middle = (low + high) // 2
+            dx, dy, dz = xs[middle] - qx, ys[middle] - qy, zs[middle] - qz
+            distance = dx * dx + dy * dy + dz * dz
+            if len(heap) < count:
+                heapq.heappush(heap, (-distance, middle))
+            elif distance < -heap[0][0]:
+                heapq.heapreplace(heap, (-distance, middle))
+            delta = (dx, dy, dz)[axis]
+            next_axis = (axis + 1) % 3
+            # delta > 0: запрос левее разделяющей плоскости
+            near, far = ((low, middle), (middle + 1, high)) if delta > 0 else ((middle + 1, high), (low, middle))
+            if len(heap) < count or delta * delta < -heap[0][0]:
+                stack.append((far[0], far[1], next_axis))
+            stack.append((near[0], near[1], next_axis))
+        return [(self.ids[index], -negative) for negative, index in sorted(heap, reverse=True)]
+
+
+class FacilityIndex:
+    """Экстренные службы с KD-деревом по каждому типу"""
+
+    def __init__(self, path: str = FACILITIES_FILE):
+        self.path = path
+        self.facilities = {facility_type: [] for facility_type in FACILITY_TYPES}
+        self.trees = {}
+
+    def load(self):
+        """Чтение TSV и построение деревьев (при отсутствии файла поиск недоступен)"""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                lines = [line.rstrip("\n") for line in f if line.strip() and not line.startswith("#")]
+        except OSError as e:
+            logger.warning(f"Файл экстренных служб {self.path} не прочитан: {e}")
+            return self
+        for number, line in enumerate(lines[1:], 2):
+            try:
+                facility_type, name, address, phone, lat, lon = line.split("\t")
+                lat, lon = float(lat), float(lon)
+            except ValueError:
+                logger.warning(f"{self.path}: строка {number} пропущена - неверный формат")
+                continue
+            if facility_type in self.facilities and -90 <= lat <= 90 and -180 <= lon <= 180:
+                self.facilities[facility_type].append({
+                    "name": name, "address": address, "phone": phone, "lat": lat, "lon": lon
+                })
+        self.trees = {
+            facility_type: KDTree([to_vector(item["lat"], item["lon"]) for item in items])
+            for facility_type, items in self.facilities.items() if items
+        }
+        logger.info(
+            "Экстренные службы: " + ", ".join(f"{facility_type} {len(items)}" for facility_type, items in self.facilities.items())
+        )
+        return self
+
+    def nearest(self, facility_type: str, lat: float, lon: float, count: int = NEAREST_COUNT,
+                max_distance_km: float = NEAREST_MAX_DISTANCE_KM):
+        """Ближайшие объекты типа не дальше max_distance_km: список (объект, расстояние в км)"""
+        tree = self.trees.get(facility_type)
+        if tree is None:
+            return []
+        items = self.facilities[facility_type]
+        result = []
+        for number, squared in tree.nearest(to_vector(lat, lon), count):
+            distance = chord_to_km(squared)
+            if distance > max_distance_km:
+                break
+            result.append((items[number], distance))
+        return result
+
+
+facility_index = FacilityIndex()
@@ -0,0 +1,236 @@
+import logging
+import mmap
+import os
+import re
+import struct
+from bisect import bisect_left
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+from utils.state import state_path, write_atomic
+
+load_dotenv()
+
+DATA_DIR = Path(__file__).resolve().parent
+HAZMAT_FILE = DATA_DIR / "hazmat.tsv"
+HAZMAT_GUIDES_FILE = DATA_DIR / "hazmat_guides.tsv"
+# Двоичный снимок базы (пересобирается, если hazmat.tsv изменился)
+HAZMAT_SNAPSHOT_FILE = os.getenv("HAZMAT_SNAPSHOT_FILE", state_path("hazmat.bin"))
+
+# Классы опасности ДОПОГ; в снимке класс хранится номером в этом списке
+HAZARD_CLASSES = {
+    "1": "Взрывчатые вещества",
+    "2.1": "Легковоспламеняющиеся газы",
+    "2.2": "Невоспламеняющиеся нетоксичные газы",
+    "2.3": "Токсичные газы",
+    "3": "Легковоспламеняющиеся жидкости",
+    "4.1": "Легковоспламеняющиеся твердые вещества",
+    "4.2": "Самовозгорающиеся вещества",
+    "4.3": "Вещества, выделяющие горючие газы при контакте с водой",
+    "5.1": "Окисляющие вещества",
+    "5.2": "Органические пероксиды",
+    "6.1": "Токсичные вещества",
+    "6.2": "Инфекционные вещества",
+    "7": "Радиоактивные материалы",
+    "8": "Коррозионные вещества",
+    "9": "Прочие опасные вещества"
+}
+_CLASS_CODES = tuple(HAZARD_CLASSES)
+
+# Номера ООН - четырехзначные
+UN_NUMBERS = 10000
+
+# Формат снимка: заголовок, индекс номеров ООН (uint16: номер записи + 1),
+# записи фиксированного размера, затем строки UTF-8
+_MAGIC = b"112H"
+_VERSION = 1
+_HEADER = struct.Struct("<4sHIIqQ")
+# un, guide, класс, смещение и длина наименования, смещение и длина синонимов
+_RECORD = struct.Struct("<HHBxIIII")
+# Элемент индекса номеров ООН: порядок байтов снимка, а не платформы
+_UN_ENTRY = struct.Struct("<H")
+
+_UN_QUERY = re.compile(r"^(?:un|ун|оон)?\s*(\d{1,4})$")
+
+logger = logging.getLogger(__name__)
+
+
+def _read_tsv(path):
+    """Строки TSV без комментариев и заголовка"""
+    with open(path, encoding="utf-8") as f:
+        lines = [line.rstrip("\n") for line in f if line.strip() and not line.startswith("#")]
+    return [line.split("\t") for line in lines[1:]]
+
+
+def build_snapshot(source=HAZMAT_FILE) -> bytes:
+    """Двоичный снимок базы из hazmat.tsv"""
+    stat = os.stat(source)
+    rows = sorted(_read_tsv(source), key=lambda row: int(row[0]))
+    index = [0] * UN_NUMBERS
+    records = bytearray()
+    strings = bytearray()
+    for number, (un, hazard_class, guide, name, aliases) in enumerate(rows):
+        un = int(un)
+        if not 0 < un < UN_NUMBERS or index[un]:
+            raise ValueError(f"{source}: неверный или повторный номер ООН {un}")
+        if hazard_class not in HAZARD_CLASSES:
+            raise ValueError(f"{source}: неизвестный класс {hazard_class} у UN {un}")
+        index[un] = number + 1
+        name_bytes = name.encode("utf-8")
+        alias_bytes = aliases.encode("utf-8")
+        records += _RECORD.pack(
+            un, int(guide), _CLASS_CODES.index(hazard_class),
+            len(strings), len(name_bytes), len(strings) + len(name_bytes), len(alias_bytes)
+        )
+        strings += name_bytes + alias_bytes
+    header = _HEADER.pack(_MAGIC, _VERSION, len(rows), len(strings), stat.st_mtime_ns, stat.st_size)
+    return header + struct.pack(f"<{UN_NUMBERS}H", *index) + bytes(records) + bytes(strings)
+
+
+class HazmatDatabase:
+    """База опасных веществ с индексами по номеру ООН и наименованию
+
+    Записи лежат в двоичном снимке (файл отображается в память через
+    mmap): индекс номеров ООН - массив на 10000 номеров, поиск по номеру
+    O(1) без разбора записей. Снимок собирается из data/hazmat.tsv при
+    первом запуске и после изменения файла; процессы-обработчики делят
+    отображенные страницы. Индекс наименований и синонимов - отсортированный
+    список для точного поиска и поиска по началу слова.
+    """
+
+    def __init__(self, source=HAZMAT_FILE, guides=HAZMAT_GUIDES_FILE, snapshot=HAZMAT_SNAPSHOT_FILE):
+        self.source = source
+        self.guides_path = guides
+        self.snapshot_path = snapshot
+        self.count = 0
+        self.guides = {}
+        self._buffer = None
+        self._un_index_offset = 0
+        self._records_offset = 0
+        self._strings_offset = 0
+        self._names = []
+        self._name_records = []
+
+    @property
+    def loaded(self) -> bool:
+        return self._buffer is not None
+
+    def _snapshot_valid(self, buffer) -> bool:
+        if len(buffer) < _HEADER.size:
+            return False
+        magic, version, count, strings_size, mtime_ns, size = _HEADER.unpack_from(buffer)
+        stat = os.stat(self.source)
+        expected = _HEADER.size + UN_NUMBERS * 2 + count * _RECORD.size + strings_size
+        return (magic, version, mtime_ns, size, len(buffer)) == (_MAGIC, _VERSION, stat.st_mtime_ns, stat.st_size, expected)
+
+    def _open_snapshot(self):
+        """Отображение снимка в память (None - снимка нет или он устарел)"""
+        try:
+            with open(self.snapshot_path, "rb") as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        if self._snapshot_valid(buffer):
+            return buffer
+        buffer.close()
+        return None
+
+    def load(self):
+        """Загрузка снимка; при его отсутствии - сборка из TSV"""
+        buffer = self._open_snapshot()
+        if buffer is None:
+            data = build_snapshot(self.source)
+            try:
+                write_atomic(self.snapshot_path, data)
+                buffer = self._open_snapshot()
+            except OSError as e:
+                logger.warning(f"Не удалось записать снимок базы опасных веществ {self.snapshot_path}: {e}")
+            # Без записанного снимка база работает из памяти
+            buffer = buffer or data
+        self._buffer = buffer
+        self.count = _HEADER.unpack_from(buffer)[2]
+        self._un_index_offset = _HEADER.size
+        self._records_offset = _HEADER.size + UN_NUMBERS * 2
+        self._strings_offset = self._records_offset + self.count * _RECORD.size
+        self._build_name_index()
+        self.guides = {
+            int(guide): {
+                "title": title, "hazards": hazards, "actions": actions,
+                "isolation_m": int(isolation), "fire_evacuation_m": int(evacuation)
+            }
+            for guide, title, hazards, actions, isolation, evacuation in _read_tsv(self.guides_path)
+        }
+        logger.info(f"База опасных веществ: записей {self.count}, аварийных карточек {len(self.guides)}")
+        return self
+
+    def _string(self, offset: int, length: int) -> str:
+        start = self._strings_offset + offset
+        return bytes(self._buffer[start:start + length]).decode("utf-8")
+
+    def _build_name_index(self):
+        pairs = []
+        for number in range(self.count):
+            record = self.record(number)
+            for name in [record["name"]] + record["aliases"]:
+                pairs.append((name.lower().replace("ё", "е"), number))
+        pairs.sort()
+        self._names = [name for name, _ in pairs]
+        self._name_records = [number for _, number in pairs]
+
+    def record(self, number: int) -> dict:
+        """Запись по порядковому номеру в снимке"""
+        un, guide, class_id, name_offset, name_length, alias_offset, alias_length = _RECORD.unpack_from(
+            self._buffer, self._records_offset + number * _RECORD.size
+        )
+        aliases = self._string(alias_offset, alias_length)
+        return {
+            "un": un,
+            "guide": guide,
+            "class": _CLASS_CODES[class_id],
+            "name": self._string(name_offset, name_length),
+            "aliases": aliases.split(";") if aliases else []
+        }
+
+    def by_un(self, un: int):
+        """Запись по номеру ООН за O(1) (None - нет в базе)"""
+        if not 0 < un < UN_NUMBERS:
+            return None
+        number = _UN_ENTRY.unpack_from(self._buffer, self._un_index_offset + un * _UN_ENTRY.size)[0]
+        return self.record(number - 1) if number else None
+
+    def search(self, query: str, limit: int = 10) -> list:
+        """Поиск по номеру ООН ("1005", "UN1005"), наименованию или синониму
+
+        Сначала точные совпадения, затем совпадения по началу, затем
+        по вхождению подстроки.
+        """
+        query = query.strip().lower().replace("ё", "е")
+        match = _UN_QUERY.match(query)
+        if match:
+            record = self.by_un(int(match.group(1)))
+            return [record] if record else []
+        if not query:
+            return []
+        found = []
+        exact = []
+        position = bisect_left(self._names, query)
+        # Точные и по началу строки - подряд в отсортированном списке
+        while position < len(self._names) and self._names[position].startswith(query):
+            found.append(self._name_records[position])
+            if self._names[position] == query:
+                exact.append(self._name_records[position])
+            position += 1
+        # "хлор" - это хлор, а не список из хлорбензола и хлороводорода
+        found = exact or found
+        if not found:
+            found = [number for name, number in zip(self._names, self._name_records) if query in name]
+        result = []
+        for number in dict.fromkeys(found):
+            result.append(self.record(number))
+            if len(result) >= limit:
+                break
+        return result
+
+
+hazmat_db = HazmatDatabase()
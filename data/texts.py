@@ -0,0 +1,415 @@
+"""Статические тексты бота, заранее разобранные в текст и сущности (utils/rich_text.py)
+
+Разметка проверяется при импорте: ошибка в тексте останавливает запуск,
+а не отправку ответа пользователю.
+"""
+from utils.rich_text import compile_markdown
+
+# Приветствие /start
+WELCOME = compile_markdown("""
+🚨 **Помощник экстренных служб**
+
+Профессиональный бот для сотрудников экстренных служб РФ.
+Быстрый доступ к важной информации в критических ситуациях.
+
+📖 **Подробности миссии:** [Посмотреть](https://telegra.ph/Cifrovoj-pomoshchnik-ehkstrennyh-sluzhb-06-12)
+
+🚑 **Медицина**: расчет дозировок препаратов, противоядия при отравлениях, алгоритмы реанимации
+🚒 **Пожарные**: классификация пожаров, выбор огнетушащих веществ, опасные материалы  
+👮 **Полиция**: статьи УК РФ и КоАП, процедуры задержания, права граждан
+🆘 **Спасатели**: методы поиска людей, время выживания, влияние погоды на операции
+
+**Основные команды:**
+├ `/poison [название]` - противоядие при отравлении
+├ `/dose [лекарство] [вес]` - расчет дозировки препарата  
+├ `/fire [класс]` - способы тушения пожара
+└ `/law [статья]` - текст статьи закона
+
+💡 **Совет:** Нажмите на команду чтобы скопировать её
+
+Полный справочник команд
+└`/help`
+
+**Разработчик:** @kitay9
+**Версия:** 2.0 | **Статус:** Активная разработка
+""")
+
+# Справка /help
+HELP = compile_markdown("""
+📚 **Список всех команд:**
+
+**🚑 МЕДИЦИНА:**
+• `/dose [лекарство] [вес]` - расчет дозировки
+• `/poison [вещество]` - информация о противоядии
+• `/drug [название]` - информация о лекарстве
+• `/resus` - алгоритм реанимации
+
+**🚒 ПОЖАРНЫЕ:**
+• `/fire [класс]` - способы тушения (A, B, C, D, E)
+• `/hazmat [вещество]` - опасные вещества
+• `/evacuation` - алгоритм эвакуации
+
+**👮 ПОЛИЦИЯ:**
+• `/law [номер статьи]` - текст статьи УК РФ
+• `/admin [номер]` - статьи КоАП
+• `/protocol [тип]` - шаблон протокола
+• `/rights` - права человека при задержании
+
+**🆘 СПАСАТЕЛИ:**
+• `/search [метод]` - методы поиска
+• `/survival [условия]` - время выживания
+• `/weather` - влияние погоды на операции
+
+**🤖 ИИ ПОМОЩНИК** (ответ по справочнику бота, без сети):
+• `/ai_symptoms [симптомы]` - подходящие отравления и препараты
+• `/ai_protocol [ситуация]` - порядок действий
+• `/ai_legal [ситуация]` - подходящие статьи УК и КоАП
+• `/ai_checklist [ситуация]` - чек-лист ЧС
+
+**🌍 ОБЩИЕ:**
+• `/contacts [служба]` - экстренные контакты
+• `/nearest` - ближайшие больницы, пожарные части и полиция по геопозиции
+• `/checklist [тип ЧС]` - алгоритм действий
+
+💡 **Совет:** Нажмите на любую команду чтобы скопировать её
+""")
+
+# Медицинские алгоритмы
+MED_ALGO = compile_markdown("""
+🩺 **Медицинские алгоритмы**
+
+**Основные протоколы:**
+• 🫀 СЛР - нажмите "Реанимация" выше
+• 🤕 Травмы - оценка по шкале ABC
+• 🔥 Ожоги - правило девяток
+• 💔 Инфаркт - алгоритм МОНА
+• 🧠 Инсульт - шкала FAST
+
+**Шкала ABC (травмы):**
+• **A** - Airway (дыхательные пути)
+• **B** - Breathing (дыхание) 
+• **C** - Circulation (кровообращение)
+
+**Шкала FAST (инсульт):**
+• **F** - Face (лицо) - перекос
+• **A** - Arms (руки) - слабость
+• **S** - Speech (речь) - нарушения
+• **T** - Time (время) - вызов 103
+""")
+
+# Огнетушащие вещества
+FIRE_EXTINGUISH = compile_markdown("""
+🧯 **Огнетушащие вещества**
+
+**Типы огнетушителей:**
+• **Водные** - класс A (твердые вещества)
+• **Пенные** - класс A, B (жидкости) 
+• **Порошковые** - универсальные ABC
+• **Углекислотные** - класс B, C, E
+• **Хладоновые** - электроника, музеи
+
+**⚠️ ЗАПРЕЩЕНО:**
+• Вода на класс B, D, E
+• Пена на электроустановки
+• Любые средства на активные металлы без спецпорошков
+
+**Правило выбора:**
+1. Определить класс пожара
+2. Выбрать подходящее средство
+3. Проверить безопасность применения
+""")
+
+# Классы опасных веществ
+FIRE_HAZMAT = compile_markdown("""
+☣️ **Опасные вещества**
+
+**Классы опасности:**
+• **Класс 1** - Взрывчатые вещества
+• **Класс 2** - Газы (воспламеняющиеся, токсичные)
+• **Класс 3** - Легковоспламеняющиеся жидкости
+• **Класс 4** - Твердые вещества, самовозгорающиеся
+• **Класс 5** - Окисляющие вещества
+• **Класс 6** - Токсичные вещества
+• **Класс 7** - Радиоактивные материалы
+• **Класс 8** - Едкие и коррозионные вещества
+• **Класс 9** - Прочие опасные вещества
+
+**🚨 При работе с HAZMAT:**
+1. Определить класс опасности
+2. Использовать СИЗ
+3. Обеспечить вентиляцию
+4. Подготовить нейтрализующие средства
+
+**Поиск вещества:** `/hazmat [номер ООН или название]`
+Например: `/hazmat 1017`, `/hazmat аммиак`
+""")
+
+# Алгоритм эвакуации
+FIRE_EVAC = compile_markdown("""
+🚪 **Алгоритм эвакуации**
+
+**Порядок действий:**
+
+**1. Оповещение (1-2 мин):**
+• Включить сигнализацию
+• Объявить по громкой связи
+• Сообщить в службы: 101, 112
+
+**2. Эвакуация людей (5-10 мин):**
+• Открыть все эвакуационные выходы
+• Отключить лифты (кроме пожарных)
+• Проверить все помещения
+• Помочь маломобильным
+
+**3. Встреча служб:**
+• Встретить пожарных у въезда
+• Передать планы здания
+• Сообщить о людях внутри
+• Указать места отключения коммуникаций
+
+**⚠️ Запрещено:**
+• Использовать лифты
+• Открывать горячие двери
+• Возвращаться за вещами
+• Прятаться в дальних помещениях
+""")
+
+# Права граждан при задержании
+POLICE_RIGHTS = compile_markdown("""
+🛡️ **Права граждан при задержании**
+
+**При задержании гражданин имеет право:**
+• Знать основание и причину задержания
+• Уведомить близких о задержании
+• Пользоваться услугами переводчика
+• Обращаться за медпомощью
+• Требовать адвоката (с момента задержания)
+• Не свидетельствовать против себя (ст. 51 Конституции)
+
+**Сроки задержания:**
+• **Административное** - до 3 часов (48 часов по отдельным статьям)
+• **Уголовное** - до 48 часов (до 72 часов с санкции суда)
+
+**⚠️ Важно:**
+• Задержанный не обязан отвечать на вопросы до прибытия адвоката
+• Протокол задержания составляется немедленно
+• При нарушении прав - жалоба прокурору/в суд
+""")
+
+# Шаблоны протоколов
+POLICE_PROTOCOLS = compile_markdown("""
+📝 **Шаблоны протоколов**
+
+**Протокол об административном правонарушении:**
+
+**Обязательные сведения:**
+• Дата, время, место составления
+• ФИО, должность, звание составителя
+• Сведения о лице, привлекаемом к ответственности
+• Место, время совершения правонарушения
+• Описание события правонарушения
+• Статья КоАП РФ
+• Объяснение лица (отказ от объяснения)
+• Свидетели, потерпевшие (если есть)
+
+**Образец записи события:**
+"[Дата] в [время] по адресу [адрес] гр. [ФИО], [год рождения], [документы], совершил административное правонарушение, выразившееся в [описание действий], что предусмотрено статьей [номер] КоАП РФ."
+
+**Протокол задержания:**
+• Основания задержания
+• Дата, время начала и окончания
+• Место задержания
+• Результаты личного досмотра
+• Уведомление близких/работодателя
+
+**⚠️ Важно:**
+• Протокол составляется немедленно
+• Копия вручается нарушителю
+• При отказе от подписи - отметка в протоколе
+""")
+
+# Методы поиска пропавших
+RESCUE_SEARCH = compile_markdown("""
+🔍 **Методы поиска пропавших людей**
+
+**Основные методы:**
+
+**1. Звуковой поиск:**
+• Голосовые вызовы каждые 3-5 минут
+• Свистки, рупоры, мегафоны
+• Прослушка в тишине 1-2 минуты
+
+**2. Визуальный поиск:**
+• Осмотр местности "зигзагом"
+• Использование биноклей, прожекторов
+• Поиск следов, меток, предметов
+
+**3. Технический поиск:**
+• Радиосвязь, мобильная связь
+• GPS-трекеры, радиомаяки
+• Тепловизоры (ночью/в холод)
+• Дроны с камерами
+
+**4. Кинологический поиск:**
+• Поисковые собаки по запаху
+• Работа по следу
+• Поиск в завалах
+
+**⏰ Временные рамки:**
+• **Первые 3 часа** - максимальная активность
+• **До 24 часов** - критический период
+• **72 часа** - предел выживания без воды
+""")
+
+# Время выживания
+RESCUE_SURVIVAL = compile_markdown("""
+🏔️ **Время выживания в экстремальных условиях**
+
+**Правило "3-х":**
+• **3 минуты** без воздуха (утопление, завал)
+• **3 часа** без тепла (гипотермия)  
+• **3 дня** без воды
+• **3 недели** без еды
+
+**Конкретные условия:**
+
+**Температурные:**
+• **-40°C** - 30 минут без защиты
+• **-20°C** - 1-2 часа
+• **0°C и ветер** - 3-6 часов  
+• **+50°C без воды** - 6-12 часов
+
+**В воде:**
+• **0°C** - 15-30 минут
+• **10°C** - 1-3 часа
+• **20°C** - 12-20 часов
+
+**Без воды:**
+• **Жара +40°C** - 24-48 часов
+• **Умеренный климат** - 3-5 дней
+• **Холод** - 7-10 дней
+
+**⚠️ Факторы, сокращающие время:**
+• Паника, стресс
+• Ранения, болезни
+• Физическая активность
+• Алкоголь, наркотики
+""")
+
+# Влияние погоды
+RESCUE_WEATHER = compile_markdown("""
+🌦️ **Влияние погоды на спасательные операции**
+
+**Дождь/снег:**
+• Ухудшение видимости (до 10-50 м)
+• Размытие следов
+• Риск переохлаждения
+• Проблемы с радиосвязью
+
+**Ветер:**
+• **До 10 м/с** - допустимо
+• **10-15 м/с** - осложнения с авиацией
+• **Свыше 15 м/с** - запрет полетов
+• Снос звука, затруднение поиска
+
+**Туман:**
+• Видимость менее 50 м
+• Дезориентация спасателей
+• Запрет авиационного поиска
+• Использование GPS обязательно
+
+**Температура:**
+• **Ниже -20°C** - ограничение времени работы
+• **Выше +35°C** - риск теплового удара
+• Необходимость смены команд каждые 2-4 часа
+
+**⚠️ Критические условия (прекращение поиска):**
+• Гроза с молниями
+• Метель с видимостью <10 м
+• Лавинная опасность 4-5 баллов
+• Сели, наводнения
+""")
+
+# Связь в спасательных операциях
+RESCUE_COMMS = compile_markdown("""
+📡 **Связь в спасательных операциях**
+
+**Частоты связи:**
+• **МЧС России**: 149.200 - 149.800 МГц
+• **Авиационная**: 121.5 МГц (аварийная)
+• **Морская**: 156.800 МГц (16 канал)
+• **Любительская**: 145.500 МГц (R5)
+
+**Протокол радиосвязи:**
+1. **"[Позывной] - [Позывной], прием!"**
+2. Ждать ответа 3-5 секунд
+3. Повторить 3 раза, затем пауза
+4. Говорить четко, медленно
+5. Заканчивать: **"Конец связи"**
+
+**Сигналы бедствия:**
+• **SOS** - ... --- ... (3 коротких, 3 длинных, 3 коротких)
+• **MAYDAY** - голосом по радио (3 раза)
+• **PAN-PAN** - срочность (не смертельная опасность)
+
+**Мобильная связь:**
+• **112** - работает без SIM-карты
+• SMS при слабом сигнале
+• Экономия батареи (режим полета с периодическим включением)
+• Запасные аккумуляторы, power bank
+
+**⚠️ При отсутствии связи:**
+• Подъем на возвышенность
+• Использование отражателей, зеркал
+• Дымовые сигналы (3 столба дыма)
+• Сигнальные ракеты
+""")
+
+# Главное меню (кнопка "Главное меню")
+MAIN_MENU = compile_markdown("""
+🚨 **112help - Помощник экстренных служб** 🚨
+
+Профессиональный бот для сотрудников экстренных служб РФ.
+Быстрый доступ к важной информации в критических ситуациях.
+
+📖 **Подробности миссии:** [Посмотреть](https://telegra.ph/Cifrovoj-pomoshchnik-ehkstrennyh-sluzhb-06-12)
+
+🚑 **Медицина**: расчет дозировок препаратов, противоядия при отравлениях, алгоритмы реанимации
+🚒 **Пожарные**: классификация пожаров, выбор огнетушащих веществ, опасные материалы  
+👮 **Полиция**: статьи УК РФ и КоАП, процедуры задержания, права граждан
+🆘 **Спасатели**: методы поиска людей, время выживания, влияние погоды на операции
+
+**Основные команды:**
+├ `/poison [название]` - противоядие при отравлении
+├ `/dose [лекарство] [вес]` - расчет дозировки препарата  
+├ `/fire [класс]` - способы тушения пожара
+└ `/law [статья]` - текст статьи закона
+
+💡 **Совет:** Нажмите на команду чтобы скопировать её
+
+Полный справочник команд
+└`/help`
+
+**Разработчик:** @kitay9
+**Версия:** 2.0 | **Статус:** Активная разработка
+""")
+
+# Меню разделов
+MED_MENU = compile_markdown("🚑 **Медицинский раздел**\n\nВыберите нужную категорию:")
+
+FIRE_MENU = compile_markdown("🚒 **Пожарная служба**\n\nВыберите нужную категорию:")
+
+POLICE_MENU = compile_markdown("👮 **Полиция**\n\nВыберите нужную категорию:")
+
+RESCUE_MENU = compile_markdown("🆘 **Спасательная служба**\n\nВыберите нужную категорию:")
+
+# ИИ помощник: ответы по справочнику (utils/retrieval.py)
+AI_MENU = compile_markdown("**ИИ Помощник**\n\nОпишите ситуацию своими словами - бот подберет подходящие карточки справочника: яды, лекарства, статьи УК и КоАП, опасные вещества, алгоритмы служб.\n\nОтвет строится по локальной базе бота и работает без интернета.\n\n• Анализ симптомов - `/ai_symptoms [симптомы]`\n• Порядок действий - `/ai_protocol [ситуация]`\n• Правовая справка - `/ai_legal [ситуация]`\n• Чек-лист ЧС - `/ai_checklist [ситуация]`")
+
+AI_SYMPTOMS = compile_markdown("🩺 **Анализ симптомов**\n\nОпишите симптомы после команды - бот найдет подходящие отравления, препараты и алгоритмы помощи.\n\nПример: `/ai_symptoms судороги, рвота, металлический привкус`\n\n⚠️ Это справка, а не диагноз. При угрозе жизни звоните **112**.")
+
+AI_PROTOCOL = compile_markdown("📝 **Порядок действий**\n\nОпишите происшествие - бот подберет алгоритмы служб, классы пожаров и аварийные карточки опасных веществ.\n\nПример: `/ai_protocol утечка хлора на предприятии`\n\nШаблоны протоколов - в разделе 'Полиция'.")
+
+AI_LEGAL = compile_markdown("⚖️ **Правовая справка**\n\nОпишите ситуацию - бот найдет подходящие статьи УК РФ и КоАП и памятку о правах граждан.\n\nПример: `/ai_legal управление в состоянии опьянения`\n\nСверяйтесь с действующей редакцией кодексов.")
+
+AI_CHECKLIST = compile_markdown("**Чек-лист ЧС**\n\nОпишите чрезвычайную ситуацию - бот соберет алгоритмы спасателей, пожарных и карточки опасных веществ.\n\nПример: `/ai_checklist поиск пропавшего человека`")
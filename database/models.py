@@ -1,9 +1,15 @@
 from motor.motor_asyncio import AsyncIOMotorClient
 from datetime import datetime, timedelta
+import asyncio
+import itertools
 import os
 import json
 from dotenv import load_dotenv
 
+from utils.activity import activity_series
+from utils.metrics import track_storage
+from utils.tracing import traced
+
 load_dotenv()
 
 class Database:
@@ -15,6 +21,27 @@ class Database:
     local_storage_file = "local_users.json"
     text_storage_file = "users.txt"
     
+    @staticmethod
+    def _parse_text_line(line):
+        """Разбор строки users.txt (None - пустая строка или неверный формат)"""
+        line = line.strip()
+        if not line or '|' not in line:
+            return None
+        parts = line.split('|')
+        if len(parts) < 6:
+            return None
+        return {
+            'user_id': int(parts[0]),
+            'username': parts[1] if parts[1] != 'None' else None,
+            'first_name': parts[2] if parts[2] != 'None' else None,
+            'last_name': parts[3] if parts[3] != 'None' else None,
+            'registration_date': datetime.fromisoformat(parts[4]),
+            'last_activity': datetime.fromisoformat(parts[5]),
+            'command_count': int(parts[6]) if len(parts) > 6 else 0,
+            'is_blocked': parts[7].lower() == 'true' if len(parts) > 7 else False,
+            'bot_blocked': parts[8].lower() == 'true' if len(parts) > 8 else False
+        }
+
     @classmethod
     def _load_text_storage(cls):
         """Загрузка пользователей из текстового файла"""
@@ -23,43 +50,94 @@ class Database:
             if os.path.exists(cls.text_storage_file):
                 with open(cls.text_storage_file, 'r', encoding='utf-8') as f:
                     for line_num, line in enumerate(f, 1):
-                        line = line.strip()
-                        if line and '|' in line:
-                            try:
-                                parts = line.split('|')
-                                if len(parts) >= 6:
-                                    user_id = parts[0]
-                                    username = parts[1] if parts[1] != 'None' else None
-                                    first_name = parts[2] if parts[2] != 'None' else None
-                                    last_name = parts[3] if parts[3] != 'None' else None
-                                    reg_date = datetime.fromisoformat(parts[4])
-                                    last_activity = datetime.fromisoformat(parts[5])
-                                    command_count = int(parts[6]) if len(parts) > 6 else 0
-                                    is_blocked = parts[7].lower() == 'true' if len(parts) > 7 else False
-                                    
-                                    users[user_id] = {
-                                        'user_id': int(user_id),
-                                        'username': username,
-                                        'first_name': first_name,
-                                        'last_name': last_name,
-                                        'registration_date': reg_date,
-                                        'last_activity': last_activity,
-                                        'command_count': command_count,
-                                        'is_blocked': is_blocked
-                                    }
-                            except (ValueError, IndexError) as e:
-                                print(f"⚠️ Ошибка парсинга строки {line_num}: {e}")
+                        try:
+                            user_data = cls._parse_text_line(line)
+                            if user_data:
+                                users[str(user_data['user_id'])] = user_data
+                        except (ValueError, IndexError) as e:
+                            print(f"⚠️ Ошибка парсинга строки {line_num}: {e}")
         except Exception as e:
             print(f"❌ Ошибка загрузки текстового хранилища: {e}")
         return users
-    
+
+    @classmethod
+    def _iter_text_storage(cls):
+        """Построчное чтение users.txt без загрузки файла в память"""
+        if not os.path.exists(cls.text_storage_file):
+            return
+        with open(cls.text_storage_file, 'r', encoding='utf-8') as f:
+            for line_num, line in enumerate(f, 1):
+                try:
+                    user_data = cls._parse_text_line(line)
+                except (ValueError, IndexError) as e:
+                    print(f"⚠️ Ошибка парсинга строки {line_num}: {e}")
+                    continue
+                if user_data:
+                    yield user_data
+
+    @classmethod
+    def _iter_local_storage(cls, chunk_size: int = 65536):
+        """Потоковое чтение local_users.json по одной записи
+
+        Файл - один JSON объект {user_id: {...}}; записи разбираются
+        raw_decode по мере чтения кусков, поэтому в памяти держится только
+        текущий кусок и одна запись.
+        """
+        if not os.path.exists(cls.local_storage_file):
+            return
+        decoder = json.JSONDecoder()
+        with open(cls.local_storage_file, 'r', encoding='utf-8') as f:
+            buffer = ""
+            position = 0
+            eof = False
+
+            def skip(chars):
+                # Пропуск пробелов и разделителей, при нехватке данных - дочитывание
+                nonlocal buffer, position, eof
+                while True:
+                    while position < len(buffer) and (buffer[position].isspace() or buffer[position] in chars):
+                        position += 1
+                    if position < len(buffer) or eof:
+                        return
+                    buffer, position = f.read(chunk_size), 0
+                    eof = not buffer
+
+            def decode():
+                # Разбор следующего JSON значения с дочитыванием неполного куска
+                nonlocal buffer, position, eof
+                while True:
+                    try:
+                        value, end = decoder.raw_decode(buffer, position)
+                        position = end
+                        return value
+                    except json.JSONDecodeError:
+                        if eof:
+                            raise
+                        chunk = f.read(chunk_size)
+                        eof = not chunk
+                        buffer = buffer[position:] + chunk
+                        position = 0
+
+            skip("{")
+            while True:
+                skip(",")
+                if eof and position >= len(buffer) or buffer[position:position + 1] == "}":
+                    return
+                decode()
+                skip(":")
+                user_data = decode()
+                for field in ('registration_date', 'last_activity'):
+                    if isinstance(user_data.get(field), str):
+                        user_data[field] = datetime.fromisoformat(user_data[field])
+                yield user_data
+
     @classmethod
     def _save_text_storage(cls, users):
         """Сохранение пользователей в текстовый файл"""
         try:
             with open(cls.text_storage_file, 'w', encoding='utf-8') as f:
                 for user_data in users.values():
-                    line = f"{user_data['user_id']}|{user_data.get('username', 'None')}|{user_data.get('first_name', 'None')}|{user_data.get('last_name', 'None')}|{user_data['registration_date'].isoformat()}|{user_data['last_activity'].isoformat()}|{user_data.get('command_count', 0)}|{user_data.get('is_blocked', False)}\n"
+                    line = f"{user_data['user_id']}|{user_data.get('username', 'None')}|{user_data.get('first_name', 'None')}|{user_data.get('last_name', 'None')}|{user_data['registration_date'].isoformat()}|{user_data['last_activity'].isoformat()}|{user_data.get('command_count', 0)}|{user_data.get('is_blocked', False)}|{user_data.get('bot_blocked', False)}\n"
                     f.write(line)
         except Exception as e:
             print(f"❌ Ошибка сохранения текстового хранилища: {e}")
@@ -135,6 +213,15 @@ class Database:
             print(f"📄 Переключение на текстовое хранилище: {cls.text_storage_file}")
             cls.connected = False
 
+    @classmethod
+    def storage_type(cls):
+        """Текущий тип хранилища: mongodb, json_backup или text_file"""
+        if cls.connected and cls.use_mongodb:
+            return "mongodb"
+        if cls.use_mongodb:
+            return "json_backup"
+        return "text_file"
+
     @classmethod
     async def connect(cls):
         """Алиас для connect_to_mongo() для совместимости"""
@@ -147,6 +234,12 @@ class Database:
             cls.client.close()
             print("❌ Подключение к MongoDB закрыто")
 
+def _timed(operation: str):
+    """Замер времени операции хранилища (метрики и спан трассировки)"""
+    def decorator(func):
+        return track_storage(operation, Database.storage_type)(traced("storage", operation)(func))
+    return decorator
+
 class User:
     def __init__(self, user_id: int, username: str = None, first_name: str = None, 
                  last_name: str = None, is_blocked: bool = False):
@@ -159,6 +252,8 @@ class User:
         self.last_activity = datetime.now()
         self.command_count = 0
         self.warnings_count = 0
+        # Пользователь заблокировал бота (ответ 403 при рассылке)
+        self.bot_blocked = False
 
     def to_dict(self):
         """Преобразование в словарь для MongoDB"""
@@ -172,10 +267,12 @@ class User:
             "is_blocked": self.is_blocked,
             "last_activity": self.last_activity,
             "command_count": self.command_count,
-            "warnings_count": self.warnings_count
+            "warnings_count": self.warnings_count,
+            "bot_blocked": self.bot_blocked
         }
 
     @classmethod
+    @_timed("create_user")
     async def create_user(cls, user_id: int, username: str = None, 
                          first_name: str = None, last_name: str = None):
         """Создание нового пользователя в базе данных"""
@@ -193,12 +290,14 @@ class User:
                 users = Database._load_text_storage()
                 users[str(user_id)] = user.to_dict()
                 Database._save_text_storage(users)
+            activity_series.record_new()
             return user
         except Exception as e:
             print(f"❌ Ошибка создания пользователя: {e}")
             return None
 
     @classmethod
+    @_timed("get_user")
     async def get_user(cls, user_id: int):
         """Получение пользователя из базы данных"""
         try:
@@ -225,12 +324,64 @@ class User:
                 user.last_activity = user_data.get("last_activity", datetime.now())
                 user.command_count = user_data.get("command_count", 0)
                 user.warnings_count = user_data.get("warnings_count", 0)
+                user.bot_blocked = user_data.get("bot_blocked", False)
                 return user
             return None
         except Exception as e:
             print(f"❌ Ошибка получения пользователя: {e}")
             return None
 
+    @classmethod
+    async def iter_users(cls, batch_size: int = 1000, after_user_id: int = None, position: int = 0):
+        """Асинхронный обход всех пользователей пачками (списки словарей)
+
+        MongoDB читается курсором с batch_size по возрастанию user_id,
+        файловые хранилища - построчно в фоновом потоке в порядке файла;
+        память не зависит от числа пользователей. Возобновление рассылки:
+        в MongoDB обход продолжается после after_user_id, в файлах - после
+        первых position записей (after_user_id - последняя из них; если там
+        другой пользователь, файл изменился, и об этом пишется предупреждение).
+        """
+        if Database.connected and Database.use_mongodb:
+            query = {} if after_user_id is None else {"_id": {"$gt": after_user_id}}
+            batch = []
+            async for user_data in Database.db.users.find(query, batch_size=batch_size).sort("_id", 1):
+                batch.append(user_data)
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+            return
+
+        if Database.use_mongodb:
+            records = Database._iter_local_storage()
+        else:
+            records = Database._iter_text_storage()
+        if position:
+            def skip():
+                # Последняя из пропущенных записей - для проверки, что файл не изменился
+                last = None
+                for last in itertools.islice(records, position):
+                    pass
+                return last
+
+            last = await asyncio.to_thread(skip)
+            if after_user_id is not None and (last is None or last['user_id'] != after_user_id):
+                print(
+                    f"⚠️ Хранилище изменилось с контрольной точки: на позиции {position} не пользователь "
+                    f"{after_user_id}, обход продолжается с позиции {position}"
+                )
+
+        def take():
+            return [user_data for _, user_data in zip(range(batch_size), records)]
+
+        while True:
+            batch = await asyncio.to_thread(take)
+            if not batch:
+                return
+            yield batch
+
     @classmethod
     async def get_or_create_user(cls, user_id: int, username: str = None, 
                                 first_name: str = None, last_name: str = None):
@@ -240,6 +391,7 @@ class User:
             user = await cls.create_user(user_id, username, first_name, last_name)
         return user
 
+    @_timed("update_activity")
     async def update_activity(self):
         """Обновление активности пользователя"""
         try:
@@ -250,7 +402,7 @@ class User:
                 await Database.db.users.update_one(
                     {"user_id": self.user_id},
                     {
-                        "$set": {"last_activity": self.last_activity},
+                        "$set": {"last_activity": self.last_activity, "bot_blocked": False},
                         "$inc": {"command_count": 1}
                     }
                 )
@@ -260,6 +412,7 @@ class User:
                 if str(self.user_id) in local_data:
                     local_data[str(self.user_id)]["last_activity"] = self.last_activity
                     local_data[str(self.user_id)]["command_count"] = self.command_count
+                    local_data[str(self.user_id)]["bot_blocked"] = False
                     Database._save_local_storage(local_data)
             else:
                 # Обновление в текстовом файле
@@ -267,6 +420,7 @@ class User:
                 if str(self.user_id) in users:
                     users[str(self.user_id)]["last_activity"] = self.last_activity
                     users[str(self.user_id)]["command_count"] = self.command_count
+                    users[str(self.user_id)]["bot_blocked"] = False
                     Database._save_text_storage(users)
         except Exception as e:
             print(f"❌ Ошибка обновления активности: {e}")
@@ -302,6 +456,33 @@ class User:
         except Exception as e:
             print(f"❌ Ошибка разблокировки пользователя: {e}")
 
+    @staticmethod
+    @_timed("mark_bot_blocked")
+    async def mark_bot_blocked(user_ids):
+        """Отметка пользователей, заблокировавших бота (одна запись на пачку)"""
+        if not user_ids:
+            return
+        try:
+            if Database.connected and Database.use_mongodb:
+                await Database.db.users.update_many(
+                    {"user_id": {"$in": list(user_ids)}},
+                    {"$set": {"bot_blocked": True}}
+                )
+            elif Database.use_mongodb:
+                local_data = Database._load_local_storage()
+                for user_id in user_ids:
+                    if str(user_id) in local_data:
+                        local_data[str(user_id)]["bot_blocked"] = True
+                Database._save_local_storage(local_data)
+            else:
+                users = Database._load_text_storage()
+                for user_id in user_ids:
+                    if str(user_id) in users:
+                        users[str(user_id)]["bot_blocked"] = True
+                Database._save_text_storage(users)
+        except Exception as e:
+            print(f"❌ Ошибка отметки заблокировавших бота: {e}")
+
     async def add_warning(self):
         """Добавление предупреждения пользователю"""
         try:
@@ -314,6 +495,7 @@ class User:
             print(f"❌ Ошибка добавления предупреждения: {e}")
 
     @staticmethod
+    @_timed("get_user_stats")
     async def get_user_stats():
         """Получение статистики пользователей для админов"""
         try:
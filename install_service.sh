@@ -77,6 +77,7 @@ fi
 echo "Создание директории $INSTALL_DIR..."
 mkdir -p "$INSTALL_DIR"
 mkdir -p "$INSTALL_DIR/logs"
+mkdir -p "$INSTALL_DIR/data/state"
 
 # Копирование файлов
 echo "Копирование файлов проекта..."
@@ -3,26 +3,53 @@ import logging
 from datetime import datetime, timedelta
 from collections import defaultdict
 from aiogram import Bot, Dispatcher, types, F
-from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, BotCommand
+from aiogram.types import (
+    Message, InlineKeyboardMarkup, InlineKeyboardButton, BotCommand, FSInputFile, ReplyKeyboardMarkup, KeyboardButton
+)
 from aiogram.filters import Command
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums.parse_mode import ParseMode
 from data.emergency_data import EmergencyData
+from data import texts
+from data.hazmat import hazmat_db
+from data.facilities import FACILITY_TYPES, facility_index
 import os
 from dotenv import load_dotenv
-import re
 import time
-from typing import Dict
 
-from database.models import Database, User, CommandLog
-from utils.logger import get_logger, log_info, log_error, log_warning, log_user_action, log_security_event
+from database.models import Database, User
+from utils.logger import get_logger
+from utils.metrics import (
+    METRICS_ENABLED, METRICS_HOST, METRICS_PORT, commands_total, callbacks_total, handler_duration,
+    rate_limit_rejections_total, bans_total, banned_users as banned_users_gauge, callback_label,
+    monitor_event_loop_lag, start_metrics_server
+)
+from utils.tracing import start_trace, finish_trace, span
+from utils.audit import user_audit
+from utils.capture import update_capture
+from utils.send_queue import SEND_QUEUE_ENABLED, send_queue
+from utils.scheduling import scheduler
+from utils.overload import OVERLOAD_ENABLED, overload_guard
+from utils.stats import user_stats
+from utils.activity import ACTIVITY_FILE, SECTION_TITLES, SECTIONS, activity_series, sparkline
+from utils.export import EXPORT_FORMATS, TELEGRAM_UPLOAD_LIMIT, export_users
+from utils.broadcast import broadcaster, strip_command
+from utils.screens import edit_screen
+from utils.state import worker_path
+from utils.pagination import PAGE_PREFIX, page_buttons, parse_cursor
+from utils.rich_text import compile_markdown
+from utils.retrieval import knowledge_index
+from utils.webhook import BOT_MODE, run_webhook, webhook_secret
+from utils.workers import WORKERS, run_workers
 
 # Загрузка переменных окружения
 load_dotenv()
 
-# Настройка логирования
-logging.basicConfig(level=logging.INFO)
+# Настройка логирования (запись в фоновом потоке через очередь)
+get_logger()
 logger = logging.getLogger(__name__)
+# aiogram пишет INFO на каждый апдейт - активность учитывается в потоке действий (utils/audit.py)
+logging.getLogger("aiogram.event").setLevel(logging.WARNING)
 
 # Инициализация бота
 BOT_TOKEN = os.getenv('BOT_TOKEN')
@@ -40,12 +67,22 @@ dp = Dispatcher()
 
 # Инициализация данных
 emergency_data = EmergencyData()
+# Готовые карточки для упрощенного режима (до fork, чтобы обработчики разделяли память)
+emergency_data.prerender_cards()
+# База опасных веществ отображается в память до fork - страницы общие для обработчиков
+hazmat_db.load()
+facility_index.load()
+# Индекс справочника для /ai_* - после базы опасных веществ, ее карточки тоже индексируются
+knowledge_index.build(emergency_data.retrieval_documents())
+# Алгоритм СЛР не меняется - разбирается в текст и сущности один раз
+resuscitation_text = compile_markdown(emergency_data.get_resuscitation_algorithm())
 
 # === АНТИСПАМ СИСТЕМА ===
 user_requests = defaultdict(list)
 MAX_REQUESTS_PER_MINUTE = 30
 SPAM_BAN_DURATION = 300  # 5 минут бана
 banned_users = {}
+banned_users_gauge.set_function(lambda: sum(1 for until in banned_users.values() if until > datetime.now()))
 
 # Получение списка админов
 ADMIN_IDS = []
@@ -78,20 +115,121 @@ def check_rate_limit(user_id: int) -> bool:
     if len(user_requests[user_id]) >= MAX_REQUESTS_PER_MINUTE:
         # Бан пользователя
         banned_users[user_id] = now + timedelta(seconds=SPAM_BAN_DURATION)
+        bans_total.inc()
+        user_audit.security(user_id, f"бан за превышение лимита {MAX_REQUESTS_PER_MINUTE} запросов/мин на {SPAM_BAN_DURATION}с")
         return False
     
     # Добавление нового запроса
     user_requests[user_id].append(now)
     return True
 
+def render_card(key, render, *args) -> str:
+    """Текст карточки: при перегрузке - заранее подготовленный, иначе свежий"""
+    if overload_guard.degraded:
+        card = emergency_data.cards.get(key)
+        if card is not None:
+            return card
+    return render(*args)
+
+# Кнопка возврата из каталога: раздел каталога -> (текст, callback_data)
+CATALOG_BACK = {
+    "law": ("К полиции", "police"),
+    "admin": ("К полиции", "police"),
+    "dose": ("К медицине", "med"),
+    "poison": ("К медицине", "med")
+}
+
+async def show_catalog_page(message: types.Message, section: str, page: int = 0):
+    """Страница каталога (УК, КоАП, лекарства, яды) с кнопками листания"""
+    text, page, pages = emergency_data.get_catalog_page(section, page)
+    back_text, back_data = CATALOG_BACK[section]
+    keyboard = [page_buttons(section, page, pages)] if pages > 1 else []
+    keyboard.append([InlineKeyboardButton(text=back_text, callback_data=back_data)])
+    keyboard.append([InlineKeyboardButton(text="Главное меню", callback_data="back")])
+    await edit_screen(
+        message,
+        text,
+        reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard),
+        parse_mode="Markdown"
+    )
+
+def get_update_name(update: types.Update) -> str:
+    """Короткое имя апдейта для трассировки: команда или префикс callback_data"""
+    if update.message and update.message.text:
+        first_word = update.message.text.split(maxsplit=1)[0] if update.message.text.strip() else ""
+        if first_word.startswith("/"):
+            return first_word.split("@", 1)[0][:32]
+        return "text"
+    if update.callback_query:
+        return callback_label(update.callback_query.data)
+    return update.event_type
+
+# Трассировка: контекст с trace_id на каждый апдейт, медленные апдейты пишутся в лог
+@dp.update.outer_middleware()
+async def tracing_middleware(handler, event: types.Update, data):
+    user = data.get("event_from_user")
+    token = start_trace(event.event_type, user.id if user else None, get_update_name(event))
+    try:
+        return await handler(event, data)
+    finally:
+        finish_trace(token)
+
+# Запись анонимизированных апдейтов для воспроизведения (UPDATE_CAPTURE_FILE)
+async def capture_middleware(handler, event: types.Update, data):
+    update_capture.record(event)
+    return await handler(event, data)
+
+if update_capture.enabled:
+    dp.update.outer_middleware(capture_middleware)
+
+# Планировщик: ограничение одновременной обработки с приоритетом экстренных справок
+# (выставляет и приоритет исходящих ответов в очереди отправки)
+dp.update.outer_middleware(scheduler)
+
+# Спаны вызовов Telegram API
+@bot.session.middleware()
+async def telegram_api_tracing_middleware(make_request, bot, method):
+    with span("telegram", method.__api_method__):
+        return await make_request(bot, method)
+
+# Очередь отправки с лимитами Telegram (30/с на бота, 1/с на чат) и повтором после 429
+if SEND_QUEUE_ENABLED:
+    bot.session.middleware(send_queue)
+
+# Защита от перегрузки учитывает апдейты в ожидании слота и ответы в очереди отправки
+overload_guard.queue_sources.append(lambda: scheduler.depth)
+overload_guard.queue_sources.append(lambda: send_queue.depth)
+
+# Middleware для сбора метрик (регистрируется первым, чтобы учитывать антиспам)
+@dp.message.middleware()
+async def message_metrics_middleware(handler, event: Message, data):
+    command = data.get("command")
+    name = command.command.lower() if command else "text"
+    commands_total.inc(name)
+    started = time.perf_counter()
+    try:
+        return await handler(event, data)
+    finally:
+        handler_duration.observe(time.perf_counter() - started, "message", name)
+
+@dp.callback_query.middleware()
+async def callback_metrics_middleware(handler, event, data):
+    name = callback_label(event.data)
+    callbacks_total.inc(name)
+    started = time.perf_counter()
+    try:
+        return await handler(event, data)
+    finally:
+        handler_duration.observe(time.perf_counter() - started, "callback", name)
+
 # Middleware для антиспама
 @dp.message.middleware()
 async def anti_spam_middleware(handler, event: Message, data):
     user_id = event.from_user.id
     
-    # Регистрация пользователя (создание или обновление активности)
+    # Регистрация пользователя (создание или обновление активности); при перегрузке пропускается
     try:
-        user = await User.get_or_create_user(
+        user = None if overload_guard.degraded else await User.get_or_create_user(
             user_id=user_id,
             username=event.from_user.username,
             first_name=event.from_user.first_name,
@@ -104,17 +242,23 @@ async def anti_spam_middleware(handler, event: Message, data):
     
     # Проверка на блокировку
     if is_user_banned(user_id):
+        rate_limit_rejections_total.inc("banned")
         await event.answer("🚫 Вы заблокированы за нарушение правил использования бота.")
         return
     
     # Rate limiting
     if not check_rate_limit(user_id):
+        rate_limit_rejections_total.inc("rate_limit")
         await event.answer("⏳ Слишком много запросов. Подождите немного.")
         return
     
-    # Логирование команды
-    command = event.text.split()[0] if event.text else "unknown"
-    log_user_action(user_id, command)
+    # Учет команды в потоке действий пользователей (сводки пишутся пачками)
+    if event.text and event.text.strip():
+        command = event.text.split()[0]
+    else:
+        command = "location" if event.location else "unknown"
+    user_audit.record(user_id, command[:32])
+    activity_series.record(user_id, command)
     
     # Продолжение обработки
     return await handler(event, data)
@@ -123,9 +267,9 @@ async def anti_spam_middleware(handler, event: Message, data):
 async def callback_middleware(handler, event, data):
     user_id = event.from_user.id
     
-    # Регистрация пользователя при нажатии кнопок
+    # Регистрация пользователя при нажатии кнопок; при перегрузке пропускается
     try:
-        user = await User.get_or_create_user(
+        user = None if overload_guard.degraded else await User.get_or_create_user(
             user_id=user_id,
             username=event.from_user.username,
             first_name=event.from_user.first_name,
@@ -136,6 +280,9 @@ async def callback_middleware(handler, event, data):
     except Exception as e:
         logger.error(f"Ошибка регистрации пользователя {user_id}: {e}")
     
+    user_audit.record(user_id, callback_label(event.data))
+    activity_series.record(user_id, event.data or "")
+    
     return await handler(event, data)
 
 # Главное меню
@@ -164,80 +311,19 @@ def get_main_menu(user_id: int = None):
 # Стартовая команда
 @dp.message(Command("start"))
 async def start_command(message: types.Message):
-    welcome_text = """
-🚨 **Помощник экстренных служб**
-
-Профессиональный бот для сотрудников экстренных служб РФ.
-Быстрый доступ к важной информации в критических ситуациях.
-
-📖 **Подробности миссии:** [Посмотреть](https://telegra.ph/Cifrovoj-pomoshchnik-ehkstrennyh-sluzhb-06-12)
-
-🚑 **Медицина**: расчет дозировок препаратов, противоядия при отравлениях, алгоритмы реанимации
-🚒 **Пожарные**: классификация пожаров, выбор огнетушащих веществ, опасные материалы  
-👮 **Полиция**: статьи УК РФ и КоАП, процедуры задержания, права граждан
-🆘 **Спасатели**: методы поиска людей, время выживания, влияние погоды на операции
-
-**Основные команды:**
-├ `/poison [название]` - противоядие при отравлении
-├ `/dose [лекарство] [вес]` - расчет дозировки препарата  
-├ `/fire [класс]` - способы тушения пожара
-└ `/law [статья]` - текст статьи закона
-
-💡 **Совет:** Нажмите на команду чтобы скопировать её
-
-Полный справочник команд
-└`/help`
-
-**Разработчик:** @kitay9
-**Версия:** 2.0 | **Статус:** Активная разработка
-    """
-    
     await message.answer(
-        welcome_text, 
-        reply_markup=get_main_menu(message.from_user.id),
-        parse_mode="Markdown"
+        **texts.WELCOME.as_kwargs(),
+        reply_markup=get_main_menu(message.from_user.id)
     )
 
 # Команда помощи
 @dp.message(Command("help"))
 async def help_command(message: types.Message):
-    help_text = """
-📚 **Список всех команд:**
-
-**🚑 МЕДИЦИНА:**
-• `/dose [лекарство] [вес]` - расчет дозировки
-• `/poison [вещество]` - информация о противоядии
-• `/drug [название]` - информация о лекарстве
-• `/resus` - алгоритм реанимации
-
-**🚒 ПОЖАРНЫЕ:**
-• `/fire [класс]` - способы тушения (A, B, C, D, E)
-• `/hazmat [вещество]` - опасные вещества
-• `/evacuation` - алгоритм эвакуации
-
-**👮 ПОЛИЦИЯ:**
-• `/law [номер статьи]` - текст статьи УК РФ
-• `/admin [номер]` - статьи КоАП
-• `/protocol [тип]` - шаблон протокола
-• `/rights` - права человека при задержании
-
-**🆘 СПАСАТЕЛИ:**
-• `/search [метод]` - методы поиска
-• `/survival [условия]` - время выживания
-• `/weather` - влияние погоды на операции
-
-**🌍 ОБЩИЕ:**
-• `/contacts [служба]` - экстренные контакты
-• `/checklist [тип ЧС]` - алгоритм действий
-
-💡 **Совет:** Нажмите на любую команду чтобы скопировать её
-    """
-    
     help_keyboard = InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="Главное меню", callback_data="back")]
     ])
     
-    await message.answer(help_text, reply_markup=help_keyboard, parse_mode="Markdown")
+    await message.answer(**texts.HELP.as_kwargs(), reply_markup=help_keyboard)
 
 # Расчет дозировки лекарств
 @dp.message(Command("dose"))
@@ -291,7 +377,7 @@ async def poison_command(message: types.Message):
             return
         
         poison = " ".join(args).lower()
-        poison_info = emergency_data.get_poison_info(poison)
+        poison_info = render_card(("poison", poison), emergency_data.get_poison_info, poison)
         
         if poison_info.startswith("ℹ️"):
             # Если яд не найден
@@ -329,7 +415,7 @@ async def fire_command(message: types.Message):
             return
         
         fire_class = args[0].upper()
-        fire_info = emergency_data.get_fire_class_info(fire_class)
+        fire_info = render_card(("fire", fire_class.lower()), emergency_data.get_fire_class_info, fire_class)
         
         if fire_info.startswith("ℹ️"):
             # Если класс не найден
@@ -363,11 +449,12 @@ async def law_command(message: types.Message):
                 [InlineKeyboardButton(text="⚖️ К УК РФ", callback_data="police_criminal")],
                 [InlineKeyboardButton(text="Главное меню", callback_data="back")]
             ])
-            await message.answer("ℹ️ Используйте: `/law [номер статьи]`\nПример: `/law 228`\n\n💡 **Совет:** Нажмите на команду чтобы скопировать её", reply_markup=error_keyboard, parse_mode="Markdown")
+            await message.answer("ℹ️ Используйте: `/law [номер статьи]`\nПример: `/law 228`, `/law 228.1`, `/law 158-161`\n\n💡 **Совет:** Нажмите на команду чтобы скопировать её", reply_markup=error_keyboard, parse_mode="Markdown")
             return
         
-        article = args[0]
-        law_info = emergency_data.get_criminal_article(article)
+        # Номер, часть ("228 ч.2") или диапазон ("158-161")
+        article = " ".join(args)
+        law_info = render_card(("law", article), emergency_data.get_criminal_article, article)
         
         if law_info.startswith("ℹ️"):
             # Если статья не найдена
@@ -401,11 +488,11 @@ async def admin_command(message: types.Message):
                 [InlineKeyboardButton(text="К КоАП", callback_data="police_admin")],
                 [InlineKeyboardButton(text="Главное меню", callback_data="back")]
             ])
-            await message.answer("ℹ️ Используйте: `/admin [номер статьи]`\nПример: `/admin 20.1`\n\n💡 **Совет:** Нажмите на команду чтобы скопировать её", reply_markup=error_keyboard, parse_mode="Markdown")
+            await message.answer("ℹ️ Используйте: `/admin [номер статьи]`\nПример: `/admin 20.1`, `/admin 12.8-12.26`\n\n💡 **Совет:** Нажмите на команду чтобы скопировать её", reply_markup=error_keyboard, parse_mode="Markdown")
             return
         
-        article = args[0]
-        admin_info = emergency_data.get_admin_article(article)
+        article = " ".join(args)
+        admin_info = render_card(("koap", article), emergency_data.get_admin_article, article)
         
         if admin_info.startswith("ℹ️"):
             # Если статья не найдена
@@ -430,59 +517,208 @@ async def admin_command(message: types.Message):
         await message.answer("ℹ️ Произошла ошибка при поиске статьи", reply_markup=error_keyboard, parse_mode="Markdown")
 
 
-
-# === ИИ КОМАНДЫ ===
-@dp.message(Command("ai_symptoms"))
-async def ai_symptoms_command(message: types.Message):
-    ai_keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="🩺 К ИИ меню", callback_data="ai_menu")],
+# Опасные вещества
+@dp.message(Command("hazmat"))
+async def hazmat_command(message: types.Message):
+    hazmat_keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="☣️ К опасным веществам", callback_data="fire_hazmat")],
         [InlineKeyboardButton(text="Главное меню", callback_data="back")]
     ])
-    
+    try:
+        args = message.text.split()[1:]
+        if not args:
+            await message.answer("ℹ️ Используйте: `/hazmat [номер ООН или название]`\nПример: `/hazmat 1017`, `/hazmat аммиак`\n\n💡 **Совет:** Нажмите на команду чтобы скопировать её", reply_markup=hazmat_keyboard, parse_mode="Markdown")
+            return
+        
+        hazmat_info = emergency_data.get_hazmat_info(" ".join(args))
+        await message.answer(hazmat_info, reply_markup=hazmat_keyboard, parse_mode="Markdown")
+            
+    except Exception as e:
+        await message.answer("ℹ️ Произошла ошибка при поиске вещества", reply_markup=hazmat_keyboard, parse_mode="Markdown")
+
+# Поиск ближайших экстренных служб по местоположению
+LOCATION_KEYBOARD = ReplyKeyboardMarkup(
+    keyboard=[[KeyboardButton(text="📍 Отправить местоположение", request_location=True)]],
+    resize_keyboard=True,
+    one_time_keyboard=True
+)
+LOCATION_PROMPT = "📍 Отправьте местоположение кнопкой ниже (или 📎 → Геопозиция) - бот покажет ближайшие больницы, пожарные части и отделы полиции."
+
+def nearest_keyboard(lat: float, lon: float, current: str = None):
+    """Кнопки типов служб; координаты передаются в callback_data (nr:<тип>:<широта>:<долгота>)"""
+    keyboard = [
+        [InlineKeyboardButton(text=title, callback_data=f"nr:{facility_type}:{lat:.4f}:{lon:.4f}")]
+        for facility_type, title in FACILITY_TYPES.items() if facility_type != current
+    ]
+    keyboard.append([InlineKeyboardButton(text="Главное меню", callback_data="back")])
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+@dp.message(Command("nearest"))
+async def nearest_command(message: types.Message):
+    await message.answer(LOCATION_PROMPT, reply_markup=LOCATION_KEYBOARD, parse_mode=None)
+
+@dp.message(F.location)
+async def location_message(message: types.Message):
+    location = message.location
     await message.answer(
-        "🚧 **Функция в разработке**\n\nИИ анализ симптомов будет доступен в следующем обновлении.\n\nПока используйте стандартные медицинские алгоритмы в разделе 'Медицина'.",
-        reply_markup=ai_keyboard,
-        parse_mode="Markdown"
+        "📍 Местоположение получено. Что найти поблизости?",
+        reply_markup=nearest_keyboard(location.latitude, location.longitude),
+        parse_mode=None
+    )
+
+
+# === ИИ КОМАНДЫ ===
+# Ответы подбираются поиском по справочнику бота (utils/retrieval.py) без сети:
+# команда -> (типы карточек, заголовок ответа, пример запроса, кнопка возврата,
+# прямые команды на случай упрощенного режима)
+AI_MODES = {
+    "ai_symptoms": (
+        {"poison", "drug", "protocol"}, "Анализ симптомов",
+        "/ai_symptoms судороги, рвота, металлический привкус", "🩺 К ИИ меню",
+        "`/poison [вещество]`, `/dose [лекарство] [вес]`"
+    ),
+    "ai_protocol": (
+        {"protocol", "fire", "hazmat"}, "Порядок действий",
+        "/ai_protocol утечка хлора на предприятии", "📝 К ИИ меню",
+        "`/hazmat [ООН/название]`, `/fire [класс]`"
+    ),
+    "ai_legal": (
+        {"law", "koap", "protocol"}, "Правовая справка",
+        "/ai_legal управление в состоянии опьянения", "⚖️ К ИИ меню",
+        "`/law [номер]`, `/admin [номер]`"
+    ),
+    "ai_checklist": (
+        {"protocol", "fire", "hazmat", "poison"}, "Чек-лист ЧС",
+        "/ai_checklist поиск пропавшего человека", "📋 К ИИ меню",
+        "`/hazmat [ООН/название]`, `/fire [класс]`, `/nearest`"
     )
+}
+
+async def answer_ai_query(message: types.Message, mode: str):
+    """Ответ /ai_* по справочнику: карточка лучшего совпадения и кнопки протоколов"""
+    kinds, title, example, back_text, direct_commands = AI_MODES[mode]
+    parts = message.text.split(maxsplit=1)
+    keyboard = []
+    if len(parts) < 2:
+        text = f"ℹ️ Опишите ситуацию после команды.\nПример: `{example}`\n\n💡 **Совет:** Нажмите на команду чтобы скопировать её"
+    elif overload_guard.degraded:
+        # Ранжирование по справочнику - лишняя работа при перегрузке: прямые команды отвечают готовыми карточками
+        text = (
+            f"⚠️ **Бот работает в упрощенном режиме из-за нагрузки** - подбор по описанию временно недоступен.\n\n"
+            f"Используйте прямые команды: {direct_commands}\n\n📞 При угрозе жизни звоните **112**"
+        )
+    else:
+        with span("data", "retrieval"):
+            results = knowledge_index.search(parts[1][:500], kinds)
+        text = emergency_data.format_retrieval_answer(results, title)
+        for document, _ in results:
+            if "callback" in document:
+                keyboard.append([InlineKeyboardButton(text=document["title"][:60], callback_data=document["callback"])])
+    keyboard.append([InlineKeyboardButton(text=back_text, callback_data="ai_menu")])
+    keyboard.append([InlineKeyboardButton(text="Главное меню", callback_data="back")])
+    await message.answer(text, reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard), parse_mode="Markdown")
+
+@dp.message(Command("ai_symptoms"))
+async def ai_symptoms_command(message: types.Message):
+    await answer_ai_query(message, "ai_symptoms")
 
 @dp.message(Command("ai_protocol"))
 async def ai_protocol_command(message: types.Message):
-    ai_keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="📝 К ИИ меню", callback_data="ai_menu")],
-        [InlineKeyboardButton(text="Главное меню", callback_data="back")]
-    ])
-    
-    await message.answer(
-        "🚧 **Функция в разработке**\n\nИИ генерация протоколов будет доступна в следующем обновлении.\n\nПока используйте шаблоны в разделе 'Полиция'.",
-        reply_markup=ai_keyboard,
-        parse_mode="Markdown"
-    )
+    await answer_ai_query(message, "ai_protocol")
 
 @dp.message(Command("ai_legal"))
 async def ai_legal_command(message: types.Message):
-    ai_keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="⚖️ К ИИ меню", callback_data="ai_menu")],
-        [InlineKeyboardButton(text="Главное меню", callback_data="back")]
-    ])
-    
-    await message.answer(
-        "🚧 **Функция в разработке**\n\nИИ правовые консультации будут доступны в следующем обновлении.\n\nПока используйте базу статей в разделе 'Полиция'.",
-        reply_markup=ai_keyboard,
-        parse_mode="Markdown"
-    )
+    await answer_ai_query(message, "ai_legal")
 
 @dp.message(Command("ai_checklist"))
 async def ai_checklist_command(message: types.Message):
-    ai_keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="К ИИ меню", callback_data="ai_menu")],
-        [InlineKeyboardButton(text="Главное меню", callback_data="back")]
-    ])
+    await answer_ai_query(message, "ai_checklist")
+
+# === АДМИН КОМАНДЫ ===
+# Одна выгрузка за раз: проход по хранилищу и сжатие нагружают процесс
+export_lock = asyncio.Lock()
+
+@dp.message(Command("export"))
+async def export_command(message: types.Message):
+    if not is_admin(message.from_user.id):
+        user_audit.security(message.from_user.id, "попытка выгрузки пользователей без прав")
+        await message.answer("❌ Команда доступна только администраторам")
+        return
+    
+    args = message.text.split()[1:]
+    fmt = args[0].lower() if args else "csv"
+    if fmt not in EXPORT_FORMATS:
+        await message.answer("ℹ️ Используйте: `/export [csv|jsonl]`", parse_mode="Markdown")
+        return
+    if overload_guard.degraded:
+        await message.answer("⚠️ Бот работает в упрощенном режиме из-за нагрузки, выгрузка временно недоступна")
+        return
+    if export_lock.locked():
+        await message.answer("⏳ Выгрузка уже выполняется, дождитесь ее завершения")
+        return
     
+    async with export_lock:
+        status = await message.answer("⏳ Выгрузка пользователей...")
+        path = None
+        try:
+            path, count = await export_users(fmt)
+            size = os.path.getsize(path)
+            if size > TELEGRAM_UPLOAD_LIMIT:
+                await status.edit_text(f"❌ Файл выгрузки ({size / 1024 / 1024:.1f} МБ) больше лимита Telegram 50 МБ")
+                return
+            filename = f"users_{datetime.now():%Y%m%d_%H%M}.{fmt}.gz"
+            await message.answer_document(
+                FSInputFile(path, filename=filename),
+                caption=f"👥 Пользователей: {count}"
+            )
+            await status.delete()
+            user_audit.security(message.from_user.id, f"выгрузка пользователей ({fmt}, {count})")
+        except Exception as e:
+            logger.error(f"Ошибка выгрузки пользователей: {e}")
+            await status.edit_text("❌ Ошибка выгрузки пользователей")
+        finally:
+            if path and os.path.exists(path):
+                os.remove(path)
+
+# Текст рассылки, ожидающий подтверждения: admin_id -> (текст, сущности)
+pending_broadcasts = {}
+
+@dp.message(Command("broadcast"))
+async def broadcast_command(message: types.Message):
+    if not is_admin(message.from_user.id):
+        user_audit.security(message.from_user.id, "попытка рассылки без прав")
+        await message.answer("❌ Команда доступна только администраторам")
+        return
+    
+    text, entities = strip_command(message.text, message.entities)
+    if not text.strip():
+        status = broadcaster.report() if broadcaster.state else "Рассылок еще не было"
+        await message.answer(
+            f"ℹ️ Используйте: /broadcast [текст объявления]\n"
+            f"Форматирование текста сохраняется.\n\n{status}",
+            parse_mode=None
+        )
+        return
+    if broadcaster.running:
+        await message.answer("⏳ Уже идет рассылка, дождитесь ее завершения или остановите в админ панели")
+        return
+    
+    pending_broadcasts[message.from_user.id] = (text, entities)
     await message.answer(
-        "🚧 **Функция в разработке**\n\nИИ чек-листы для ЧС будут доступны в следующем обновлении.\n\nПока используйте алгоритмы в соответствующих разделах.",
-        reply_markup=ai_keyboard,
+        "📣 **Рассылка всем пользователям**\n\nТекст ниже получат все пользователи, кроме заблокированных. Отправить?",
         parse_mode="Markdown"
     )
+    await message.answer(
+        text,
+        entities=[types.MessageEntity(**entity) for entity in entities] or None,
+        parse_mode=None,
+        reply_markup=InlineKeyboardMarkup(inline_keyboard=[
+            [
+                InlineKeyboardButton(text="✅ Отправить", callback_data="admin_broadcast_send"),
+                InlineKeyboardButton(text="❌ Отмена", callback_data="admin_broadcast_cancel")
+            ]
+        ])
+    )
 
 # Обработка кнопок меню
 @dp.callback_query()
@@ -501,10 +737,10 @@ async def handle_callbacks(callback: types.CallbackQuery):
             [InlineKeyboardButton(text="Назад", callback_data="back")]
         ])
         
-        await callback.message.edit_text(
-            "🚑 **Медицинский раздел**\n\nВыберите нужную категорию:",
-            reply_markup=med_keyboard,
-            parse_mode="Markdown"
+        await edit_screen(
+            callback.message,
+            **texts.MED_MENU.as_kwargs(),
+            reply_markup=med_keyboard
         )
     
     elif callback.data == "fire":
@@ -520,10 +756,10 @@ async def handle_callbacks(callback: types.CallbackQuery):
             [InlineKeyboardButton(text="Назад", callback_data="back")]
         ])
         
-        await callback.message.edit_text(
-            "🚒 **Пожарная служба**\n\nВыберите нужную категорию:",
-            reply_markup=fire_keyboard,
-            parse_mode="Markdown"
+        await edit_screen(
+            callback.message,
+            **texts.FIRE_MENU.as_kwargs(),
+            reply_markup=fire_keyboard
         )
     
     elif callback.data == "police":
@@ -539,10 +775,10 @@ async def handle_callbacks(callback: types.CallbackQuery):
             [InlineKeyboardButton(text="Назад", callback_data="back")]
         ])
         
-        await callback.message.edit_text(
-            "👮 **Полиция**\n\nВыберите нужную категорию:",
-            reply_markup=police_keyboard,
-            parse_mode="Markdown"
+        await edit_screen(
+            callback.message,
+            **texts.POLICE_MENU.as_kwargs(),
+            reply_markup=police_keyboard
         )
     
     elif callback.data == "rescue":
@@ -558,93 +794,78 @@ async def handle_callbacks(callback: types.CallbackQuery):
             [InlineKeyboardButton(text="Назад", callback_data="back")]
         ])
         
-        await callback.message.edit_text(
-            "🆘 **Спасательная служба**\n\nВыберите нужную категорию:",
-            reply_markup=rescue_keyboard,
-            parse_mode="Markdown"
+        await edit_screen(
+            callback.message,
+            **texts.RESCUE_MENU.as_kwargs(),
+            reply_markup=rescue_keyboard
         )
     
 
     
     elif callback.data == "contacts":
-        contact_info = emergency_data.get_emergency_contacts()
-        await callback.message.edit_text(
+        contact_info = render_card("contacts", emergency_data.get_emergency_contacts)
+        await edit_screen(
+            callback.message,
             contact_info,
             reply_markup=InlineKeyboardMarkup(inline_keyboard=[
+                [InlineKeyboardButton(text="📍 Ближайшие службы", callback_data="nearest")],
                 [InlineKeyboardButton(text="Назад", callback_data="back")]
             ]),
             parse_mode="Markdown"
         )
     
-    # === МЕДИЦИНСКИЕ ПОДРАЗДЕЛЫ ===
-    elif callback.data == "med_dose":
-        dose_text = emergency_data.get_all_drugs()
-        await callback.message.edit_text(
-            dose_text,
-            reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                [InlineKeyboardButton(text="К медицине", callback_data="med")],
-                [InlineKeyboardButton(text="Главное меню", callback_data="back")]
-            ]),
+    elif callback.data == "nearest":
+        # Запрос местоположения - только обычной клавиатурой, в новом сообщении
+        await callback.message.answer(LOCATION_PROMPT, reply_markup=LOCATION_KEYBOARD, parse_mode=None)
+    
+    elif callback.data and callback.data.startswith("nr:"):
+        try:
+            _, facility_type, lat, lon = callback.data.split(":")
+            lat, lon = float(lat), float(lon)
+        except ValueError:
+            facility_type = None
+        if facility_type not in FACILITY_TYPES:
+            await callback.answer("Отправьте местоположение заново", show_alert=True)
+            return
+        await edit_screen(
+            callback.message,
+            emergency_data.get_nearest_facilities(facility_type, lat, lon),
+            reply_markup=nearest_keyboard(lat, lon, current=facility_type),
             parse_mode="Markdown"
         )
     
+    # === МЕДИЦИНСКИЕ ПОДРАЗДЕЛЫ ===
+    elif callback.data == "med_dose":
+        await show_catalog_page(callback.message, "dose")
+    
     elif callback.data == "med_poison":
-        poison_text = emergency_data.get_all_poisons()
-        await callback.message.edit_text(
-            poison_text,
-            reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                [InlineKeyboardButton(text="К медицине", callback_data="med")],
-                [InlineKeyboardButton(text="Главное меню", callback_data="back")]
-            ]),
-            parse_mode="Markdown"
-        )
+        await show_catalog_page(callback.message, "poison")
     
     elif callback.data == "med_resus":
-        resus_info = emergency_data.get_resuscitation_algorithm()
-        await callback.message.edit_text(
-            resus_info,
+        await edit_screen(
+            callback.message,
+            **resuscitation_text.as_kwargs(),
             reply_markup=InlineKeyboardMarkup(inline_keyboard=[
                 [InlineKeyboardButton(text="К медицине", callback_data="med")],
                 [InlineKeyboardButton(text="Главное меню", callback_data="back")]
-            ]),
-            parse_mode="Markdown"
+            ])
         )
     
     elif callback.data == "med_algo":
-        algo_text = """
-🩺 **Медицинские алгоритмы**
-
-**Основные протоколы:**
-• 🫀 СЛР - нажмите "Реанимация" выше
-• 🤕 Травмы - оценка по шкале ABC
-• 🔥 Ожоги - правило девяток
-• 💔 Инфаркт - алгоритм МОНА
-• 🧠 Инсульт - шкала FAST
-
-**Шкала ABC (травмы):**
-• **A** - Airway (дыхательные пути)
-• **B** - Breathing (дыхание) 
-• **C** - Circulation (кровообращение)
-
-**Шкала FAST (инсульт):**
-• **F** - Face (лицо) - перекос
-• **A** - Arms (руки) - слабость
-• **S** - Speech (речь) - нарушения
-• **T** - Time (время) - вызов 103
-        """
-        await callback.message.edit_text(
-            algo_text,
+        await edit_screen(
+            callback.message,
+            **texts.MED_ALGO.as_kwargs(),
             reply_markup=InlineKeyboardMarkup(inline_keyboard=[
                 [InlineKeyboardButton(text="К медицине", callback_data="med")],
                 [InlineKeyboardButton(text="Главное меню", callback_data="back")]
-            ]),
-            parse_mode="Markdown"
+            ])
         )
     
     # === ПОЖАРНЫЕ ПОДРАЗДЕЛЫ ===
     elif callback.data == "fire_classes":
-        fire_classes_info = emergency_data.get_all_fire_classes()
-        await callback.message.edit_text(
+        fire_classes_info = render_card("fire_classes", emergency_data.get_all_fire_classes)
+        await edit_screen(
+            callback.message,
             fire_classes_info,
             reply_markup=InlineKeyboardMarkup(inline_keyboard=[
                 [InlineKeyboardButton(text="К пожарным", callback_data="fire")],
@@ -654,432 +875,194 @@ async def handle_callbacks(callback: types.CallbackQuery):
         )
     
     elif callback.data == "fire_extinguish":
-        extinguish_text = """
-🧯 **Огнетушащие вещества**
-
-**Типы огнетушителей:**
-• **Водные** - класс A (твердые вещества)
-• **Пенные** - класс A, B (жидкости) 
-• **Порошковые** - универсальные ABC
-• **Углекислотные** - класс B, C, E
-• **Хладоновые** - электроника, музеи
-
-**⚠️ ЗАПРЕЩЕНО:**
-• Вода на класс B, D, E
-• Пена на электроустановки
-• Любые средства на активные металлы без спецпорошков
-
-**Правило выбора:**
-1. Определить класс пожара
-2. Выбрать подходящее средство
-3. Проверить безопасность применения
-        """
-        await callback.message.edit_text(
-            extinguish_text,
+        await edit_screen(
+            callback.message,
+            **texts.FIRE_EXTINGUISH.as_kwargs(),
             reply_markup=InlineKeyboardMarkup(inline_keyboard=[
                 [InlineKeyboardButton(text="К пожарным", callback_data="fire")],
                 [InlineKeyboardButton(text="Главное меню", callback_data="back")]
-            ]),
-            parse_mode="Markdown"
+            ])
         )
     
     elif callback.data == "fire_hazmat":
-        hazmat_text = """
-☣️ **Опасные вещества**
-
-**Классы опасности:**
-• **Класс 1** - Взрывчатые вещества
-• **Класс 2** - Газы (воспламеняющиеся, токсичные)
-• **Класс 3** - Легковоспламеняющиеся жидкости
-• **Класс 4** - Твердые вещества, самовозгорающиеся
-• **Класс 5** - Окисляющие вещества
-• **Класс 6** - Токсичные вещества
-• **Класс 7** - Радиоактивные материалы
-• **Класс 8** - Едкие и коррозионные вещества
-• **Класс 9** - Прочие опасные вещества
-
-**🚨 При работе с HAZMAT:**
-1. Определить класс опасности
-2. Использовать СИЗ
-3. Обеспечить вентиляцию
-4. Подготовить нейтрализующие средства
-        """
-        await callback.message.edit_text(
-            hazmat_text,
+        await edit_screen(
+            callback.message,
+            **texts.FIRE_HAZMAT.as_kwargs(),
             reply_markup=InlineKeyboardMarkup(inline_keyboard=[
                 [InlineKeyboardButton(text="К пожарным", callback_data="fire")],
                 [InlineKeyboardButton(text="Главное меню", callback_data="back")]
-            ]),
-            parse_mode="Markdown"
+            ])
         )
     
     elif callback.data == "fire_evac":
-        evac_text = """
-🚪 **Алгоритм эвакуации**
-
-**Порядок действий:**
-
-**1. Оповещение (1-2 мин):**
-• Включить сигнализацию
-• Объявить по громкой связи
-• Сообщить в службы: 101, 112
-
-**2. Эвакуация людей (5-10 мин):**
-• Открыть все эвакуационные выходы
-• Отключить лифты (кроме пожарных)
-• Проверить все помещения
-• Помочь маломобильным
-
-**3. Встреча служб:**
-• Встретить пожарных у въезда
-• Передать планы здания
-• Сообщить о людях внутри
-• Указать места отключения коммуникаций
-
-**⚠️ Запрещено:**
-• Использовать лифты
-• Открывать горячие двери
-• Возвращаться за вещами
-• Прятаться в дальних помещениях
-        """
-        await callback.message.edit_text(
-            evac_text,
+        await edit_screen(
+            callback.message,
+            **texts.FIRE_EVAC.as_kwargs(),
             reply_markup=InlineKeyboardMarkup(inline_keyboard=[
                 [InlineKeyboardButton(text="К пожарным", callback_data="fire")],
                 [InlineKeyboardButton(text="Главное меню", callback_data="back")]
-            ]),
-            parse_mode="Markdown"
+            ])
         )
     
     # === ПОЛИЦЕЙСКИЕ ПОДРАЗДЕЛЫ ===
     elif callback.data == "police_criminal":
-        criminal_text = emergency_data.get_all_criminal_articles()
-        await callback.message.edit_text(
-            criminal_text,
-            reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                [InlineKeyboardButton(text="К полиции", callback_data="police")],
-                [InlineKeyboardButton(text="Главное меню", callback_data="back")]
-            ]),
-            parse_mode="Markdown"
-        )
+        await show_catalog_page(callback.message, "law")
     
     elif callback.data == "police_rights":
-        rights_text = """
-🛡️ **Права граждан при задержании**
-
-**При задержании гражданин имеет право:**
-• Знать основание и причину задержания
-• Уведомить близких о задержании
-• Пользоваться услугами переводчика
-• Обращаться за медпомощью
-• Требовать адвоката (с момента задержания)
-• Не свидетельствовать против себя (ст. 51 Конституции)
-
-**Сроки задержания:**
-• **Административное** - до 3 часов (48 часов по отдельным статьям)
-• **Уголовное** - до 48 часов (до 72 часов с санкции суда)
-
-**⚠️ Важно:**
-• Задержанный не обязан отвечать на вопросы до прибытия адвоката
-• Протокол задержания составляется немедленно
-• При нарушении прав - жалоба прокурору/в суд
-        """
-        await callback.message.edit_text(
-            rights_text,
+        await edit_screen(
+            callback.message,
+            **texts.POLICE_RIGHTS.as_kwargs(),
             reply_markup=InlineKeyboardMarkup(inline_keyboard=[
                 [InlineKeyboardButton(text="К полиции", callback_data="police")],
                 [InlineKeyboardButton(text="Главное меню", callback_data="back")]
-            ]),
-            parse_mode="Markdown"
+            ])
         )
     
     elif callback.data == "police_admin":
-        admin_text = emergency_data.get_all_admin_articles()
-        await callback.message.edit_text(
-            admin_text,
-            reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                [InlineKeyboardButton(text="К полиции", callback_data="police")],
-                [InlineKeyboardButton(text="Главное меню", callback_data="back")]
-            ]),
-            parse_mode="Markdown"
-        )
+        await show_catalog_page(callback.message, "admin")
     
     elif callback.data == "police_protocols":
-        protocols_text = """
-📝 **Шаблоны протоколов**
-
-**Протокол об административном правонарушении:**
-
-**Обязательные сведения:**
-• Дата, время, место составления
-• ФИО, должность, звание составителя
-• Сведения о лице, привлекаемом к ответственности
-• Место, время совершения правонарушения
-• Описание события правонарушения
-• Статья КоАП РФ
-• Объяснение лица (отказ от объяснения)
-• Свидетели, потерпевшие (если есть)
-
-**Образец записи события:**
-"[Дата] в [время] по адресу [адрес] гр. [ФИО], [год рождения], [документы], совершил административное правонарушение, выразившееся в [описание действий], что предусмотрено статьей [номер] КоАП РФ."
-
-**Протокол задержания:**
-• Основания задержания
-• Дата, время начала и окончания
-• Место задержания
-• Результаты личного досмотра
-• Уведомление близких/работодателя
-
-**⚠️ Важно:**
-• Протокол составляется немедленно
-• Копия вручается нарушителю
-• При отказе от подписи - отметка в протоколе
-        """
-        await callback.message.edit_text(
-            protocols_text,
+        await edit_screen(
+            callback.message,
+            **texts.POLICE_PROTOCOLS.as_kwargs(),
             reply_markup=InlineKeyboardMarkup(inline_keyboard=[
                 [InlineKeyboardButton(text="К полиции", callback_data="police")],
                 [InlineKeyboardButton(text="Главное меню", callback_data="back")]
-            ]),
-            parse_mode="Markdown"
+            ])
         )
     
     elif callback.data == "ai_menu":
         ai_keyboard = InlineKeyboardMarkup(inline_keyboard=[
             [
                 InlineKeyboardButton(text="🩺 Анализ симптомов", callback_data="ai_symptoms_menu"),
-                InlineKeyboardButton(text="📝 Генерация протокола", callback_data="ai_protocol_menu")
+                InlineKeyboardButton(text="📝 Порядок действий", callback_data="ai_protocol_menu")
             ],
             [
-                InlineKeyboardButton(text="⚖️ Правовая консультация", callback_data="ai_legal_menu"),
+                InlineKeyboardButton(text="⚖️ Правовая справка", callback_data="ai_legal_menu"),
                 InlineKeyboardButton(text="Чек-лист ЧС", callback_data="ai_checklist_menu")
             ],
             [InlineKeyboardButton(text="Назад", callback_data="back")]
         ])
         
-        await callback.message.edit_text(
-            f"**ИИ Помощник** - в разработке\n\nИскусственный интеллект для экстренных служб находится в стадии разработки.\n\nФункции будут доступны в следующих версиях:\n• Анализ симптомов\n• Генерация протоколов\n• Правовые консультации\n• Чек-листы для ЧС",
-            reply_markup=ai_keyboard,
-            parse_mode="Markdown"
+        await edit_screen(
+            callback.message,
+            **texts.AI_MENU.as_kwargs(),
+            reply_markup=ai_keyboard
         )
     
     elif callback.data == "ai_symptoms_menu":
-        await callback.message.edit_text(
-            "🚧 **ИИ Анализ симптомов - в разработке**\n\nДанная функция будет доступна в следующем обновлении.\n\nВ разработке:\n• Анализ описания симптомов\n• Предварительная диагностика\n• Оценка степени срочности\n• Рекомендации по первой помощи\n\nПока используйте стандартные медицинские алгоритмы.",
+        await edit_screen(
+            callback.message,
+            **texts.AI_SYMPTOMS.as_kwargs(),
             reply_markup=InlineKeyboardMarkup(inline_keyboard=[
                 [InlineKeyboardButton(text="К ИИ меню", callback_data="ai_menu")],
                 [InlineKeyboardButton(text="Главное меню", callback_data="back")]
-            ]),
-            parse_mode="Markdown"
+            ])
         )
     
     elif callback.data == "ai_protocol_menu":
-        await callback.message.edit_text(
-            "🚧 **ИИ Генерация протокола - в разработке**\n\nДанная функция будет доступна в следующем обновлении.\n\nВ разработке:\n• Автоматическое создание протоколов\n• Соответствие требованиям законодательства\n• Шаблоны для разных типов происшествий\n• Проверка правильности оформления\n\nПока используйте стандартные шаблоны.",
+        await edit_screen(
+            callback.message,
+            **texts.AI_PROTOCOL.as_kwargs(),
             reply_markup=InlineKeyboardMarkup(inline_keyboard=[
                 [InlineKeyboardButton(text="К ИИ меню", callback_data="ai_menu")],
                 [InlineKeyboardButton(text="Главное меню", callback_data="back")]
-            ]),
-            parse_mode="Markdown"
+            ])
         )
     
     elif callback.data == "ai_legal_menu":
-        await callback.message.edit_text(
-            "🚧 **ИИ Правовая консультация - в разработке**\n\nДанная функция будет доступна в следующем обновлении.\n\nВ разработке:\n• Консультации по законодательству\n• Ссылки на актуальные статьи\n• Разъяснение процедур\n• Помощь в сложных случаях\n\nПока используйте базу статей УК РФ и КоАП.",
+        await edit_screen(
+            callback.message,
+            **texts.AI_LEGAL.as_kwargs(),
             reply_markup=InlineKeyboardMarkup(inline_keyboard=[
                 [InlineKeyboardButton(text="К ИИ меню", callback_data="ai_menu")],
                 [InlineKeyboardButton(text="Главное меню", callback_data="back")]
-            ]),
-            parse_mode="Markdown"
+            ])
         )
     
     elif callback.data == "ai_checklist_menu":
-        await callback.message.edit_text(
-            "🚧 **ИИ Чек-лист ЧС - в разработке**\n\nДанная функция будет доступна в следующем обновлении.\n\nВ разработке:\n• Персонализированные чек-листы\n• Адаптация под тип ЧС\n• Пошаговые инструкции\n• Контроль выполнения действий\n\nПока используйте алгоритмы в разделах служб.",
+        await edit_screen(
+            callback.message,
+            **texts.AI_CHECKLIST.as_kwargs(),
             reply_markup=InlineKeyboardMarkup(inline_keyboard=[
                 [InlineKeyboardButton(text="К ИИ меню", callback_data="ai_menu")],
                 [InlineKeyboardButton(text="Главное меню", callback_data="back")]
-            ]),
-            parse_mode="Markdown"
+            ])
         )
     
     elif callback.data == "rescue_search":
-        search_text = """
-🔍 **Методы поиска пропавших людей**
-
-**Основные методы:**
-
-**1. Звуковой поиск:**
-• Голосовые вызовы каждые 3-5 минут
-• Свистки, рупоры, мегафоны
-• Прослушка в тишине 1-2 минуты
-
-**2. Визуальный поиск:**
-• Осмотр местности "зигзагом"
-• Использование биноклей, прожекторов
-• Поиск следов, меток, предметов
-
-**3. Технический поиск:**
-• Радиосвязь, мобильная связь
-• GPS-трекеры, радиомаяки
-• Тепловизоры (ночью/в холод)
-• Дроны с камерами
-
-**4. Кинологический поиск:**
-• Поисковые собаки по запаху
-• Работа по следу
-• Поиск в завалах
-
-**⏰ Временные рамки:**
-• **Первые 3 часа** - максимальная активность
-• **До 24 часов** - критический период
-• **72 часа** - предел выживания без воды
-        """
-        await callback.message.edit_text(
-            search_text,
+        await edit_screen(
+            callback.message,
+            **texts.RESCUE_SEARCH.as_kwargs(),
             reply_markup=InlineKeyboardMarkup(inline_keyboard=[
                 [InlineKeyboardButton(text="К спасателям", callback_data="rescue")],
                 [InlineKeyboardButton(text="Главное меню", callback_data="back")]
-            ]),
-            parse_mode="Markdown"
+            ])
         )
     
     elif callback.data == "rescue_survival":
-        survival_text = """
-🏔️ **Время выживания в экстремальных условиях**
-
-**Правило "3-х":**
-• **3 минуты** без воздуха (утопление, завал)
-• **3 часа** без тепла (гипотермия)  
-• **3 дня** без воды
-• **3 недели** без еды
-
-**Конкретные условия:**
-
-**Температурные:**
-• **-40°C** - 30 минут без защиты
-• **-20°C** - 1-2 часа
-• **0°C и ветер** - 3-6 часов  
-• **+50°C без воды** - 6-12 часов
-
-**В воде:**
-• **0°C** - 15-30 минут
-• **10°C** - 1-3 часа
-• **20°C** - 12-20 часов
-
-**Без воды:**
-• **Жара +40°C** - 24-48 часов
-• **Умеренный климат** - 3-5 дней
-• **Холод** - 7-10 дней
-
-**⚠️ Факторы, сокращающие время:**
-• Паника, стресс
-• Ранения, болезни
-• Физическая активность
-• Алкоголь, наркотики
-        """
-        await callback.message.edit_text(
-            survival_text,
+        await edit_screen(
+            callback.message,
+            **texts.RESCUE_SURVIVAL.as_kwargs(),
             reply_markup=InlineKeyboardMarkup(inline_keyboard=[
                 [InlineKeyboardButton(text="К спасателям", callback_data="rescue")],
                 [InlineKeyboardButton(text="Главное меню", callback_data="back")]
-            ]),
-            parse_mode="Markdown"
+            ])
         )
     
     elif callback.data == "rescue_weather":
-        weather_text = """
-🌦️ **Влияние погоды на спасательные операции**
-
-**Дождь/снег:**
-• Ухудшение видимости (до 10-50 м)
-• Размытие следов
-• Риск переохлаждения
-• Проблемы с радиосвязью
-
-**Ветер:**
-• **До 10 м/с** - допустимо
-• **10-15 м/с** - осложнения с авиацией
-• **Свыше 15 м/с** - запрет полетов
-• Снос звука, затруднение поиска
-
-**Туман:**
-• Видимость менее 50 м
-• Дезориентация спасателей
-• Запрет авиационного поиска
-• Использование GPS обязательно
-
-**Температура:**
-• **Ниже -20°C** - ограничение времени работы
-• **Выше +35°C** - риск теплового удара
-• Необходимость смены команд каждые 2-4 часа
-
-**⚠️ Критические условия (прекращение поиска):**
-• Гроза с молниями
-• Метель с видимостью <10 м
-• Лавинная опасность 4-5 баллов
-• Сели, наводнения
-        """
-        await callback.message.edit_text(
-            weather_text,
+        await edit_screen(
+            callback.message,
+            **texts.RESCUE_WEATHER.as_kwargs(),
             reply_markup=InlineKeyboardMarkup(inline_keyboard=[
                 [InlineKeyboardButton(text="К спасателям", callback_data="rescue")],
                 [InlineKeyboardButton(text="Главное меню", callback_data="back")]
-            ]),
-            parse_mode="Markdown"
+            ])
         )
     
     elif callback.data == "rescue_comms":
-        comms_text = """
-📡 **Связь в спасательных операциях**
-
-**Частоты связи:**
-• **МЧС России**: 149.200 - 149.800 МГц
-• **Авиационная**: 121.5 МГц (аварийная)
-• **Морская**: 156.800 МГц (16 канал)
-• **Любительская**: 145.500 МГц (R5)
-
-**Протокол радиосвязи:**
-1. **"[Позывной] - [Позывной], прием!"**
-2. Ждать ответа 3-5 секунд
-3. Повторить 3 раза, затем пауза
-4. Говорить четко, медленно
-5. Заканчивать: **"Конец связи"**
-
-**Сигналы бедствия:**
-• **SOS** - ... --- ... (3 коротких, 3 длинных, 3 коротких)
-• **MAYDAY** - голосом по радио (3 раза)
-• **PAN-PAN** - срочность (не смертельная опасность)
-
-**Мобильная связь:**
-• **112** - работает без SIM-карты
-• SMS при слабом сигнале
-• Экономия батареи (режим полета с периодическим включением)
-• Запасные аккумуляторы, power bank
-
-**⚠️ При отсутствии связи:**
-• Подъем на возвышенность
-• Использование отражателей, зеркал
-• Дымовые сигналы (3 столба дыма)
-• Сигнальные ракеты
-        """
-        await callback.message.edit_text(
-            comms_text,
+        await edit_screen(
+            callback.message,
+            **texts.RESCUE_COMMS.as_kwargs(),
             reply_markup=InlineKeyboardMarkup(inline_keyboard=[
                 [InlineKeyboardButton(text="К спасателям", callback_data="rescue")],
                 [InlineKeyboardButton(text="Главное меню", callback_data="back")]
-            ]),
-            parse_mode="Markdown"
+            ])
         )
     
+    elif callback.data and callback.data.startswith(PAGE_PREFIX + ":"):
+        cursor = parse_cursor(callback.data)
+        if cursor is None or cursor[0] not in CATALOG_BACK:
+            await callback.answer("Раздел не найден", show_alert=True)
+            return
+        await show_catalog_page(callback.message, *cursor)
+    
     elif callback.data == "admin_panel":
         # Проверка прав администратора
         if not is_admin(callback.from_user.id):
+            user_audit.security(callback.from_user.id, "попытка открыть админ панель без прав")
             await callback.answer("❌ У вас нет прав доступа к админ панели", show_alert=True)
             return
         
+        # Подсчет статистики читает все хранилище - при перегрузке отключен
+        if overload_guard.degraded:
+            await edit_screen(
+                callback.message,
+                "🔧 **Админ панель 112help**\n\n⚠️ **Бот работает в упрощенном режиме из-за нагрузки**\n\n"
+                "Статистика временно недоступна, активность пользователей не записывается. "
+                "Справочные разделы работают в обычном режиме.",
+                reply_markup=InlineKeyboardMarkup(inline_keyboard=[
+                    [InlineKeyboardButton(text="🔄 Обновить", callback_data="admin_panel")],
+                    [InlineKeyboardButton(text="Главное меню", callback_data="back")]
+                ]),
+                parse_mode="Markdown"
+            )
+            await callback.answer()
+            return
+        
         try:
-            stats = await User.get_user_stats()
+            # Последний результат из кэша, пересчет идет в фоне
+            stats, stats_age = await user_stats.get()
             storage_type = stats.get('storage_type', 'unknown')
             
             # Определяем тип хранилища для отображения
@@ -1123,22 +1106,38 @@ async def handle_callbacks(callback: types.CallbackQuery):
 • **Сегодня:** {stats['active_today']} из {stats['total']} ({(stats['active_today']/stats['total']*100) if stats['total'] > 0 else 0:.1f}%)
 • **За неделю:** {stats['active_week']} из {stats['total']} ({(stats['active_week']/stats['total']*100) if stats['total'] > 0 else 0:.1f}%)
 
+🕒 _Обновлено {stats_age:.0f} сек назад_
+
 {additional_info}
                 """
             
-            admin_keyboard = InlineKeyboardMarkup(inline_keyboard=[
-                [InlineKeyboardButton(text="🔄 Обновить", callback_data="admin_panel")],
+            # Ход текущей или итоги последней рассылки
+            if broadcaster.state:
+                admin_text += f"\n{broadcaster.report()}"
+                if broadcaster.running and stats.get('total'):
+                    admin_text += f" (~{broadcaster.state['processed'] * 100 / stats['total']:.0f}%)"
+            
+            admin_buttons = [
+                [
+                    InlineKeyboardButton(text="🔄 Обновить", callback_data="admin_panel"),
+                    InlineKeyboardButton(text="📈 Тренды", callback_data="admin_trends")
+                ],
                 [InlineKeyboardButton(text="Главное меню", callback_data="back")]
-            ])
+            ]
+            if broadcaster.running:
+                admin_buttons.insert(1, [InlineKeyboardButton(text="⏹ Остановить рассылку", callback_data="admin_broadcast_stop")])
+            admin_keyboard = InlineKeyboardMarkup(inline_keyboard=admin_buttons)
             
-            await callback.message.edit_text(
+            await edit_screen(
+                callback.message,
                 admin_text,
                 reply_markup=admin_keyboard,
                 parse_mode="Markdown"
             )
             
         except Exception as e:
-            await callback.message.edit_text(
+            await edit_screen(
+                callback.message,
                 "❌ **Ошибка получения статистики**\n\nПопробуйте позже или обратитесь к разработчику.",
                 reply_markup=InlineKeyboardMarkup(inline_keyboard=[
                     [InlineKeyboardButton(text="Главное меню", callback_data="back")]
@@ -1146,41 +1145,95 @@ async def handle_callbacks(callback: types.CallbackQuery):
                 parse_mode="Markdown"
             )
     
-    elif callback.data == "back":
-        welcome_text = """
-🚨 **112help - Помощник экстренных служб** 🚨
-
-Профессиональный бот для сотрудников экстренных служб РФ.
-Быстрый доступ к важной информации в критических ситуациях.
-
-📖 **Подробности миссии:** [Посмотреть](https://telegra.ph/Cifrovoj-pomoshchnik-ehkstrennyh-sluzhb-06-12)
-
-🚑 **Медицина**: расчет дозировок препаратов, противоядия при отравлениях, алгоритмы реанимации
-🚒 **Пожарные**: классификация пожаров, выбор огнетушащих веществ, опасные материалы  
-👮 **Полиция**: статьи УК РФ и КоАП, процедуры задержания, права граждан
-🆘 **Спасатели**: методы поиска людей, время выживания, влияние погоды на операции
+    elif callback.data and callback.data.startswith("admin_broadcast_"):
+        if not is_admin(callback.from_user.id):
+            user_audit.security(callback.from_user.id, "попытка управления рассылкой без прав")
+            await callback.answer("❌ У вас нет прав доступа к админ панели", show_alert=True)
+            return
+        
+        action = callback.data[len("admin_broadcast_"):]
+        if action == "send":
+            pending = pending_broadcasts.pop(callback.from_user.id, None)
+            if pending is None:
+                await callback.answer("Текст рассылки не найден, отправьте /broadcast заново", show_alert=True)
+                return
+            if not broadcaster.start(bot, callback.from_user.id, *pending):
+                await callback.answer("⏳ Уже идет другая рассылка", show_alert=True)
+                return
+            user_audit.security(callback.from_user.id, "запуск рассылки")
+            await callback.message.edit_reply_markup(reply_markup=None)
+            await callback.message.answer("📣 Рассылка запущена. Ход виден в админ панели.", reply_markup=InlineKeyboardMarkup(inline_keyboard=[
+                [InlineKeyboardButton(text="🔧 Админка", callback_data="admin_panel")]
+            ]))
+        elif action == "cancel":
+            pending_broadcasts.pop(callback.from_user.id, None)
+            await callback.message.edit_reply_markup(reply_markup=None)
+            await callback.message.answer("Рассылка отменена")
+        elif action == "stop":
+            if await broadcaster.cancel():
+                user_audit.security(callback.from_user.id, "остановка рассылки")
+                await callback.message.answer(broadcaster.report(), parse_mode=None)
+            else:
+                await callback.answer("Рассылка не идет", show_alert=True)
+                return
+    
+    elif callback.data == "admin_trends":
+        if not is_admin(callback.from_user.id):
+            user_audit.security(callback.from_user.id, "попытка открыть тренды без прав")
+            await callback.answer("❌ У вас нет прав доступа к админ панели", show_alert=True)
+            return
+        
+        # Почасовые ряды из памяти (и файлов других обработчиков), без чтения хранилища
+        snapshot = activity_series.combined()
+        hourly_active = activity_series.last_hours("active", 24, snapshot=snapshot)
+        daily_peak = activity_series.last_days("active", 30, snapshot=snapshot, reduce=max)
+        daily_new = activity_series.last_days("new", 30, snapshot=snapshot)
+        
+        section_lines = []
+        for section in SECTIONS:
+            daily = activity_series.last_days(f"cmd_{section}", 7, snapshot=snapshot)
+            if sum(daily):
+                section_lines.append(f"• {SECTION_TITLES[section]}: {sum(daily)} `{sparkline(daily)}`")
+        
+        trends_text = f"""
+📈 **Тренды активности**
 
-**Основные команды:**
-├ `/poison [название]` - противоядие при отравлении
-├ `/dose [лекарство] [вес]` - расчет дозировки препарата  
-├ `/fire [класс]` - способы тушения пожара
-└ `/law [статья]` - текст статьи закона
+**Активные пользователи по часам (24 ч):**
+`{sparkline(hourly_active)}`
+Текущий час: {hourly_active[-1]}, максимум: {max(hourly_active)}
 
-💡 **Совет:** Нажмите на команду чтобы скопировать её
+**Пиковый час по дням (30 дн.):**
+`{sparkline(daily_peak)}`
+Максимум: {max(daily_peak)} пользователей в час
 
-Полный справочник команд
-└`/help`
+**Новые пользователи по дням (30 дн.):**
+`{sparkline(daily_new)}`
+Всего: {sum(daily_new)}, сегодня: {daily_new[-1]}
 
-**Разработчик:** @kitay9
-**Версия:** 2.0 | **Статус:** Активная разработка
+**Команды по разделам за 7 дней:**
+{chr(10).join(section_lines) or "Нет данных"}
         """
         
-        await callback.message.edit_text(
-            welcome_text,
-            reply_markup=get_main_menu(callback.from_user.id),
+        await edit_screen(
+            callback.message,
+            trends_text,
+            reply_markup=InlineKeyboardMarkup(inline_keyboard=[
+                [
+                    InlineKeyboardButton(text="🔄 Обновить", callback_data="admin_trends"),
+                    InlineKeyboardButton(text="🔧 Админка", callback_data="admin_panel")
+                ],
+                [InlineKeyboardButton(text="Главное меню", callback_data="back")]
+            ]),
             parse_mode="Markdown"
         )
     
+    elif callback.data == "back":
+        await edit_screen(
+            callback.message,
+            **texts.MAIN_MENU.as_kwargs(),
+            reply_markup=get_main_menu(callback.from_user.id)
+        )
+    
     await callback.answer()
 
 # Установка команд бота
@@ -1192,28 +1245,110 @@ async def set_bot_commands():
         BotCommand(command="poison", description="☠️ Информация о ядах"),
         BotCommand(command="fire", description="🔥 Классы пожаров"),
         BotCommand(command="law", description="⚖️ Статьи УК РФ"),
+        BotCommand(command="hazmat", description="☣️ Опасные вещества по номеру ООН"),
+        BotCommand(command="nearest", description="📍 Ближайшие экстренные службы"),
 
-        BotCommand(command="ai_symptoms", description="🤖 ИИ анализ симптомов"),
-        BotCommand(command="ai_protocol", description="📝 ИИ генерация протокола"),
-        BotCommand(command="ai_legal", description="⚖️ ИИ правовая консультация"),
-        BotCommand(command="ai_checklist", description="ИИ чек-лист ЧС"),
+        BotCommand(command="ai_symptoms", description="🤖 Подсказка по симптомам"),
+        BotCommand(command="ai_protocol", description="📝 Порядок действий при ЧС"),
+        BotCommand(command="ai_legal", description="⚖️ Правовая справка по ситуации"),
+        BotCommand(command="ai_checklist", description="Чек-лист ЧС по описанию"),
         BotCommand(command="admin", description="Статьи КоАП РФ"),
     ]
     
     await bot.set_my_commands(commands)
 
+# Хранилище и фоновые задачи процесса, обрабатывающего апдейты
+async def start_services(worker_index: int = None, workers: int = 1):
+    if worker_index is not None:
+        # Свои файлы и порт метрик у каждого обработчика, лимит отправки бота делится между ними
+        user_audit.file_prefix = f"user_actions_w{worker_index}"
+        activity_series.path = worker_path(ACTIVITY_FILE, worker_index)
+        activity_series.merge_pattern = worker_path(ACTIVITY_FILE, "*")
+        send_queue.set_global_rate(send_queue.global_bucket.rate / workers)
+    
+    # Инициализация базы данных
+    await Database.connect()
+    
+    tasks = []
+    # Эндпоинт метрик (опционально)
+    if METRICS_ENABLED:
+        metrics_port = METRICS_PORT if worker_index is None else METRICS_PORT + 1 + worker_index
+        await start_metrics_server(port=metrics_port)
+        tasks.append(asyncio.create_task(monitor_event_loop_lag()))
+        logger.info(f"Метрики доступны на http://{METRICS_HOST}:{metrics_port}/metrics")
+    
+    # Запись сводок действий пользователей
+    tasks.append(asyncio.create_task(user_audit.run()))
+    
+    # Фоновый пересчет статистики админ-панели
+    tasks.append(asyncio.create_task(user_stats.run()))
+    
+    # Почасовые ряды активности (загрузка и периодическая запись)
+    activity_series.load()
+    tasks.append(asyncio.create_task(activity_series.run()))
+    
+    # Продолжение рассылки, прерванной остановкой бота; рассылку ведет только
+    # обработчик 0, за которым закреплены администраторы
+    if not worker_index:
+        broadcaster.resume(bot)
+    
+    # Защита от перегрузки (упрощенный режим при отставании event loop или длинной очереди)
+    if OVERLOAD_ENABLED:
+        tasks.append(asyncio.create_task(overload_guard.run()))
+    
+    # Запись апдейтов для воспроизведения
+    if update_capture.enabled:
+        tasks.append(asyncio.create_task(update_capture.run()))
+        logger.info(f"Запись апдейтов в {update_capture.path}")
+    return tasks
+
+async def stop_services(tasks):
+    for task in tasks:
+        task.cancel()
+    await broadcaster.stop()
+    await user_audit.flush()
+    await activity_series.save()
+    if update_capture.enabled:
+        await update_capture.flush()
+
 # Основная функция
 async def main():
     logger.info("Запуск 112help...")
     
-    # Инициализация базы данных
-    await Database.connect()
+    tasks = await start_services()
     
     # Установка команд
     await set_bot_commands()
     
-    # Запуск бота
-    await dp.start_polling(bot)
+    # Запуск бота: long polling или встроенный сервер вебхука
+    try:
+        if BOT_MODE == "webhook":
+            await run_webhook(dp, bot)
+        else:
+            await bot.delete_webhook()
+            await dp.start_polling(bot)
+    finally:
+        await stop_services(tasks)
+
+def run():
+    """Запуск в одном процессе или супервизор с WORKERS обработчиками"""
+    if BOT_MODE == "webhook":
+        try:
+            webhook_secret()
+        except ValueError as e:
+            logger.error(str(e))
+            exit(1)
+    if WORKERS > 1:
+        logger.info(f"Запуск 112help: {WORKERS} процессов-обработчиков")
+        if not Database.use_mongodb:
+            logger.warning(
+                f"Хранилище {Database.text_storage_file} не рассчитано на запись из нескольких процессов - "
+                "для WORKERS > 1 используйте MongoDB (USE_MONGODB=true)"
+            )
+        if run_workers(dp, bot, WORKERS, start_services, stop_services, BOT_MODE, on_startup=set_bot_commands,
+                       pinned_users=ADMIN_IDS):
+            return
+    asyncio.run(main())
 
 if __name__ == "__main__":
-    asyncio.run(main()) 
\ No newline at end of file
+    run()
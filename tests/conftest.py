@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Модули проекта импортируются из корня репозитория
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# Снимки и ряды активности не пишутся в data/state рабочей копии
+os.environ.setdefault("STATE_DIR", tempfile.mkdtemp(prefix="112help-tests-"))
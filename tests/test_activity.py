@@ -0,0 +1,185 @@
+import asyncio
+
+import pytest
+
+import utils.activity as activity
+from utils.activity import ActivitySeries, section_for, sparkline
+
+HOUR = 500_000
+
+
+@pytest.fixture
+def now(monkeypatch):
+    """Текущий час для load() и last_hours() без привязки к часам машины"""
+    monkeypatch.setattr(activity, "current_hour", lambda now=None: HOUR)
+    return HOUR
+
+
+def make_series(tmp_path, name="activity.bin", hours=48):
+    return ActivitySeries(str(tmp_path / name), hours=hours)
+
+
+def save(series):
+    asyncio.run(series.save())
+
+
+def test_section_for():
+    assert section_for("/dose@help112_bot") == "med"
+    assert section_for("/unknown") == "menu"
+    assert section_for("nr:hospital") == "contacts"
+    assert section_for("pg:law:2") == "police"
+    assert section_for("admin_panel") == "admin"
+    assert section_for("back") == "menu"
+
+
+def test_sparkline():
+    assert sparkline([0, 0]) == "▁▁"
+    assert sparkline([0, 4, 8]) == "▁▅█"
+
+
+def test_unique_active_users_per_hour(tmp_path, now):
+    series = make_series(tmp_path)
+    for user_id in (1, 1, 2):
+        series.record(user_id, "/dose", hour=now)
+    series.record(1, "/fire", hour=now + 1)
+    assert series.last_hours("active", 2, hour=now + 1) == [2, 1]
+    assert series.last_hours("cmd_med", 2, hour=now + 1) == [3, 0]
+    assert series.last_hours("cmd_fire", 2, hour=now + 1) == [0, 1]
+
+
+def test_ring_slot_reused_after_full_cycle(tmp_path, now):
+    series = make_series(tmp_path, hours=24)
+    series.record(1, "/dose", hour=now)
+    series.record_new(hour=now)
+    # Через 24 часа тот же слот: старые значения обнуляются
+    series.record(2, "/fire", hour=now + 24)
+    slot = now % 24
+    assert series.slot_hours[slot] == now + 24
+    assert series.series["active"][slot] == 1
+    assert series.series["cmd_med"][slot] == 0
+    assert series.series["new"][slot] == 0
+    assert series.last_hours("cmd_med", 25, hour=now + 24) == [0] * 25
+
+
+def test_last_days_reduce(tmp_path, now):
+    series = make_series(tmp_path)
+    day_start = now - now % 24
+    series.record(1, "/dose", hour=day_start - 2)
+    series.record(2, "/dose", hour=day_start - 1)
+    series.record(3, "/dose", hour=day_start - 1)
+    series.record(1, "/dose", hour=day_start)
+    assert series.last_days("active", 2, hour=day_start) == [3, 1]
+    assert series.last_days("active", 2, hour=day_start, reduce=max) == [2, 1]
+
+
+def test_binary_round_trip(tmp_path, now):
+    series = make_series(tmp_path)
+    series.record(1, "/dose", hour=now - 1)
+    series.record(2, "/hazmat", hour=now)
+    series.record_new(hour=now)
+    hours, slot_hours, values, (seen_hour, seen) = ActivitySeries.parse(series.to_bytes())
+    assert hours == 48
+    assert slot_hours == series.slot_hours
+    assert values == series.series
+    assert seen_hour == now
+    assert list(seen) == [2]
+
+
+def test_version_1_file_loads_without_seen_users(tmp_path, now):
+    series = make_series(tmp_path)
+    series.record(1, "/dose", hour=now)
+    data = series.to_bytes()
+    # Версия 1: тот же заголовок и ряды без хвоста с учтенными пользователями
+    tail = activity._SEEN.size + 8
+    header = activity._HEADER.unpack_from(data)
+    old = activity._HEADER.pack(header[0], 1, *header[2:]) + data[activity._HEADER.size:-tail]
+    (tmp_path / "activity.bin").write_bytes(old)
+    loaded = make_series(tmp_path)
+    loaded.load()
+    assert loaded.last_hours("active", 1, hour=now) == [1]
+    assert loaded._hour is None
+    assert loaded._seen == set()
+
+
+def test_reload_in_same_hour_keeps_counted_users(tmp_path, now):
+    series = make_series(tmp_path)
+    series.record(1, "/dose", hour=now)
+    series.record(2, "/dose", hour=now)
+    save(series)
+    restarted = make_series(tmp_path)
+    restarted.load()
+    restarted.record(1, "/dose", hour=now)
+    restarted.record(3, "/dose", hour=now)
+    assert restarted.last_hours("active", 1, hour=now) == [3]
+    assert restarted.last_hours("cmd_med", 1, hour=now) == [4]
+
+
+def test_reload_in_next_hour_starts_new_set(tmp_path, now, monkeypatch):
+    series = make_series(tmp_path)
+    series.record(1, "/dose", hour=now)
+    save(series)
+    monkeypatch.setattr(activity, "current_hour", lambda now=None: HOUR + 1)
+    restarted = make_series(tmp_path)
+    restarted.load()
+    assert restarted._seen == set()
+    restarted.record(1, "/dose", hour=HOUR + 1)
+    assert restarted.last_hours("active", 2, hour=HOUR + 1) == [1, 1]
+
+
+def test_load_rejects_damaged_or_other_depth(tmp_path, now):
+    path = tmp_path / "activity.bin"
+    path.write_bytes(b"XXXX" + bytes(20))
+    series = make_series(tmp_path)
+    series.load()
+    assert series.slot_hours[0] == -1
+
+    other = make_series(tmp_path, hours=24)
+    other.record(1, "/dose", hour=now)
+    path.write_bytes(other.to_bytes())
+    series.load()
+    assert series.last_hours("active", 1, hour=now) == [0]
+
+
+def test_save_only_when_dirty(tmp_path, now):
+    series = make_series(tmp_path)
+    save(series)
+    assert not (tmp_path / "activity.bin").exists()
+    series.record(1, "/dose", hour=now)
+    save(series)
+    assert (tmp_path / "activity.bin").exists()
+    assert not series.dirty
+
+
+def test_combined_keeps_newest_hour_per_slot(tmp_path, now):
+    own = make_series(tmp_path, "activity_w0.bin", hours=24)
+    own.record(1, "/dose", hour=now - 24)
+    own.record(2, "/dose", hour=now - 1)
+    own.merge_pattern = str(tmp_path / "activity_w*.bin")
+
+    other = make_series(tmp_path, "activity_w1.bin", hours=24)
+    # Тот же слот, что у now - 24, но на сутки новее - значения own в нем не складываются
+    other.record(3, "/fire", hour=now)
+    other.record(4, "/dose", hour=now - 1)
+    other.record(5, "/dose", hour=now - 1)
+    save(other)
+    # Файл другой глубины пропускается
+    stale = make_series(tmp_path, "activity_w2.bin", hours=48)
+    stale.record(6, "/dose", hour=now - 1)
+    save(stale)
+
+    snapshot = own.combined()
+    assert own.last_hours("active", 2, hour=now, snapshot=snapshot) == [3, 1]
+    assert own.last_hours("cmd_med", 2, hour=now, snapshot=snapshot) == [3, 0]
+    assert own.last_hours("cmd_fire", 2, hour=now, snapshot=snapshot) == [0, 1]
+    # Собственные ряды процесса не меняются
+    assert own.last_hours("active", 24, hour=now - 1)[0] == 1
+
+
+def test_combined_without_pattern_is_a_copy(tmp_path, now):
+    series = make_series(tmp_path)
+    series.record(1, "/dose", hour=now)
+    slot_hours, values = series.combined()
+    values["active"][now % 48] = 100
+    assert series.last_hours("active", 1, hour=now) == [1]
+    assert slot_hours == series.slot_hours
+
@@ -0,0 +1,82 @@
+import pytest
+
+from data.article_index import ArticleIndex, parse_article_key, parse_article_query
+
+
+@pytest.mark.parametrize("number, key", [
+    ("228", (228,)),
+    ("228.1", (228, 1)),
+    ("20.3.1", (20, 3, 1)),
+    (" 105 ", (105,)),
+    ("228a", None),
+    ("ч.2", None),
+    ("", None),
+])
+def test_parse_article_key(number, key):
+    assert parse_article_key(number) == key
+
+
+@pytest.mark.parametrize("query, parsed", [
+    ("228", ("article", (228,), None)),
+    ("228.1", ("article", (228, 1), None)),
+    ("228 ч.2", ("article", (228,), 2)),
+    ("228 ч. 2", ("article", (228,), 2)),
+    ("228ч2", ("article", (228,), 2)),
+    ("228 часть 2", ("article", (228,), 2)),
+    ("ст. 105", ("article", (105,), None)),
+    ("Статья 105", ("article", (105,), None)),
+    ("158-161", ("range", (158,), (161,))),
+    ("20.1–20.3", ("range", (20, 1), (20, 3))),
+    ("158..161", ("range", (158,), (161,))),
+    ("161-158", ("range", (158,), (161,))),
+    ("кража", None),
+    ("228 ч.", None),
+])
+def test_parse_article_query(query, parsed):
+    assert parse_article_query(query) == parsed
+
+
+@pytest.fixture
+def index():
+    return ArticleIndex(["20.1", "20.20", "20.3", "158", "159", "159.1", "161", "228", "228.1"])
+
+
+def test_keys_sort_numerically(index):
+    assert index.numbers == ["20.1", "20.3", "20.20", "158", "159", "159.1", "161", "228", "228.1"]
+    assert len(index) == 9
+
+
+def test_get(index):
+    assert index.get((228, 1)) == "228.1"
+    assert index.get((20, 20)) == "20.20"
+    assert index.get((229,)) is None
+
+
+def test_range_includes_sub_articles_of_upper_bound(index):
+    assert index.range((158,), (159,)) == ["158", "159", "159.1"]
+    assert index.range((20, 1), (20, 3)) == ["20.1", "20.3"]
+    assert index.range((300,), (400,)) == []
+
+
+def test_nearest(index):
+    assert index.nearest((160,)) == ["159", "159.1", "161"]
+    assert index.nearest((1000,), count=2) == ["228", "228.1"]
+
+
+@pytest.fixture(scope="module")
+def emergency_data():
+    from data.emergency_data import EmergencyData
+    return EmergencyData()
+
+
+def test_article_part_and_range_cards(emergency_data):
+    number = next(iter(emergency_data.criminal_code))
+    card = emergency_data.get_criminal_article(f"{number} ч.2")
+    assert card.startswith(f"⚖️ **Статья {number} УК РФ")
+    assert "**Часть 2:**" in card
+    assert emergency_data.get_criminal_article(f"{number}-{number}").startswith(f"⚖️ **Статьи {number}-{number} УК РФ:**")
+
+
+def test_unknown_query_is_shown_as_code(emergency_data):
+    card = emergency_data.get_criminal_article("*_[`")
+    assert card.startswith("ℹ️ **Статья УК РФ не найдена:** `*_['`")
@@ -0,0 +1,132 @@
+import asyncio
+import csv
+import gzip
+import json
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from database.models import Database
+from utils.export import EXPORT_FIELDS, export_users
+
+START = datetime(2024, 1, 1, 12, 0, 0)
+
+
+def make_users(count):
+    users = {}
+    for user_id in range(1, count + 1):
+        users[str(user_id)] = {
+            "user_id": user_id,
+            # Разделители JSON и экранирование внутри строк не должны сбивать разбор
+            "username": f"user_{user_id}" if user_id % 3 else None,
+            "first_name": f'Имя {{"{user_id}": [1, 2]}}, "кавычки" \\ 🚑',
+            "last_name": "Фамилия" if user_id % 2 else None,
+            "registration_date": START + timedelta(minutes=user_id),
+            "last_activity": START + timedelta(hours=user_id),
+            "command_count": user_id * 7,
+            "is_blocked": user_id % 10 == 0,
+            "warnings_count": user_id % 4,
+            "bot_blocked": user_id % 15 == 0
+        }
+    return users
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    monkeypatch.setattr(Database, "connected", False)
+    monkeypatch.setattr(Database, "local_storage_file", str(tmp_path / "local_users.json"))
+    monkeypatch.setattr(Database, "text_storage_file", str(tmp_path / "users.txt"))
+    return tmp_path
+
+
+@pytest.fixture
+def json_users(storage, monkeypatch):
+    monkeypatch.setattr(Database, "use_mongodb", True)
+    users = make_users(1500)
+    Database._save_local_storage(users)
+    # Файл заметно больше куска чтения по умолчанию (65536 символов)
+    assert os.path.getsize(Database.local_storage_file) > 4 * 65536
+    return users
+
+
+@pytest.fixture
+def text_users(storage, monkeypatch):
+    monkeypatch.setattr(Database, "use_mongodb", False)
+    users = make_users(1500)
+    for user_data in users.values():
+        # В users.txt нет warnings_count, а "|" в имени ломает формат строки
+        del user_data["warnings_count"]
+        user_data["first_name"] = user_data["first_name"].replace("|", "/")
+    Database._save_text_storage(users)
+    return users
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 100, 4096, 65536])
+def test_streaming_json_matches_full_load(json_users, chunk_size):
+    streamed = list(Database._iter_local_storage(chunk_size=chunk_size))
+    assert streamed == list(Database._load_local_storage().values())
+    assert streamed == list(json_users.values())
+
+
+def test_streaming_json_compact_and_empty(storage):
+    with open(Database.local_storage_file, "w", encoding="utf-8") as f:
+        f.write('{"1":{"user_id":1,"last_activity":"2024-01-01T00:00:00"},"2":{"user_id":2}}')
+    assert [user["user_id"] for user in Database._iter_local_storage(chunk_size=3)] == [1, 2]
+    for content in ("{}", "  {\n}\n", ""):
+        with open(Database.local_storage_file, "w", encoding="utf-8") as f:
+            f.write(content)
+        assert list(Database._iter_local_storage(chunk_size=1)) == []
+
+
+def test_streaming_json_missing_file(storage):
+    assert list(Database._iter_local_storage()) == []
+
+
+def test_text_storage_iteration_skips_bad_lines(text_users):
+    with open(Database.text_storage_file, "a", encoding="utf-8") as f:
+        f.write("\nмусор без разделителей\n1501|u|n|None|не дата|2024-01-01T00:00:00|0|False|False\n")
+    streamed = list(Database._iter_text_storage())
+    assert streamed == list(text_users.values())
+    assert streamed == list(Database._load_text_storage().values())
+
+
+def read_export(path):
+    with gzip.open(path, "rt", encoding="utf-8", newline="") as f:
+        return f.read()
+
+
+def expected_rows(users):
+    return [
+        {field: value.isoformat() if isinstance(value, datetime) else value
+         for field, value in ((field, user_data.get(field)) for field in EXPORT_FIELDS)}
+        for user_data in users.values()
+    ]
+
+
+def test_export_jsonl(json_users):
+    path, count = asyncio.run(export_users("jsonl", batch_size=128))
+    try:
+        rows = [json.loads(line) for line in read_export(path).splitlines()]
+    finally:
+        os.remove(path)
+    assert count == len(json_users)
+    assert rows == expected_rows(json_users)
+
+
+def test_export_csv(text_users):
+    path, count = asyncio.run(export_users("csv", batch_size=128))
+    try:
+        rows = list(csv.DictReader(read_export(path).splitlines()))
+    finally:
+        os.remove(path)
+    assert count == len(rows) == len(text_users)
+    assert tuple(rows[0]) == EXPORT_FIELDS
+    expected = expected_rows(text_users)
+    for row, user in zip(rows, expected):
+        assert row == {field: "" if value is None else str(value) for field, value in user.items()}
+
+
+def test_export_rejects_unknown_format(storage):
+    with pytest.raises(ValueError):
+        asyncio.run(export_users("xml"))
@@ -0,0 +1,77 @@
+import math
+import random
+
+import pytest
+
+from data.facilities import FacilityIndex, KDTree, chord_to_km, to_vector
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371.0 * math.asin(math.sqrt(a))
+
+
+def squared_chord(a, b):
+    return sum((x - y) ** 2 for x, y in zip(a, b))
+
+
+def test_chord_distance_matches_haversine():
+    moscow, spb = (55.7558, 37.6173), (59.9343, 30.3351)
+    squared = squared_chord(to_vector(*moscow), to_vector(*spb))
+    assert chord_to_km(squared) == pytest.approx(haversine_km(*moscow, *spb), rel=1e-9)
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 500])
+def test_kdtree_matches_brute_force(size):
+    rng = random.Random(size)
+    points = [(rng.uniform(-90, 90), rng.uniform(-180, 180)) for _ in range(size)]
+    vectors = [to_vector(lat, lon) for lat, lon in points]
+    tree = KDTree(vectors)
+    assert len(tree) == size
+    for _ in range(50):
+        query = to_vector(rng.uniform(-90, 90), rng.uniform(-180, 180))
+        count = rng.randint(1, 8)
+        expected = sorted(squared_chord(vector, query) for vector in vectors)[:count]
+        found = tree.nearest(query, count)
+        assert [distance for _, distance in found] == pytest.approx(expected)
+        assert all(squared_chord(vectors[number], query) == pytest.approx(distance) for number, distance in found)
+
+
+def test_kdtree_empty():
+    assert KDTree([]).nearest(to_vector(0, 0), 3) == []
+
+
+@pytest.fixture
+def index(tmp_path):
+    path = tmp_path / "facilities.tsv"
+    path.write_text(
+        "# комментарий\n"
+        "type\tname\taddress\tphone\tlat\tlon\n"
+        "hospital\tБлизкая\tул. 1\t103\t55.76\t37.62\n"
+        "hospital\tДальняя\tул. 2\t103\t55.90\t37.62\n"
+        "hospital\tВ другом городе\tул. 3\t103\t59.93\t30.33\n"
+        "fire\tЧасть\tул. 4\t101\tне число\t37.62\n"
+        "unknown\tНеизвестный тип\tул. 5\t000\t55.76\t37.62\n",
+        encoding="utf-8"
+    )
+    return FacilityIndex(str(path)).load()
+
+
+def test_nearest_sorted_and_capped_by_distance(index):
+    found = index.nearest("hospital", 55.75, 37.62, count=5, max_distance_km=50)
+    assert [facility["name"] for facility, _ in found] == ["Близкая", "Дальняя"]
+    assert found[0][1] < found[1][1] < 50
+
+
+def test_nearest_without_data(index):
+    # Строка с неверными координатами пропущена, неизвестный тип не загружен
+    assert index.nearest("fire", 55.75, 37.62) == []
+    assert index.nearest("police", 55.75, 37.62) == []
+    assert index.nearest("hospital", 0, 0) == []
+
+
+def test_missing_file(tmp_path):
+    index = FacilityIndex(str(tmp_path / "missing.tsv")).load()
+    assert index.trees == {}
+    assert index.nearest("hospital", 55.75, 37.62) == []
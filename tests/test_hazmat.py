@@ -0,0 +1,142 @@
+import os
+
+import pytest
+
+import data.hazmat as hazmat
+from data.hazmat import HazmatDatabase, build_snapshot
+
+ROWS = [
+    ("1017", "2.3", "124", "Хлор", "cl2"),
+    ("1050", "2.3", "125", "Хлороводород безводный", "хлористый водород"),
+    ("1789", "8", "157", "Кислота хлористоводородная", "соляная кислота"),
+    ("1381", "4.2", "136", "Фосфор белый", "жёлтый фосфор"),
+    ("9999", "9", "171", "Прочее вещество", ""),
+]
+GUIDES = [
+    ("124", "Газы токсичные", "Опасность", "Действия", "100", "800"),
+    ("125", "Газы коррозионные", "Опасность", "Действия", "100", "800"),
+    ("136", "Самовозгорающиеся", "Опасность", "Действия", "50", "800"),
+    ("157", "Коррозионные", "Опасность", "Действия", "50", "800"),
+    ("171", "Прочие", "Опасность", "Действия", "50", "300"),
+]
+
+
+def write_tsv(path, header, rows):
+    lines = ["# комментарий", header] + ["\t".join(row) for row in rows]
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+@pytest.fixture
+def files(tmp_path):
+    source = tmp_path / "hazmat.tsv"
+    guides = tmp_path / "hazmat_guides.tsv"
+    write_tsv(source, "un\tclass\tguide\tname\taliases", ROWS)
+    write_tsv(guides, "guide\ttitle\thazards\tactions\tisolation_m\tfire_evacuation_m", GUIDES)
+    return source, guides, tmp_path / "state" / "hazmat.bin"
+
+
+def open_database(files):
+    source, guides, snapshot = files
+    return HazmatDatabase(source, guides, str(snapshot)).load()
+
+
+def forbid_rebuild(monkeypatch):
+    def fail(source):
+        raise AssertionError("снимок пересобран")
+    monkeypatch.setattr(hazmat, "build_snapshot", fail)
+
+
+def test_snapshot_round_trip(files, monkeypatch):
+    database = open_database(files)
+    snapshot = files[2]
+    assert snapshot.read_bytes() == build_snapshot(files[0])
+    forbid_rebuild(monkeypatch)
+    reopened = open_database(files)
+    assert reopened.count == database.count == len(ROWS)
+    assert [reopened.record(number) for number in range(reopened.count)] == \
+        [database.record(number) for number in range(database.count)]
+    assert reopened.guides[124]["isolation_m"] == 100
+
+
+def test_snapshot_rebuilt_when_source_changes(files):
+    source, _, snapshot = files
+    open_database(files)
+    write_tsv(source, "un\tclass\tguide\tname\taliases", ROWS + [("1005", "2.3", "125", "Аммиак безводный", "аммиак")])
+    assert open_database(files).by_un(1005)["name"] == "Аммиак безводный"
+    assert snapshot.read_bytes() == build_snapshot(source)
+
+
+def test_snapshot_rebuilt_when_only_mtime_changes(files):
+    source, _, snapshot = files
+    database = open_database(files)
+    stat = source.stat()
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert database._open_snapshot() is None
+    open_database(files)
+    assert database._open_snapshot() is not None
+
+
+@pytest.mark.parametrize("damage", [
+    lambda data: data[:-1],
+    lambda data: data[:10],
+    lambda data: b"",
+    lambda data: b"XXXX" + data[4:],
+])
+def test_damaged_snapshot_is_rejected(files, damage):
+    _, _, snapshot = files
+    database = open_database(files)
+    good = snapshot.read_bytes()
+    snapshot.write_bytes(damage(good))
+    assert database._open_snapshot() is None
+    assert open_database(files).by_un(1017)["name"] == "Хлор"
+    assert snapshot.read_bytes() == good
+
+
+def test_by_un_edges(files):
+    database = open_database(files)
+    assert database.by_un(0) is None
+    assert database.by_un(10000) is None
+    assert database.by_un(1018) is None
+    assert database.by_un(9999)["name"] == "Прочее вещество"
+    record = database.by_un(1017)
+    assert record == {"un": 1017, "guide": 124, "class": "2.3", "name": "Хлор", "aliases": ["cl2"]}
+    assert database.by_un(9999)["aliases"] == []
+
+
+def names(records):
+    return [record["name"] for record in records]
+
+
+@pytest.mark.parametrize("query", ["1017", "UN1017", "un 1017", "оон 1017", " 1017 "])
+def test_search_by_un_number(files, query):
+    assert names(open_database(files).search(query)) == ["Хлор"]
+
+
+def test_search_exact_match_wins_over_prefix(files):
+    # "хлор" - это хлор, а не список из хлороводорода
+    assert names(open_database(files).search("ХЛОР")) == ["Хлор"]
+
+
+def test_search_prefix_before_substring(files):
+    database = open_database(files)
+    # "хлори" - начало синонима "хлористый водород", а не подстрока "хлористоводородная"
+    assert names(database.search("хлори")) == ["Хлороводород безводный"]
+    assert names(database.search("хлоро")) == ["Хлороводород безводный"]
+
+
+def test_search_substring_when_no_prefix(files):
+    assert names(open_database(files).search("водород")) == ["Кислота хлористоводородная", "Хлороводород безводный"]
+
+
+def test_search_normalizes_yo(files):
+    database = open_database(files)
+    assert names(database.search("Жёлтый фосфор")) == ["Фосфор белый"]
+    assert names(database.search("желтый")) == ["Фосфор белый"]
+
+
+def test_search_misses_and_limit(files):
+    database = open_database(files)
+    assert database.search("") == []
+    assert database.search("1018") == []
+    assert database.search("ртуть") == []
+    assert len(database.search("о", limit=2)) == 2
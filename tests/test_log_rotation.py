@@ -0,0 +1,75 @@
+import logging
+import os
+import time
+
+import pytest
+
+from utils.log_rotation import RotatingDailyFileHandler, stop_compression
+
+
+@pytest.fixture
+def make_handler(tmp_path):
+    handlers = []
+
+    def make(**kwargs):
+        handler = RotatingDailyFileHandler(tmp_path, **kwargs)
+        handlers.append(handler)
+        # Разбор остатков прошлого запуска идет в фоновом потоке - дожидаемся его
+        stop_compression(None)
+        return handler
+
+    yield make
+    for handler in handlers:
+        handler.close()
+    stop_compression(None)
+
+
+def archive(tmp_path, name, size=100, age_days=0):
+    path = tmp_path / name
+    path.write_bytes(b"x" * size)
+    mtime = time.time() - age_days * 86400
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_prune_keeps_worker_archives(tmp_path, make_handler):
+    handler = make_handler(prefix="errors", retention_days=1)
+    old = archive(tmp_path, "errors_20200101.log.gz", age_days=30)
+    rotated = archive(tmp_path, "errors_20200101.1.log.gz", age_days=30)
+    worker = archive(tmp_path, "errors_w0_20200101.log.gz", age_days=30)
+    fresh = archive(tmp_path, "errors_20990101.log.gz")
+    handler._prune()
+    assert not old.exists() and not rotated.exists()
+    assert worker.exists() and fresh.exists()
+
+
+def test_prune_by_total_size_counts_own_archives_only(tmp_path, make_handler):
+    handler = make_handler(prefix="errors", retention_days=0, max_total_bytes=250)
+    oldest = archive(tmp_path, "errors_20200101.log.gz", age_days=3)
+    middle = archive(tmp_path, "errors_20200102.log.gz", age_days=2)
+    newest = archive(tmp_path, "errors_20200103.log.gz", age_days=1)
+    worker = archive(tmp_path, "errors_w1_20200101.log.gz", size=10_000, age_days=5)
+    handler._prune()
+    assert not oldest.exists()
+    assert middle.exists() and newest.exists() and worker.exists()
+
+
+def test_size_rotation_formats_each_record_once(tmp_path, make_handler):
+    handler = make_handler(prefix="app", max_bytes=200)
+    calls = []
+
+    class CountingFormatter(logging.Formatter):
+        def format(self, record):
+            calls.append(record)
+            return super().format(record)
+
+    handler.setFormatter(CountingFormatter())
+    for number in range(20):
+        handler.emit(logging.makeLogRecord({"msg": f"запись {number} " + "x" * 30, "levelno": logging.ERROR}))
+    handler.close()
+    stop_compression(None)
+    assert len(calls) == 20
+    names = sorted(os.listdir(tmp_path))
+    assert any(name.endswith(".1.log.gz") for name in names)
+    # Файл превышает max_bytes не больше чем на одну запись
+    assert os.path.getsize(handler.baseFilename) < 200 + 60
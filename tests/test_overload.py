@@ -0,0 +1,56 @@
+from utils.overload import OverloadGuard
+
+
+def make_guard():
+    return OverloadGuard(lag_high=0.5, lag_low=0.1, queue_high=100, queue_low=10, recovery_seconds=30)
+
+
+def test_enters_on_lag_or_queue_threshold():
+    guard = make_guard()
+    guard.update(0.49, 99, now=0)
+    assert not guard.degraded
+    guard.update(0.5, 0, now=1)
+    assert guard.degraded
+    assert guard.mode == "degraded"
+
+    guard = make_guard()
+    guard.update(0.0, 100, now=0)
+    assert guard.degraded
+
+
+def test_stays_degraded_between_thresholds():
+    guard = make_guard()
+    guard.update(1.0, 0, now=0)
+    # Ниже порога входа, но выше порога выхода - режим не меняется
+    for now in range(1, 100):
+        guard.update(0.3, 50, now=now)
+    assert guard.degraded
+
+
+def test_exits_after_recovery_period():
+    guard = make_guard()
+    guard.update(1.0, 0, now=0)
+    guard.update(0.05, 5, now=10)
+    guard.update(0.05, 5, now=39)
+    assert guard.degraded
+    guard.update(0.05, 5, now=40)
+    assert not guard.degraded
+    assert guard.since == 40
+
+
+def test_spike_restarts_recovery_period():
+    guard = make_guard()
+    guard.update(1.0, 0, now=0)
+    guard.update(0.05, 5, now=10)
+    guard.update(0.2, 5, now=30)
+    guard.update(0.05, 5, now=35)
+    guard.update(0.05, 5, now=60)
+    assert guard.degraded
+    guard.update(0.05, 5, now=65)
+    assert not guard.degraded
+
+
+def test_queue_depth_sums_sources():
+    guard = make_guard()
+    guard.queue_sources = [lambda: 3, lambda: 4]
+    assert guard.queue_depth() == 7
@@ -0,0 +1,59 @@
+import pytest
+
+from data.emergency_data import EmergencyData
+from utils.pagination import page_buttons, page_cursor, paginate, parse_cursor
+
+
+@pytest.fixture(scope="module")
+def emergency_data():
+    data = EmergencyData()
+    data.prerender_cards()
+    return data
+
+
+def test_paginate_by_line_count():
+    pages = paginate("H\n", [f"{i}\n" for i in range(5)], "F", page_size=2)
+    assert pages == ["H\n0\n1\nF", "H\n2\n3\nF", "H\n4\nF"]
+
+
+def test_paginate_by_characters():
+    lines = ["a" * 40, "b" * 40, "c" * 40]
+    pages = paginate("", lines, "", page_size=10, max_chars=100)
+    assert pages == ["a" * 40 + "b" * 40, "c" * 40]
+
+
+def test_paginate_empty_list_gives_one_page():
+    assert paginate("H", [], "F") == ["HF"]
+
+
+def test_cursor_roundtrip():
+    assert parse_cursor(page_cursor("law", 3)) == ("law", 3)
+
+
+@pytest.mark.parametrize("data", [None, "", "law", "pg:law", "pg:law:-1", "pg:law:x", "xx:law:1", "pg:law:1:2"])
+def test_parse_cursor_rejects_other_data(data):
+    assert parse_cursor(data) is None
+
+
+def test_page_buttons():
+    assert page_buttons("law", 0, 1) == []
+    first = page_buttons("law", 0, 3)
+    assert [button.text for button in first] == ["1/3", "▶️"]
+    assert first[1].callback_data == "pg:law:1"
+    middle = page_buttons("law", 1, 3)
+    assert [button.callback_data for button in middle] == ["pg:law:0", "pg:law:1", "pg:law:2"]
+    assert [button.text for button in page_buttons("law", 2, 3)] == ["◀️", "3/3"]
+
+
+@pytest.mark.parametrize("section", EmergencyData.CATALOGS)
+def test_catalog_page_is_clamped(emergency_data, section):
+    pages = emergency_data.catalog_pages[section]
+    text, page, count = emergency_data.get_catalog_page(section, 10 ** 6)
+    assert (text, page, count) == (pages[-1], len(pages) - 1, len(pages))
+    text, page, _ = emergency_data.get_catalog_page(section, -5)
+    assert (text, page) == (pages[0], 0)
+
+
+def test_catalog_pages_fit_telegram_limit(emergency_data):
+    for pages in emergency_data.catalog_pages.values():
+        assert all(len(page) <= 4096 for page in pages)
@@ -0,0 +1,56 @@
+import pytest
+
+from utils.retrieval import MIN_SCORE, TfidfIndex, stem, tokenize
+
+DOCUMENTS = [
+    {"kind": "poison", "title": "Угарный газ", "text": "Головная боль, тошнота, потеря сознания. Вынести на свежий воздух"},
+    {"kind": "poison", "title": "Хлор", "text": "Кашель, резь в глазах. Вынести на свежий воздух, промыть глаза"},
+    {"kind": "drug", "title": "Адреналин", "text": "Анафилактический шок, остановка сердца"},
+    {"kind": "fire", "title": "Класс пожара B", "text": "Горючие жидкости: бензин, масла. Тушить пеной"},
+]
+
+
+@pytest.fixture(scope="module")
+def index():
+    return TfidfIndex().build(DOCUMENTS)
+
+
+def test_word_forms_share_stem():
+    assert stem("отравление") == stem("отравлении") == stem("отравления")
+    assert stem("хлор") == stem("хлора")
+
+
+def test_tokenize_drops_stop_words_and_short_words():
+    assert tokenize("Отравление и в ё-моё") == [stem("отравление"), stem("мое")]
+
+
+def test_title_match_ranks_first(index):
+    results = index.search("отравление хлором")
+    assert results[0][0]["title"] == "Хлор"
+    assert 0 < results[0][1] <= 1
+
+
+def test_scores_are_sorted_and_above_threshold(index):
+    results = index.search("свежий воздух газ")
+    assert [document["title"] for document, _ in results][:2] == ["Угарный газ", "Хлор"]
+    scores = [score for _, score in results]
+    assert scores == sorted(scores, reverse=True)
+    assert all(score >= MIN_SCORE for score in scores)
+
+
+def test_identical_query_scores_one():
+    index = TfidfIndex().build([{"kind": "a", "title": "шок", "text": ""}, {"kind": "a", "title": "пена", "text": ""}])
+    [(document, score)] = index.search("шок")
+    assert document["title"] == "шок"
+    assert score == pytest.approx(1.0)
+
+
+def test_kinds_filter_and_limit(index):
+    assert [document["kind"] for document, _ in index.search("воздух шок пеной", kinds=("drug",))] == ["drug"]
+    assert len(index.search("свежий воздух", limit=1)) == 1
+
+
+def test_unknown_terms_return_nothing(index):
+    assert index.search("квантовая хромодинамика") == []
+    assert index.search("и в на") == []
+    assert TfidfIndex().search("хлор") == []
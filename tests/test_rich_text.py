@@ -0,0 +1,69 @@
+import pytest
+
+from utils.rich_text import compile_markdown, utf16_len
+
+
+def entity_types(rich):
+    return [(entity.type, entity.offset, entity.length) for entity in rich.entities]
+
+
+def test_bold_italic_code_link():
+    rich = compile_markdown("**Жирный** _курсив_ `/dose` [сайт](https://example.org)")
+    assert rich.text == "Жирный курсив /dose сайт"
+    assert entity_types(rich) == [("bold", 0, 6), ("italic", 7, 6), ("code", 14, 5), ("text_link", 20, 4)]
+    assert rich.entities[3].url == "https://example.org"
+
+
+def test_offsets_in_utf16_units():
+    rich = compile_markdown("🚑 **Скорая**")
+    # Эмодзи занимает две единицы UTF-16
+    assert utf16_len("🚑 ") == 3
+    assert entity_types(rich) == [("bold", 3, 6)]
+
+
+def test_pre_block_and_single_star():
+    rich = compile_markdown("*важно*\n```\nстрока\n```")
+    assert rich.text == "важно\nстрока"
+    assert entity_types(rich) == [("bold", 0, 5), ("pre", 6, 6)]
+
+
+def test_escaped_markup_is_plain_text():
+    rich = compile_markdown(r"a\_b \*c\* \[d]")
+    assert rich.text == "a_b *c* [d]"
+    assert rich.entities == []
+
+
+def test_brackets_without_url_are_plain_text():
+    rich = compile_markdown("[Дата] и [Место]")
+    assert rich.text == "[Дата] и [Место]"
+    assert rich.entities == []
+
+
+def test_text_is_stripped():
+    rich = compile_markdown("\n  **a**  \n")
+    assert rich.text == "a"
+    assert entity_types(rich) == [("bold", 0, 1)]
+
+
+@pytest.mark.parametrize("source, line", [
+    ("ok\n**не закрыт", 2),
+    ("`код", 1),
+    ("a\n\nb\n```", 4),
+    ("[текст](https://example.org", 1),
+])
+def test_unclosed_markup_reports_line(source, line):
+    with pytest.raises(ValueError, match=f"строка {line}"):
+        compile_markdown(source)
+
+
+def test_bold_across_paragraphs_is_rejected():
+    with pytest.raises(ValueError, match="несколько абзацев"):
+        compile_markdown("**первый\n\nвторой**")
+
+
+def test_as_kwargs_disables_parse_mode():
+    kwargs = compile_markdown("**a**").as_kwargs()
+    assert kwargs["parse_mode"] is None
+    assert kwargs["text"] == "a"
+    assert len(kwargs["entities"]) == 1
+    assert compile_markdown("a").as_kwargs()["entities"] is None
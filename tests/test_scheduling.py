@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from benchmarks.harness import callback_update, message_update
+from utils.scheduling import ADMIN, EMERGENCY, NAVIGATION, PriorityScheduler, classify_update
+from utils.send_queue import PRIORITY_BULK, PRIORITY_EMERGENCY, send_priority
+
+
+@pytest.mark.parametrize("text, update_class", [
+    ("/dose адреналин 70", EMERGENCY),
+    ("/poison@help112_bot", EMERGENCY),
+    ("/HAZMAT 1017", EMERGENCY),
+    ("/export csv", ADMIN),
+    ("/admin 20.1", NAVIGATION),
+    ("/start", NAVIGATION),
+    ("привет", NAVIGATION),
+    ("/", NAVIGATION),
+])
+def test_classify_message(text, update_class):
+    assert classify_update(message_update(1, 1, text)) == update_class
+
+
+@pytest.mark.parametrize("data, update_class", [
+    ("med_dose", EMERGENCY),
+    ("nr:hospital", EMERGENCY),
+    ("admin_stats", ADMIN),
+    ("pg:law:2", NAVIGATION),
+    ("back", NAVIGATION),
+])
+def test_classify_callback(data, update_class):
+    assert classify_update(callback_update(1, 1, data)) == update_class
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_freed_slot_goes_to_most_important_class():
+    async def scenario():
+        scheduler = PriorityScheduler({EMERGENCY: 1, NAVIGATION: 1, ADMIN: 1}, max_concurrency=1)
+        await scheduler.acquire(NAVIGATION)
+        order = []
+
+        async def job(update_class):
+            await scheduler.acquire(update_class)
+            order.append(update_class)
+            scheduler.release(update_class)
+
+        tasks = [asyncio.create_task(job(update_class)) for update_class in (ADMIN, NAVIGATION, EMERGENCY)]
+        await asyncio.sleep(0)
+        assert scheduler.depth == 3
+        scheduler.release(NAVIGATION)
+        await asyncio.gather(*tasks)
+        return order, scheduler
+
+    order, scheduler = run(scenario())
+    assert order == [EMERGENCY, NAVIGATION, ADMIN]
+    assert scheduler.total_active == 0
+
+
+def test_class_limit_does_not_block_other_classes():
+    async def scenario():
+        scheduler = PriorityScheduler({EMERGENCY: 2, NAVIGATION: 2, ADMIN: 1}, max_concurrency=4)
+        await scheduler.acquire(ADMIN)
+        waiting = asyncio.create_task(scheduler.acquire(ADMIN))
+        await asyncio.sleep(0)
+        # Второй админский апдейт ждет, экстренный проходит сразу
+        await asyncio.wait_for(scheduler.acquire(EMERGENCY), 1)
+        assert not waiting.done()
+        scheduler.release(ADMIN)
+        await asyncio.wait_for(waiting, 1)
+        return scheduler.active
+
+    assert run(scenario()) == {EMERGENCY: 1, NAVIGATION: 0, ADMIN: 1}
+
+
+def test_cancelled_waiter_leaves_queue():
+    async def scenario():
+        scheduler = PriorityScheduler({EMERGENCY: 1, NAVIGATION: 1, ADMIN: 1}, max_concurrency=1)
+        await scheduler.acquire(EMERGENCY)
+        waiting = asyncio.create_task(scheduler.acquire(NAVIGATION))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        scheduler.release(EMERGENCY)
+        return scheduler.depth, scheduler.total_active
+
+    assert run(scenario()) == (0, 0)
+
+
+def test_middleware_sets_send_priority():
+    async def scenario():
+        scheduler = PriorityScheduler()
+        seen = []
+
+        async def handler(event, data):
+            seen.append(send_priority.get())
+
+        await scheduler(handler, message_update(1, 1, "/dose"), {})
+        await scheduler(handler, message_update(2, 1, "/broadcast текст"), {})
+        return seen, scheduler.total_active
+
+    assert run(scenario()) == ([PRIORITY_EMERGENCY, PRIORITY_BULK], 0)
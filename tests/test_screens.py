@@ -0,0 +1,127 @@
+import asyncio
+
+import pytest
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import EditMessageText
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, MessageEntity
+
+import utils.screens as screens
+from utils.screens import ScreenCache, edit_screen, screen_hash
+
+
+def keyboard(data):
+    return InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text="Назад", callback_data=data)]])
+
+
+def bold(length):
+    return [MessageEntity(type="bold", offset=0, length=length)]
+
+
+def test_hash_depends_on_text_and_keyboard():
+    assert screen_hash("a", keyboard("back")) == screen_hash("a", keyboard("back"))
+    assert screen_hash("a", keyboard("back")) != screen_hash("b", keyboard("back"))
+    assert screen_hash("a", keyboard("back")) != screen_hash("a", keyboard("med"))
+    assert screen_hash("a") != screen_hash("a", keyboard("back"))
+
+
+def test_hash_depends_on_entities_and_parse_mode():
+    # Регрессия: раньше сущности не входили в хеш, а parse_mode=None не отличался от режима по умолчанию
+    assert screen_hash("ab", entities=bold(1), parse_mode=None) != screen_hash("ab", entities=bold(2), parse_mode=None)
+    assert screen_hash("ab", entities=bold(1), parse_mode=None) == screen_hash("ab", parse_mode=None, entities=bold(1))
+    assert screen_hash("ab") != screen_hash("ab", parse_mode=None)
+    assert screen_hash("ab", parse_mode="Markdown") != screen_hash("ab", parse_mode="HTML")
+
+
+def test_cache_lru_eviction():
+    cache = ScreenCache(size=2)
+    cache.remember("a", 1)
+    cache.remember("b", 2)
+    # Обращение к "a" делает его свежим - вытесняется "b"
+    assert cache.is_shown("a", 1)
+    cache.remember("c", 3)
+    assert cache.is_shown("a", 1)
+    assert not cache.is_shown("b", 2)
+    assert cache.is_shown("c", 3)
+    assert not cache.is_shown("c", 4)
+    cache.forget("c")
+    assert not cache.is_shown("c", 3)
+    cache.clear()
+    assert not cache.is_shown("a", 1)
+
+
+class Chat:
+    id = 42
+
+
+class FakeMessage:
+    """Сообщение с edit_text, который считает вызовы или выдает ошибку Telegram"""
+
+    def __init__(self, message_id=1, error=None):
+        self.chat = Chat()
+        self.message_id = message_id
+        self.error = error
+        self.edits = []
+
+    async def edit_text(self, text, **kwargs):
+        self.edits.append((text, kwargs))
+        if self.error:
+            raise TelegramBadRequest(method=EditMessageText(text=text), message=self.error)
+
+
+@pytest.fixture(autouse=True)
+def cache(monkeypatch):
+    cache = ScreenCache(size=10)
+    monkeypatch.setattr(screens, "screen_cache", cache)
+    return cache
+
+
+def test_same_screen_is_not_sent_again():
+    message = FakeMessage()
+
+    async def scenario():
+        first = await edit_screen(message, "меню", keyboard("back"), parse_mode="Markdown")
+        second = await edit_screen(message, "меню", keyboard("back"), parse_mode="Markdown")
+        changed = await edit_screen(message, "меню", keyboard("med"), parse_mode="Markdown")
+        return first, second, changed
+
+    assert asyncio.run(scenario()) == (True, False, True)
+    assert len(message.edits) == 2
+
+
+def test_changed_entities_are_sent():
+    message = FakeMessage()
+
+    async def scenario():
+        await edit_screen(message, "ab", entities=bold(1), parse_mode=None)
+        return await edit_screen(message, "ab", entities=bold(2), parse_mode=None)
+
+    assert asyncio.run(scenario()) is True
+    assert len(message.edits) == 2
+
+
+def test_not_modified_is_remembered():
+    message = FakeMessage(error="Bad Request: message is not modified")
+
+    async def scenario():
+        first = await edit_screen(message, "меню")
+        second = await edit_screen(message, "меню")
+        return first, second
+
+    assert asyncio.run(scenario()) == (False, False)
+    assert len(message.edits) == 1
+
+
+def test_other_errors_forget_screen():
+    message = FakeMessage()
+
+    async def scenario():
+        await edit_screen(message, "меню")
+        message.error = "Bad Request: message to edit not found"
+        with pytest.raises(TelegramBadRequest):
+            await edit_screen(message, "другое")
+        message.error = None
+        return await edit_screen(message, "меню")
+
+    # После ошибки экран не считается показанным и отправляется снова
+    assert asyncio.run(scenario()) is True
+    assert len(message.edits) == 3
@@ -0,0 +1,87 @@
+import asyncio
+
+from utils.stats import StatsService
+
+
+class Compute:
+    """Пересчет статистики с подсчетом вызовов"""
+
+    def __init__(self, results=None, delay: float = 0.01):
+        self.calls = 0
+        self.results = list(results or [])
+        self.delay = delay
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.results:
+            result = self.results.pop(0)
+            if isinstance(result, Exception):
+                raise result
+            return result
+        return {"total_users": self.calls}
+
+
+def test_concurrent_requests_share_one_computation():
+    async def scenario():
+        compute = Compute()
+        service = StatsService(compute, refresh_interval=60, max_age=900)
+        results = await asyncio.gather(*(service.get() for _ in range(10)))
+        return compute.calls, results
+
+    calls, results = asyncio.run(scenario())
+    assert calls == 1
+    assert all(stats == {"total_users": 1} for stats, _ in results)
+
+
+def test_fresh_result_is_cached():
+    async def scenario():
+        compute = Compute()
+        service = StatsService(compute, refresh_interval=60, max_age=900)
+        await service.get()
+        stats, age = await service.get()
+        return compute.calls, stats, age
+
+    calls, stats, age = asyncio.run(scenario())
+    assert calls == 1
+    assert stats == {"total_users": 1}
+    assert 0 <= age < 60
+
+
+def test_stale_result_is_returned_while_refreshing():
+    async def scenario():
+        compute = Compute()
+        service = StatsService(compute, refresh_interval=0, max_age=900)
+        await service.get()
+        stats, _ = await service.get()
+        await service.refresh()
+        return stats, service.stats
+
+    shown, refreshed = asyncio.run(scenario())
+    assert shown == {"total_users": 1}
+    assert refreshed == {"total_users": 2}
+
+
+def test_errors_keep_last_good_result():
+    async def scenario():
+        compute = Compute([{"total_users": 5}, {"error": "нет связи"}, RuntimeError("сбой")])
+        service = StatsService(compute, refresh_interval=60, max_age=900)
+        await service.get()
+        await service.refresh()
+        await service.refresh()
+        return service.stats
+
+    assert asyncio.run(scenario()) == {"total_users": 5}
+
+
+def test_clear_forces_recomputation():
+    async def scenario():
+        compute = Compute()
+        service = StatsService(compute)
+        await service.get()
+        service.clear()
+        assert service.age() is None
+        await service.get()
+        return compute.calls
+
+    assert asyncio.run(scenario()) == 2
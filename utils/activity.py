@@ -0,0 +1,289 @@
+import asyncio
+import glob
+import logging
+import os
+import struct
+import time
+from array import array
+
+from dotenv import load_dotenv
+
+from utils.state import state_path, write_atomic
+
+load_dotenv()
+
+# Файл почасовых рядов активности; у процессов-обработчиков - activity_w{N}.bin рядом с ним
+ACTIVITY_FILE = os.getenv("ACTIVITY_FILE", state_path("activity.bin"))
+ACTIVITY_SAVE_INTERVAL = float(os.getenv("ACTIVITY_SAVE_INTERVAL", "300"))
+# Глубина истории: 90 суток почасовых корзин
+ACTIVITY_HOURS = 90 * 24
+
+# Разделы для подсчета команд и нажатий
+SECTIONS = ("med", "fire", "police", "rescue", "ai", "contacts", "menu", "admin")
+SECTION_TITLES = {
+    "med": "🚑 Медицина", "fire": "🚒 Пожарные", "police": "👮 Полиция", "rescue": "🆘 Спасатели",
+    "ai": "🤖 ИИ", "contacts": "📞 Контакты", "menu": "Меню и справка", "admin": "🔧 Админка"
+}
+SERIES = ("active", "new") + tuple(f"cmd_{section}" for section in SECTIONS)
+
+COMMAND_SECTIONS = {
+    "dose": "med", "poison": "med", "fire": "fire", "hazmat": "fire", "law": "police", "admin": "police",
+    "ai_symptoms": "ai", "ai_protocol": "ai", "ai_legal": "ai", "ai_checklist": "ai",
+    "nearest": "contacts", "export": "admin", "broadcast": "admin"
+}
+
+# Формат файла: заголовок, номера часов по слотам (int64), ряды (uint32), затем
+# час и id пользователей, уже учтенных в нем как активные (int64; с версии 2)
+_MAGIC = b"112A"
+_VERSION = 2
+_HEADER = struct.Struct("<4sHHI")
+_SEEN = struct.Struct("<qI")
+
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+
+logger = logging.getLogger(__name__)
+
+
+def section_for(action: str) -> str:
+    """Раздел по команде ("/dose") или callback_data ("med_dose", "pg:law:1")"""
+    if action.startswith("/"):
+        command = action[1:].split("@", 1)[0].lower()
+        return COMMAND_SECTIONS.get(command, "menu")
+    if action in ("location", "nearest") or action.startswith("nr:"):
+        # Поиск ближайших служб по местоположению
+        return "contacts"
+    if action.startswith("pg:"):
+        # Листание каталога: pg:<команда просмотра записи>:<страница>
+        return COMMAND_SECTIONS.get(action.split(":")[1], "menu")
+    prefix = action.split("_", 1)[0]
+    return prefix if prefix in SECTIONS else "menu"
+
+
+def sparkline(values) -> str:
+    """Строка из символов ▁..█ по значениям (масштаб от 0 до максимума)"""
+    top = max(values, default=0)
+    if top <= 0:
+        return SPARK_CHARS[0] * len(values)
+    last = len(SPARK_CHARS) - 1
+    return "".join(SPARK_CHARS[round(value / top * last)] for value in values)
+
+
+def current_hour(now: float = None) -> int:
+    """Номер часа от начала эпохи (по местному времени сервера)"""
+    now = time.time() if now is None else now
+    return int((now + time.localtime(now).tm_gmtoff) // 3600)
+
+
+class ActivitySeries:
+    """Почасовые ряды активности в кольцевых массивах фиксированного размера
+
+    Запись точки - O(1): индекс слота - номер часа по модулю глубины,
+    устаревший слот обнуляется при первом обращении в новом часе.
+    Уникальные активные пользователи считаются по множеству id текущего
+    часа, которое очищается при смене часа и сохраняется вместе с рядами,
+    чтобы перезапуск не учитывал тех же пользователей повторно. Хранилище
+    пользователей ряды не читают; на диск массивы пишутся как есть
+    (около 100 КБ).
+    """
+
+    def __init__(self, path: str = ACTIVITY_FILE, hours: int = ACTIVITY_HOURS):
+        self.path = path
+        self.hours = hours
+        self.clear()
+        # Шаблон файлов других обработчиков для общей картины (combined)
+        self.merge_pattern = None
+
+    def clear(self):
+        """Пустые ряды (файл на диске не меняется)"""
+        self.slot_hours = array("q", [-1]) * self.hours
+        self.series = {name: array("I", [0]) * self.hours for name in SERIES}
+        self._hour = None
+        self._hour_end = 0.0
+        self._slot = 0
+        self._seen = set()
+        self.dirty = False
+
+    def _hour_now(self) -> int:
+        # localtime вызывается только при смене часа
+        now = time.time()
+        if now >= self._hour_end or self._hour is None:
+            offset = time.localtime(now).tm_gmtoff
+            hour = int((now + offset) // 3600)
+            self._hour_end = (hour + 1) * 3600 - offset
+            return hour
+        return self._hour
+
+    def _advance(self, hour: int):
+        """Переход к слоту часа hour (обнуление, если в нем старые данные)"""
+        self._hour = hour
+        self._slot = hour % self.hours
+        self._seen = set()
+        if self.slot_hours[self._slot] != hour:
+            self.slot_hours[self._slot] = hour
+            for values in self.series.values():
+                values[self._slot] = 0
+
+    def record(self, user_id: int, action: str, hour: int = None):
+        """Учет действия пользователя: активный в этом часе и команда раздела"""
+        hour = self._hour_now() if hour is None else hour
+        if hour != self._hour:
+            self._advance(hour)
+        slot = self._slot
+        if user_id not in self._seen:
+            self._seen.add(user_id)
+            self.series["active"][slot] += 1
+        self.series["cmd_" + section_for(action)][slot] += 1
+        self.dirty = True
+
+    def record_new(self, hour: int = None):
+        """Учет нового пользователя"""
+        hour = self._hour_now() if hour is None else hour
+        if hour != self._hour:
+            self._advance(hour)
+        self.series["new"][self._slot] += 1
+        self.dirty = True
+
+    def snapshot(self):
+        """Номера часов слотов и ряды этого процесса"""
+        return self.slot_hours, self.series
+
+    def last_hours(self, name: str, count: int, hour: int = None, snapshot=None) -> list:
+        """Значения ряда за последние count часов (от старых к новым)"""
+        hour = current_hour() if hour is None else hour
+        slot_hours, series = snapshot or self.snapshot()
+        values = series[name]
+        result = []
+        for h in range(hour - count + 1, hour + 1):
+            slot = h % self.hours
+            result.append(values[slot] if slot_hours[slot] == h else 0)
+        return result
+
+    def last_days(self, name: str, count: int, hour: int = None, snapshot=None, reduce=sum) -> list:
+        """Ряд по суткам за последние count суток (последние - текущие неполные)
+
+        reduce - свертка почасовых значений суток (sum или max).
+        """
+        hour = current_hour() if hour is None else hour
+        first_hour = (hour // 24 - count + 1) * 24
+        hourly = self.last_hours(name, hour - first_hour + 1, hour, snapshot)
+        return [reduce(hourly[day * 24:(day + 1) * 24]) for day in range(count)]
+
+    def to_bytes(self) -> bytes:
+        header = _HEADER.pack(_MAGIC, _VERSION, len(SERIES), self.hours)
+        names = "\n".join(SERIES).encode("utf-8")
+        parts = [header, struct.pack("<I", len(names)), names, self.slot_hours.tobytes()]
+        parts.extend(self.series[name].tobytes() for name in SERIES)
+        seen = array("q", self._seen)
+        parts.append(_SEEN.pack(-1 if self._hour is None else self._hour, len(seen)))
+        parts.append(seen.tobytes())
+        return b"".join(parts)
+
+    @staticmethod
+    def parse(data: bytes):
+        """Разбор файла: (глубина, номера часов слотов, {ряд: массив}, (час, учтенные id))"""
+        magic, version, series_count, hours = _HEADER.unpack_from(data, 0)
+        if magic != _MAGIC or version not in (1, _VERSION):
+            raise ValueError("неизвестный формат файла активности")
+        offset = _HEADER.size
+        (names_length,) = struct.unpack_from("<I", data, offset)
+        offset += 4
+        names = data[offset:offset + names_length].decode("utf-8").split("\n")
+        offset += names_length
+        slot_hours = array("q")
+        slot_hours.frombytes(data[offset:offset + hours * 8])
+        offset += hours * 8
+        series = {}
+        for name in names[:series_count]:
+            values = array("I")
+            values.frombytes(data[offset:offset + hours * 4])
+            offset += hours * 4
+            series[name] = values
+        seen = array("q")
+        seen_hour = -1
+        if version >= 2:
+            seen_hour, count = _SEEN.unpack_from(data, offset)
+            offset += _SEEN.size
+            seen.frombytes(data[offset:offset + count * 8])
+        return hours, slot_hours, series, (seen_hour, seen)
+
+    def load(self):
+        """Загрузка рядов с диска (ряды неизвестных имен пропускаются)"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "rb") as f:
+                hours, slot_hours, series, (seen_hour, seen) = self.parse(f.read())
+        except (OSError, ValueError, struct.error) as e:
+            logger.error(f"Не удалось загрузить ряды активности из {self.path}: {e}")
+            return
+        if hours != self.hours:
+            logger.warning(f"Глубина рядов в {self.path} ({hours} ч) отличается от {self.hours} ч, ряды не загружены")
+            return
+        self.slot_hours = slot_hours
+        for name in SERIES:
+            if name in series:
+                self.series[name] = series[name]
+        self._hour = None
+        self._seen = set()
+        if seen_hour == current_hour():
+            # Перезапуск в том же часе: уже учтенные пользователи не считаются снова
+            self._hour = seen_hour
+            self._slot = seen_hour % self.hours
+            self._seen = set(seen)
+
+    def _write(self, data: bytes):
+        write_atomic(self.path, data)
+
+    async def save(self):
+        """Запись на диск в фоновом потоке (снимок делается на event loop)"""
+        if not self.dirty:
+            return
+        self.dirty = False
+        await asyncio.to_thread(self._write, self.to_bytes())
+
+    def combined(self, pattern: str = None):
+        """Снимок рядов этого процесса, сложенных с файлами других обработчиков
+
+        Пользователи закреплены за обработчиками, поэтому сумма уникальных
+        активных по процессам точна. В каждом слоте берется самый свежий
+        час среди процессов; значения более старых часов не складываются.
+        """
+        pattern = pattern or self.merge_pattern
+        slot_hours = array("q", self.slot_hours)
+        series = {name: array("I", values) for name, values in self.series.items()}
+        if not pattern:
+            return slot_hours, series
+        for path in glob.glob(pattern):
+            if os.path.abspath(path) == os.path.abspath(self.path):
+                continue
+            try:
+                with open(path, "rb") as f:
+                    hours, other_hours, other_series, _ = self.parse(f.read())
+            except (OSError, ValueError, struct.error):
+                continue
+            if hours != self.hours:
+                continue
+            for slot in range(hours):
+                other_hour = other_hours[slot]
+                if other_hour < slot_hours[slot]:
+                    continue
+                if other_hour > slot_hours[slot]:
+                    slot_hours[slot] = other_hour
+                    for values in series.values():
+                        values[slot] = 0
+                for name, values in other_series.items():
+                    if name in series:
+                        series[name][slot] += values[slot]
+        return slot_hours, series
+
+    async def run(self, interval: float = ACTIVITY_SAVE_INTERVAL):
+        """Фоновая задача периодической записи рядов"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.save()
+            except Exception as e:
+                logger.error(f"Ошибка записи рядов активности в {self.path}: {e}")
+
+
+activity_series = ActivitySeries()
@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+from utils.log_rotation import RotatingDailyFileHandler
+from utils.logger import (
+    FileFormatter, LOG_MAX_BYTES, LOG_MAX_TOTAL_MB, LOG_RETENTION_DAYS,
+    log_security_event, log_user_action
+)
+
+load_dotenv()
+
+# Доля отдельных действий, которые пишутся в поток целиком (0.0 - только сводки)
+AUDIT_SAMPLE_RATE = float(os.getenv("AUDIT_SAMPLE_RATE", "0.01"))
+# Интервал агрегации и записи пачки (секунды)
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", "60"))
+
+
+def _create_audit_logger(prefix: str = "user_actions"):
+    """Отдельный логгер потока действий пользователей (logs/user_actions_YYYYMMDD.log)"""
+    audit_logger = logging.getLogger("112help.audit")
+    audit_logger.setLevel(logging.INFO)
+    audit_logger.propagate = False
+    if not audit_logger.handlers:
+        log_dir = Path("logs")
+        log_dir.mkdir(exist_ok=True)
+        handler = RotatingDailyFileHandler(
+            log_dir,
+            prefix=prefix,
+            max_bytes=LOG_MAX_BYTES,
+            retention_days=LOG_RETENTION_DAYS,
+            max_total_bytes=LOG_MAX_TOTAL_MB * 1024 * 1024
+        )
+        handler.setFormatter(FileFormatter())
+        audit_logger.addHandler(handler)
+    return audit_logger
+
+
+class UserActionAudit:
+    """Поток действий пользователей с семплированием и поинтервальной агрегацией
+
+    На event loop выполняется только инкремент счетчиков; строки формируются
+    и пишутся пачкой в фоновом потоке раз в flush_interval секунд.
+    События безопасности не семплируются: они сразу уходят в основной лог
+    и попадают в поток при ближайшей записи пачки.
+    """
+
+    def __init__(self, sample_rate: float = AUDIT_SAMPLE_RATE, flush_interval: float = AUDIT_FLUSH_INTERVAL):
+        self.sample_rate = sample_rate
+        self.flush_interval = flush_interval
+        self._logger = None
+        # Имя файла потока; у каждого процесса-обработчика свой файл
+        self.file_prefix = "user_actions"
+        # user_id -> {действие: количество}
+        self._counts = {}
+        # Семплированные отдельные действия: (user_id, действие)
+        self._sampled = []
+        # События безопасности: (user_id, событие, уровень)
+        self._security = []
+        self._interval_started = time.monotonic()
+
+    @property
+    def logger(self):
+        if self._logger is None:
+            self._logger = _create_audit_logger(self.file_prefix)
+        return self._logger
+
+    def record(self, user_id: int, action: str):
+        """Учет действия пользователя (O(1), без ввода-вывода)"""
+        actions = self._counts.get(user_id)
+        if actions is None:
+            actions = self._counts[user_id] = {}
+        actions[action] = actions.get(action, 0) + 1
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            self._sampled.append((user_id, action))
+
+    def security(self, user_id: int, event: str, severity: str = "warning"):
+        """Событие безопасности: никогда не отбрасывается семплированием"""
+        log_security_event(logging.getLogger(__name__), user_id, event, severity)
+        self._security.append((user_id, event, severity))
+
+    def _take_batch(self):
+        """Забрать накопленные данные и начать новый интервал"""
+        batch = (self._counts, self._sampled, self._security, time.monotonic() - self._interval_started)
+        self._counts, self._sampled, self._security = {}, [], []
+        self._interval_started = time.monotonic()
+        return batch
+
+    def _write_batch(self, counts, sampled, security, elapsed):
+        """Запись пачки строк (выполняется в фоновом потоке)"""
+        for user_id, event, severity in security:
+            log_security_event(self.logger, user_id, event, severity)
+        for user_id, action in sampled:
+            log_user_action(self.logger, user_id, action, details="выборка")
+        for user_id, actions in counts.items():
+            total = sum(actions.values())
+            top = sorted(actions.items(), key=lambda item: item[1], reverse=True)[:5]
+            breakdown = ", ".join(f"{action}×{count}" for action, count in top)
+            self.logger.info(f"Пользователь {user_id}: {total} команд за {elapsed:.0f}с ({breakdown})")
+
+    async def flush(self):
+        """Сбросить текущий интервал в поток"""
+        counts, sampled, security, elapsed = self._take_batch()
+        if counts or sampled or security:
+            await asyncio.to_thread(self._write_batch, counts, sampled, security, elapsed)
+
+    async def run(self):
+        """Фоновая задача периодической записи сводок"""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logging.getLogger(__name__).error(f"Ошибка записи потока действий: {e}")
+
+
+user_audit = UserActionAudit()
@@ -0,0 +1,247 @@
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import time
+from datetime import datetime
+
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+from aiogram.types import MessageEntity
+from dotenv import load_dotenv
+
+from database.models import User
+from utils.overload import overload_guard
+from utils.send_queue import PRIORITY_BULK, TokenBucket, send_priority, send_queue
+from utils.state import state_path, write_atomic
+
+load_dotenv()
+
+# Скорость рассылки (сообщений в секунду); не больше 2/3 общего лимита отправки процесса
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", "20"))
+# Файл контрольной точки; при WORKERS > 1 рассылку ведет только обработчик 0
+BROADCAST_CHECKPOINT_FILE = os.getenv("BROADCAST_CHECKPOINT_FILE", state_path("broadcast.json"))
+# Запись контрольной точки каждые N получателей
+BROADCAST_CHECKPOINT_EVERY = int(os.getenv("BROADCAST_CHECKPOINT_EVERY", "200"))
+BROADCAST_BATCH_SIZE = 500
+
+RUNNING = "running"
+FINISHED = "finished"
+CANCELLED = "cancelled"
+
+logger = logging.getLogger(__name__)
+
+
+def strip_command(text: str, entities):
+    """Текст после команды и сущности со сдвинутыми смещениями (UTF-16)"""
+    parts = text.split(maxsplit=1)
+    body = parts[1] if len(parts) > 1 else ""
+    shift = len(text[:len(text) - len(body)].encode("utf-16-le")) // 2
+    result = []
+    for entity in entities or []:
+        if entity.offset < shift:
+            continue
+        data = entity.model_dump(exclude_none=True)
+        data["offset"] = entity.offset - shift
+        result.append(data)
+    return body, result
+
+
+class Broadcaster:
+    """Рассылка объявления всем пользователям с ограничением скорости
+
+    Получатели читаются из хранилища пачками (User.iter_users), сообщения
+    уходят с приоритетом bulk, поэтому ответы на запросы не ждут рассылку.
+    Ответ 403 означает, что пользователь заблокировал бота - он отмечается
+    в хранилище (bot_blocked) и пропускается в следующих рассылках; 429
+    приостанавливает рассылку на retry_after. Состояние периодически
+    пишется в контрольную точку, и после перезапуска рассылка продолжается
+    со следующего получателя.
+    """
+
+    def __init__(self, path: str = BROADCAST_CHECKPOINT_FILE, rate: float = BROADCAST_RATE,
+                 checkpoint_every: int = BROADCAST_CHECKPOINT_EVERY):
+        self.path = path
+        self.rate = rate
+        self.checkpoint_every = checkpoint_every
+        self.state = None
+        self._task = None
+        self._blocked = []
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def _new_state(self, admin_id: int, text: str, entities) -> dict:
+        return {
+            "id": datetime.now().strftime("%Y%m%d%H%M%S"),
+            "admin_id": admin_id,
+            "text": text,
+            "entities": entities,
+            "status": RUNNING,
+            "started": time.time(),
+            "finished": None,
+            "last_user_id": None,
+            "processed": 0,
+            "sent": 0,
+            "blocked": 0,
+            "failed": 0,
+            "skipped": 0
+        }
+
+    def _write(self, data: str):
+        write_atomic(self.path, data, "w")
+
+    async def checkpoint(self):
+        """Отметка заблокировавших и запись состояния на диск"""
+        blocked, self._blocked = self._blocked, []
+        await User.mark_bot_blocked(blocked)
+        await asyncio.to_thread(self._write, json.dumps(self.state, ensure_ascii=False))
+
+    def load(self):
+        """Загрузка последней рассылки из контрольной точки"""
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self.state = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Не удалось прочитать контрольную точку рассылки {self.path}: {e}")
+            self.state = None
+        return self.state
+
+    def start(self, bot, admin_id: int, text: str, entities=None):
+        """Запуск новой рассылки (False - уже идет другая)"""
+        if self.running:
+            return False
+        self.state = self._new_state(admin_id, text, entities or [])
+        # Пустой контекст: рассылка не наследует трассировку апдейта, запустившего ее
+        self._task = asyncio.create_task(self._run(bot), context=contextvars.Context())
+        return True
+
+    def resume(self, bot):
+        """Продолжение прерванной рассылки после перезапуска"""
+        if self.running or not self.load() or self.state.get("status") != RUNNING:
+            return False
+        logger.info(
+            f"Продолжение рассылки {self.state['id']} после пользователя {self.state['last_user_id']} "
+            f"(обработано {self.state['processed']})"
+        )
+        self._task = asyncio.create_task(self._run(bot))
+        return True
+
+    async def cancel(self):
+        """Остановка текущей рассылки"""
+        if not self.running:
+            return False
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self.state["status"] = CANCELLED
+        self.state["finished"] = time.time()
+        await self.checkpoint()
+        return True
+
+    async def stop(self):
+        """Прерывание при остановке бота: состояние остается running для продолжения"""
+        if self.running:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _send(self, bot, user_id: int, bucket: TokenBucket, entities):
+        """Отправка одному получателю с ожиданием после 429"""
+        state = self.state
+        while True:
+            delay = bucket.reserve()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                await bot.send_message(user_id, state["text"], entities=entities, parse_mode=None)
+                state["sent"] += 1
+                return
+            except TelegramRetryAfter as e:
+                logger.warning(f"Рассылка {state['id']}: 429, пауза {e.retry_after}с")
+                bucket.pause(e.retry_after)
+            except TelegramForbiddenError:
+                # Бот заблокирован пользователем или аккаунт удален
+                state["blocked"] += 1
+                self._blocked.append(user_id)
+                return
+            except TelegramBadRequest as e:
+                state["failed"] += 1
+                logger.warning(f"Рассылка {state['id']}: пользователь {user_id} - {e.message}")
+                return
+
+    async def _run(self, bot):
+        state = self.state
+        # Ответы на апдейты получают токены отправки раньше рассылки
+        send_priority.set(PRIORITY_BULK)
+        rate = min(self.rate, send_queue.global_bucket.rate * 2 / 3)
+        bucket = TokenBucket(rate, 1)
+        entities = [MessageEntity(**entity) for entity in state["entities"]] or None
+        logger.info(f"Рассылка {state['id']} запущена админом {state['admin_id']}, {rate:.1f} сообщ./с")
+        await self.checkpoint()
+        try:
+            async for batch in User.iter_users(
+                BROADCAST_BATCH_SIZE, after_user_id=state["last_user_id"], position=state["processed"]
+            ):
+                for user_data in batch:
+                    # При перегрузке рассылка ждет, чтобы не занимать лимит отправки
+                    while overload_guard.degraded:
+                        await asyncio.sleep(1)
+                    user_id = user_data["user_id"]
+                    if user_data.get("is_blocked") or user_data.get("bot_blocked"):
+                        state["skipped"] += 1
+                    else:
+                        try:
+                            await self._send(bot, user_id, bucket, entities)
+                        except asyncio.CancelledError:
+                            raise
+                        except Exception as e:
+                            state["failed"] += 1
+                            logger.error(f"Рассылка {state['id']}: ошибка отправки {user_id}: {e}")
+                    state["last_user_id"] = user_id
+                    state["processed"] += 1
+                    if state["processed"] % self.checkpoint_every == 0:
+                        await self.checkpoint()
+            state["status"] = FINISHED
+            state["finished"] = time.time()
+            await self.checkpoint()
+            logger.info(
+                f"Рассылка {state['id']} завершена: отправлено {state['sent']}, "
+                f"заблокировали бота {state['blocked']}, ошибок {state['failed']}"
+            )
+            try:
+                await bot.send_message(state["admin_id"], self.report(), parse_mode=None)
+            except Exception as e:
+                logger.warning(f"Не удалось отправить отчет о рассылке: {e}")
+        except asyncio.CancelledError:
+            # При остановке бота состояние остается running - рассылка продолжится после запуска
+            await self.checkpoint()
+            raise
+
+    def report(self) -> str:
+        """Сводка о текущей или последней рассылке"""
+        state = self.state
+        if not state:
+            return "Рассылок еще не было"
+        end = state["finished"] or time.time()
+        elapsed = max(1.0, end - state["started"])
+        titles = {RUNNING: "идет", FINISHED: "завершена", CANCELLED: "остановлена"}
+        status = titles.get(state["status"], state["status"])
+        if state["status"] == RUNNING and not self.running:
+            status = "прервана, продолжится после перезапуска"
+        return (
+            f"📣 Рассылка {state['id']}: {status}\n"
+            f"Обработано: {state['processed']}, отправлено: {state['sent']}\n"
+            f"Заблокировали бота: {state['blocked']}, пропущено: {state['skipped']}, ошибок: {state['failed']}\n"
+            f"Скорость: {state['processed'] / elapsed:.1f}/с, время: {elapsed / 60:.1f} мин"
+        )
+
+
+broadcaster = Broadcaster()
@@ -0,0 +1,133 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Файл записи входящих апдейтов (JSONL); пусто - запись выключена
+UPDATE_CAPTURE_FILE = os.getenv("UPDATE_CAPTURE_FILE", "")
+# Ключ HMAC для user_id; без него ключ случайный и хеши не совпадают между запусками
+UPDATE_CAPTURE_SECRET = os.getenv("UPDATE_CAPTURE_SECRET", "")
+# Скрытие текста: none - как есть, text - обычные сообщения, all - еще и аргументы команд
+UPDATE_CAPTURE_REDACT = os.getenv("UPDATE_CAPTURE_REDACT", "text").lower()
+UPDATE_CAPTURE_FLUSH_INTERVAL = float(os.getenv("UPDATE_CAPTURE_FLUSH_INTERVAL", "5"))
+
+# Команды со свободным текстом в аргументах (симптомы, описание ситуации, текст рассылки):
+# кроме режима none от них записывается только имя команды
+FREE_TEXT_COMMANDS = frozenset({
+    "/ai_symptoms", "/ai_protocol", "/ai_legal", "/ai_checklist", "/broadcast", "/hazmat", "/search"
+})
+
+
+def _mask(text: str) -> str:
+    """Замена текста на маску той же длины (сохраняет форму трафика)"""
+    return "".join(" " if char.isspace() else "x" for char in text)
+
+
+def redact_text(text: str, mode: str = UPDATE_CAPTURE_REDACT) -> str:
+    """Скрытие свободного текста с сохранением команды"""
+    if not text or mode == "none":
+        return text
+    if text.startswith("/"):
+        command, _, arguments = text.partition(" ")
+        if command.split("@", 1)[0].lower() in FREE_TEXT_COMMANDS:
+            return command
+        if mode != "all":
+            return text
+        return f"{command} {_mask(arguments)}" if arguments else command
+    return _mask(text)
+
+
+def redact_callback(data: str, mode: str = UPDATE_CAPTURE_REDACT) -> str:
+    """Координаты из callback_data поиска служб (nr:<тип>:<широта>:<долгота>) не записываются"""
+    if data and mode != "none" and data.startswith("nr:"):
+        return ":".join(data.split(":")[:2])
+    return data
+
+
+class UpdateCapture:
+    """Запись анонимизированных апдейтов для последующего воспроизведения
+
+    На event loop апдейт только превращается в короткую запись и
+    добавляется в буфер; в файл буфер пишется пачкой в фоновом потоке.
+    Сохраняются время, тип, хеши пользователя и чата, тип чата и текст
+    сообщения или callback_data - имена и username не записываются.
+    """
+
+    def __init__(self, path: str = UPDATE_CAPTURE_FILE, secret: str = UPDATE_CAPTURE_SECRET,
+                 redact: str = UPDATE_CAPTURE_REDACT, flush_interval: float = UPDATE_CAPTURE_FLUSH_INTERVAL):
+        self.path = path
+        self.redact = redact
+        self.flush_interval = flush_interval
+        self._key = (secret or secrets.token_hex(32)).encode()
+        self._buffer = []
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def hash_id(self, value: int) -> int:
+        """Стабильный псевдоним идентификатора (положительное 48-битное число)"""
+        digest = hmac.new(self._key, str(value).encode(), hashlib.sha256).digest()
+        return int.from_bytes(digest[:6], "big") or 1
+
+    def record(self, update):
+        """Добавление апдейта в буфер (O(1), без ввода-вывода)"""
+        if update.message:
+            message = update.message
+            user = message.from_user
+            entry = {
+                "kind": "message",
+                "chat_type": message.chat.type,
+                "chat": self.hash_id(message.chat.id),
+                "text": redact_text(message.text or "", self.redact)
+            }
+        elif update.callback_query:
+            callback = update.callback_query
+            user = callback.from_user
+            entry = {
+                "kind": "callback_query",
+                "chat_type": callback.message.chat.type if callback.message else "private",
+                "chat": self.hash_id(callback.message.chat.id) if callback.message else None,
+                "data": redact_callback(callback.data, self.redact)
+            }
+        else:
+            return
+        entry["t"] = round(time.time(), 3)
+        entry["user"] = self.hash_id(user.id) if user else None
+        self._buffer.append(entry)
+
+    def _write_batch(self, batch):
+        """Дозапись пачки строк (выполняется в фоновом потоке)
+
+        Пачка пишется одним вызовом write в режиме O_APPEND, поэтому строки
+        нескольких процессов-обработчиков не перемешиваются.
+        """
+        data = "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in batch).encode("utf-8")
+        with open(self.path, "ab", buffering=0) as f:
+            f.write(data)
+
+    async def flush(self):
+        """Сбросить буфер в файл"""
+        batch, self._buffer = self._buffer, []
+        if batch:
+            await asyncio.to_thread(self._write_batch, batch)
+
+    async def run(self):
+        """Фоновая задача периодической записи буфера"""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logging.getLogger(__name__).error(f"Ошибка записи апдейтов в {self.path}: {e}")
+
+
+update_capture = UpdateCapture()
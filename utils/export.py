@@ -0,0 +1,67 @@
+import asyncio
+import csv
+import gzip
+import json
+import os
+import tempfile
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+from database.models import User
+
+load_dotenv()
+
+# Пользователей в одной пачке чтения из хранилища
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+# Лимит Telegram на отправку документа ботом
+TELEGRAM_UPLOAD_LIMIT = 50 * 1024 * 1024
+
+EXPORT_FORMATS = ("csv", "jsonl")
+EXPORT_FIELDS = (
+    "user_id", "username", "first_name", "last_name", "registration_date",
+    "last_activity", "command_count", "is_blocked", "warnings_count", "bot_blocked"
+)
+
+
+def _export_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _write_batch(writer, stream, fmt: str, batch):
+    """Запись пачки в gzip файл (выполняется в фоновом потоке)"""
+    rows = [{field: _export_value(user_data.get(field)) for field in EXPORT_FIELDS} for user_data in batch]
+    if fmt == "csv":
+        writer.writerows(rows)
+    else:
+        stream.write("".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows))
+
+
+async def export_users(fmt: str = "csv", batch_size: int = EXPORT_BATCH_SIZE):
+    """Выгрузка всех пользователей во временный .gz файл
+
+    Пользователи читаются пачками (User.iter_users), сжатие и запись
+    идут в фоновом потоке. Возвращает путь к файлу и число пользователей;
+    файл удаляет вызывающий.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"неизвестный формат {fmt}")
+    handle, path = tempfile.mkstemp(prefix="112help_users_", suffix=f".{fmt}.gz")
+    os.close(handle)
+    count = 0
+    try:
+        stream = await asyncio.to_thread(gzip.open, path, "wt", encoding="utf-8", newline="")
+        try:
+            writer = None
+            if fmt == "csv":
+                writer = csv.DictWriter(stream, fieldnames=EXPORT_FIELDS)
+                writer.writeheader()
+            async for batch in User.iter_users(batch_size):
+                await asyncio.to_thread(_write_batch, writer, stream, fmt, batch)
+                count += len(batch)
+        finally:
+            await asyncio.to_thread(stream.close)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path, count
@@ -0,0 +1,159 @@
+import gzip
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Один фоновый поток на сжатие и очистку, чтобы не задерживать запись логов
+_tasks = queue.SimpleQueue()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def _run_tasks():
+    while True:
+        task = _tasks.get()
+        if task is None:
+            return
+        func, args = task
+        try:
+            func(*args)
+        except Exception as e:
+            print(f"❌ Ошибка фонового обслуживания логов: {e}")
+
+
+def _submit(func, *args):
+    """Поставить задачу в фоновый поток сжатия"""
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run_tasks, name="log-compress", daemon=True)
+            _worker.start()
+    _tasks.put((func, args))
+
+
+def stop_compression(timeout: float = 5.0):
+    """Дождаться выполнения поставленных задач сжатия (при остановке)"""
+    global _worker
+    with _worker_lock:
+        worker, _worker = _worker, None
+    if worker is not None and worker.is_alive():
+        _tasks.put(None)
+        worker.join(timeout)
+
+
+class RotatingDailyFileHandler(logging.handlers.BaseRotatingHandler):
+    """Файл лога с ротацией в полночь и по размеру (ошибки, поток действий)
+
+    Активный файл - {prefix}_YYYYMMDD.log. При смене дня или когда файл
+    достиг max_bytes, он закрывается, сжимается в .gz в фоновом потоке,
+    после чего удаляются архивы старше retention_days и самые старые
+    архивы сверх max_total_bytes.
+    """
+
+    def __init__(self, log_dir, prefix: str, max_bytes: int = 0,
+                 retention_days: int = 14, max_total_bytes: int = 0, encoding: str = "utf-8"):
+        self.log_dir = Path(log_dir)
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.retention_days = retention_days
+        self.max_total_bytes = max_total_bytes
+        self.current_date = datetime.now().strftime("%Y%m%d")
+        # Только свои файлы: префикс errors не должен захватывать errors_w{N}_* обработчиков
+        self._name_pattern = re.compile(rf"^{re.escape(prefix)}_\d{{8}}(\.\d+)?\.log$")
+        self._archive_pattern = re.compile(rf"^{re.escape(prefix)}_\d{{8}}(\.\d+)?\.log\.gz$")
+        super().__init__(str(self._path_for(self.current_date)), "a", encoding=encoding, delay=True)
+        # Дожимаем файлы, оставшиеся от прошлых запусков
+        _submit(self._compress_leftovers)
+
+    def _path_for(self, date_str: str) -> Path:
+        return self.log_dir / f"{self.prefix}_{date_str}.log"
+
+    def shouldRollover(self, record) -> bool:
+        if time.strftime("%Y%m%d", time.localtime(record.created)) != self.current_date:
+            return True
+        if self.max_bytes > 0:
+            if self.stream is None:
+                self.stream = self._open()
+            # Размер проверяется по уже записанному: запись не форматируется дважды,
+            # файл может превысить max_bytes не больше чем на одну запись
+            if self.stream.tell() >= self.max_bytes:
+                return True
+        return False
+
+    def doRollover(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+
+        finished = Path(self.baseFilename)
+        new_date = datetime.now().strftime("%Y%m%d")
+        if new_date == self.current_date and finished.exists():
+            # Ротация по размеру: текущий файл уходит в {prefix}_YYYYMMDD.N.log
+            index = 1
+            while any(self.log_dir.glob(f"{self.prefix}_{self.current_date}.{index}.log*")):
+                index += 1
+            rotated = self.log_dir / f"{self.prefix}_{self.current_date}.{index}.log"
+            os.replace(finished, rotated)
+            finished = rotated
+
+        if finished.exists():
+            _submit(self._compress_and_prune, finished)
+
+        self.current_date = new_date
+        self.baseFilename = os.path.abspath(self._path_for(new_date))
+
+    def _compress_and_prune(self, path: Path):
+        """Сжатие файла и применение политики хранения (фоновый поток)"""
+        if not path.exists():
+            # Уже сжат: файл ротации мог попасть и в разбор остатков прошлого запуска
+            return
+        try:
+            gz_path = path.with_name(path.name + ".gz")
+            with open(path, "rb") as source, gzip.open(gz_path, "wb") as target:
+                shutil.copyfileobj(source, target)
+            path.unlink()
+        except OSError as e:
+            print(f"❌ Ошибка сжатия лога {path}: {e}")
+        self._prune()
+
+    def _compress_leftovers(self):
+        """Сжатие несжатых файлов, оставшихся после прошлого запуска"""
+        active = Path(self.baseFilename)
+        for path in self.log_dir.glob(f"{self.prefix}_*.log"):
+            if self._name_pattern.match(path.name) and path.absolute() != active:
+                self._compress_and_prune(path)
+        self._prune()
+
+    def _prune(self):
+        """Удаление архивов по сроку хранения и суммарному размеру"""
+        archives = []
+        for path in self.log_dir.glob(f"{self.prefix}_*.log.gz"):
+            if not self._archive_pattern.match(path.name):
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            archives.append((stat.st_mtime, stat.st_size, path))
+        archives.sort()
+
+        now = time.time()
+        total = sum(size for _, size, _ in archives)
+        for mtime, size, path in archives:
+            expired = self.retention_days > 0 and now - mtime > self.retention_days * 86400
+            oversized = self.max_total_bytes > 0 and total > self.max_total_bytes
+            if not (expired or oversized):
+                continue
+            try:
+                path.unlink()
+                total -= size
+            except OSError as e:
+                print(f"❌ Ошибка удаления архива лога {path}: {e}")
+
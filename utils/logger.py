@@ -1,30 +1,58 @@
+import atexit
+import json
 import logging
+import logging.handlers
+import queue
 import sys
 from datetime import datetime
 import os
 from pathlib import Path
 
+from dotenv import load_dotenv
+
+from utils.log_rotation import RotatingDailyFileHandler, stop_compression
+from utils.metrics import log_records_dropped_total
+
+load_dotenv()
+
+# Настройки логирования
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()  # text или json
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Ротация и хранение файлов ошибок
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_RETENTION_DAYS = int(os.getenv("LOG_RETENTION_DAYS", "14"))
+LOG_MAX_TOTAL_MB = int(os.getenv("LOG_MAX_TOTAL_MB", "200"))
+
+# Перевод уровней на русский
+LEVEL_TRANSLATIONS = {
+    'DEBUG': 'ОТЛАДКА',
+    'INFO': 'ИНФО',
+    'WARNING': 'ПРЕДУПРЕЖДЕНИЕ',
+    'ERROR': 'ОШИБКА',
+    'CRITICAL': 'КРИТИЧЕСКАЯ'
+}
+
 class RussianFormatter(logging.Formatter):
     """Форматтер логов на русском языке"""
     
     def __init__(self):
         super().__init__()
+        # Кэш строки времени: пересчитывается раз в секунду
+        self._cached_second = None
+        self._cached_time_str = ""
+    
+    def format_time(self, record) -> str:
+        """Время записи в формате ДД.ММ.ГГГГ ЧЧ:ММ:СС"""
+        second = int(record.created)
+        if second != self._cached_second:
+            self._cached_second = second
+            self._cached_time_str = datetime.fromtimestamp(second).strftime("%d.%m.%Y %H:%M:%S")
+        return self._cached_time_str
         
     def format(self, record):
-        # Форматирование времени на русском
-        dt = datetime.fromtimestamp(record.created)
-        time_str = dt.strftime("%d.%m.%Y %H:%M:%S")
-        
-        # Перевод уровней на русский
-        level_translations = {
-            'DEBUG': 'ОТЛАДКА',
-            'INFO': 'ИНФО',
-            'WARNING': 'ПРЕДУПРЕЖДЕНИЕ', 
-            'ERROR': 'ОШИБКА',
-            'CRITICAL': 'КРИТИЧЕСКАЯ'
-        }
-        
-        level_ru = level_translations.get(record.levelname, record.levelname)
+        time_str = self.format_time(record)
+        level_ru = LEVEL_TRANSLATIONS.get(record.levelname, record.levelname)
         
         # Основное сообщение
         message = f"[{time_str}] {level_ru} - {record.getMessage()}"
@@ -42,8 +70,83 @@ class FileFormatter(RussianFormatter):
         record.is_file_handler = True
         return super().format(record)
 
-def setup_logging():
-    """Настройка системы логирования"""
+class JsonFormatter(RussianFormatter):
+    """Форматтер логов в JSON (одна запись - одна строка)"""
+    
+    def __init__(self, include_traceback: bool = False):
+        super().__init__()
+        self.include_traceback = include_traceback
+    
+    def format(self, record):
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        if record.exc_info and self.include_traceback:
+            entry["traceback"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Обработчик, складывающий записи в очередь без блокировки event loop
+    
+    При переполнении очереди записи ниже ERROR отбрасываются и учитываются
+    в счетчике, ошибки ждут место в очереди не дольше ERROR_PUT_TIMEOUT.
+    """
+    
+    ERROR_PUT_TIMEOUT = 0.1
+    
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+    
+    def prepare(self, record):
+        # Форматирование выполняется в фоновом потоке, здесь только фиксируем текст сообщения
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+    
+    def enqueue(self, record):
+        try:
+            if record.levelno >= logging.ERROR:
+                self.queue.put(record, timeout=self.ERROR_PUT_TIMEOUT)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            log_records_dropped_total.inc()
+
+# Фоновый поток записи логов
+log_listener = None
+queue_handler = None
+
+def get_dropped_records() -> int:
+    """Количество записей, отброшенных при переполнении очереди"""
+    return queue_handler.dropped if queue_handler else 0
+
+def stop_logging(timeout: float = 5.0):
+    """Остановка фонового потока с дозаписью оставшихся записей
+
+    timeout - ожидание задач сжатия архивов (None - до завершения).
+    """
+    global log_listener
+    if log_listener is not None:
+        log_listener.stop()
+        log_listener = None
+        stop_compression(timeout)
+
+atexit.register(stop_logging)
+
+def setup_logging(error_prefix: str = "errors"):
+    """Настройка системы логирования
+    
+    Обработчики (консоль, файл ошибок) работают в фоновом потоке QueueListener,
+    на event loop остается только постановка записи в очередь.
+    error_prefix - имя файла ошибок ({error_prefix}_YYYYMMDD.log).
+    """
+    global log_listener, queue_handler
     
     # Создаем директорию для логов
     log_dir = Path("logs")
@@ -51,30 +154,56 @@ def setup_logging():
     
     # Корневой логгер
     root_logger = logging.getLogger()
-    root_logger.setLevel(logging.INFO)
+    root_logger.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
     
     # Очищаем существующие обработчики
+    stop_logging()
     root_logger.handlers.clear()
     
+    json_mode = LOG_FORMAT == "json"
+    
     # Консольный обработчик (только INFO и выше БЕЗ traceback)
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(logging.INFO)
-    console_formatter = RussianFormatter()
-    console_handler.setFormatter(console_formatter)
-    root_logger.addHandler(console_handler)
+    console_handler.setFormatter(JsonFormatter() if json_mode else RussianFormatter())
     
     # Файловый обработчик для ВСЕХ ошибок (ERROR и CRITICAL) С traceback
-    error_file = log_dir / f"errors_{datetime.now().strftime('%Y%m%d')}.log"
-    error_handler = logging.FileHandler(error_file, encoding='utf-8')
+    # Ротация в полночь и по размеру, старые файлы сжимаются в фоновом потоке
+    error_handler = RotatingDailyFileHandler(
+        log_dir,
+        prefix=error_prefix,
+        max_bytes=LOG_MAX_BYTES,
+        retention_days=LOG_RETENTION_DAYS,
+        max_total_bytes=LOG_MAX_TOTAL_MB * 1024 * 1024,
+        encoding='utf-8'
+    )
     error_handler.setLevel(logging.ERROR)
-    error_formatter = FileFormatter()
-    error_handler.setFormatter(error_formatter)
-    root_logger.addHandler(error_handler)
+    error_handler.setFormatter(JsonFormatter(include_traceback=True) if json_mode else FileFormatter())
     
     # Удаляем файловое логирование всех действий - оставляем только ошибки в файлах
     
+    # Очередь между event loop и фоновым потоком записи
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    queue_handler = DroppingQueueHandler(log_queue)
+    root_logger.addHandler(queue_handler)
+    
+    log_listener = logging.handlers.QueueListener(
+        log_queue, console_handler, error_handler, respect_handler_level=True
+    )
+    log_listener.start()
+    
     return root_logger
 
+def restart_logging(error_prefix: str = "errors"):
+    """Перезапуск логирования в дочернем процессе после fork
+
+    Поток QueueListener родителя в дочерний процесс не копируется, поэтому
+    останавливать его не нужно - достаточно создать обработчики заново.
+    """
+    global log_listener
+    log_listener = None
+    return setup_logging(error_prefix)
+
 def log_exception(logger, message: str, exception: Exception = None):
     """Удобная функция для логирования исключений"""
     if exception:
@@ -94,11 +223,13 @@ def log_user_action(logger, user_id: int, action: str, success: bool = True, det
     else:
         logger.warning(message)
 
-def log_command_execution(logger, user_id: int, command: str, execution_time: float = None):
+def log_command_execution(logger, user_id: int, command: str, execution_time: float = None, details: str = None):
     """Логирование выполнения команд"""
     message = f"Пользователь {user_id} выполнил команду '{command}'"
     if execution_time:
         message += f" за {execution_time:.3f}с"
+    if details:
+        message += f" - {details}"
     logger.info(message)
 
 def log_system_event(logger, event: str, details: str = None):
@@ -0,0 +1,285 @@
+import asyncio
+import functools
+import os
+import time
+from bisect import bisect_left
+
+from aiohttp import web
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Настройки HTTP эндпоинта метрик
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() == "true"
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+
+# Границы корзин гистограмм (секунды)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape_label(value) -> str:
+    """Экранирование значения метки для text exposition формата"""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames, labelvalues, extra: str = "") -> str:
+    """Форматирование набора меток {name="value",...}"""
+    pairs = [f'{name}="{_escape_label(value)}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value) -> str:
+    """Форматирование числа для вывода"""
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Монотонно растущий счетчик"""
+
+    metric_type = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self._values = {}
+
+    def inc(self, *labelvalues, amount: float = 1):
+        self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues):
+        return self._values.get(labelvalues, 0)
+
+    def samples(self):
+        for labelvalues, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}"
+
+
+class Gauge:
+    """Значение, которое может расти и уменьшаться"""
+
+    metric_type = "gauge"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self._values = {}
+        self._function = None
+
+    def set(self, value: float, *labelvalues):
+        self._values[labelvalues] = value
+
+    def inc(self, *labelvalues, amount: float = 1):
+        self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def dec(self, *labelvalues, amount: float = 1):
+        self._values[labelvalues] = self._values.get(labelvalues, 0) - amount
+
+    def set_function(self, function):
+        """Значение вычисляется в момент сбора метрик (только без меток)"""
+        self._function = function
+
+    def value(self, *labelvalues):
+        if self._function is not None:
+            return self._function()
+        return self._values.get(labelvalues, 0)
+
+    def samples(self):
+        if self._function is not None:
+            yield f"{self.name} {_format_value(self._function())}"
+            return
+        for labelvalues, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}"
+
+
+class Histogram:
+    """Гистограмма распределения значений с фиксированными корзинами"""
+
+    metric_type = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # labelvalues -> [счетчики по корзинам (+Inf последней), сумма, количество]
+        self._series = {}
+
+    def observe(self, value: float, *labelvalues):
+        series = self._series.get(labelvalues)
+        if series is None:
+            series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def snapshot(self, *labelvalues):
+        """Сумма и количество наблюдений для набора меток"""
+        series = self._series.get(labelvalues)
+        if series is None:
+            return 0.0, 0
+        return series[1], series[2]
+
+    def samples(self):
+        for labelvalues, (counts, total, count) in self._series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(float(bound))}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, labelvalues, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labelvalues)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labelvalues)} {count}"
+
+
+class MetricsRegistry:
+    """Реестр всех метрик процесса"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: tuple = ()) -> Counter:
+        return self.register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name: str, help_text: str, labelnames: tuple = ()) -> Gauge:
+        return self.register(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help_text, labelnames, buckets))
+
+    def render(self) -> str:
+        """Выгрузка всех метрик в text exposition формате Prometheus"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.metric_type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# === МЕТРИКИ БОТА ===
+commands_total = registry.counter(
+    "bot_commands_total", "Количество обработанных команд", ("command",)
+)
+callbacks_total = registry.counter(
+    "bot_callbacks_total", "Количество обработанных нажатий кнопок", ("callback",)
+)
+handler_duration = registry.histogram(
+    "bot_handler_duration_seconds", "Время обработки события", ("event", "name")
+)
+storage_duration = registry.histogram(
+    "bot_storage_duration_seconds", "Время операций хранилища", ("backend", "operation")
+)
+rate_limit_rejections_total = registry.counter(
+    "bot_rate_limit_rejections_total", "Количество запросов, отклоненных антиспамом", ("reason",)
+)
+bans_total = registry.counter(
+    "bot_bans_total", "Количество выданных антиспам-банов"
+)
+banned_users = registry.gauge(
+    "bot_banned_users", "Количество пользователей с активным баном"
+)
+log_records_dropped_total = registry.counter(
+    "bot_log_records_dropped_total", "Записи лога, отброшенные при переполнении очереди"
+)
+event_loop_lag = registry.gauge(
+    "bot_event_loop_lag_seconds", "Последнее измеренное отставание event loop"
+)
+event_loop_lag_histogram = registry.histogram(
+    "bot_event_loop_lag_distribution_seconds", "Распределение отставания event loop"
+)
+send_queue_depth = registry.gauge(
+    "bot_send_queue_depth", "Запросы к Telegram API, ожидающие лимита отправки"
+)
+send_queue_wait = registry.histogram(
+    "bot_send_queue_wait_seconds", "Ожидание в очереди отправки", ("priority",)
+)
+send_retries_total = registry.counter(
+    "bot_send_retries_total", "Повторы запросов после 429 (retry_after)", ("method",)
+)
+scheduler_wait = registry.histogram(
+    "bot_scheduler_wait_seconds", "Ожидание слота обработки апдейта", ("update_class",)
+)
+scheduler_latency = registry.histogram(
+    "bot_scheduler_latency_seconds", "Полное время апдейта с ожиданием слота", ("update_class",)
+)
+scheduler_active = registry.gauge(
+    "bot_scheduler_active", "Апдейты в обработке", ("update_class",)
+)
+scheduler_waiting = registry.gauge(
+    "bot_scheduler_waiting", "Апдейты, ожидающие слота обработки", ("update_class",)
+)
+overload_degraded = registry.gauge(
+    "bot_overload_degraded", "Упрощенный режим при перегрузке (1 - включен)"
+)
+overload_transitions_total = registry.counter(
+    "bot_overload_transitions_total", "Переключения режима защиты от перегрузки", ("mode",)
+)
+screen_edits_skipped_total = registry.counter(
+    "bot_screen_edits_skipped_total", "Пропущенные edit_text: экран не изменился"
+)
+
+
+def callback_label(data: str) -> str:
+    """Метка для callback_data: префикс до ':' с ограничением длины"""
+    if not data:
+        return "empty"
+    return data.split(":", 1)[0][:32]
+
+
+def track_storage(operation: str, backend):
+    """Декоратор замера времени операции хранилища
+
+    backend - функция, возвращающая текущий тип хранилища на момент вызова
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                storage_duration.observe(time.perf_counter() - started, backend(), operation)
+        return wrapper
+    return decorator
+
+
+async def monitor_event_loop_lag(interval: float = 1.0):
+    """Фоновая задача измерения отставания event loop"""
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - expected)
+        event_loop_lag.set(lag)
+        event_loop_lag_histogram.observe(lag)
+
+
+async def start_metrics_server(host: str = METRICS_HOST, port: int = METRICS_PORT):
+    """Запуск локального HTTP эндпоинта /metrics"""
+    async def metrics_handler(request):
+        return web.Response(
+            body=registry.render().encode("utf-8"),
+            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+        )
+
+    app = web.Application()
+    app.router.add_get("/metrics", metrics_handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    return runner
@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import os
+import time
+
+from dotenv import load_dotenv
+
+from utils.metrics import overload_degraded, overload_transitions_total
+
+load_dotenv()
+
+# Защита от перегрузки: упрощенный режим при росте отставания event loop или очереди
+OVERLOAD_ENABLED = os.getenv("OVERLOAD_ENABLED", "true").lower() == "true"
+# Вход в упрощенный режим: отставание event loop (секунды) или апдейты/запросы в очередях
+OVERLOAD_LAG_HIGH = float(os.getenv("OVERLOAD_LAG_HIGH", "0.5"))
+OVERLOAD_QUEUE_HIGH = int(os.getenv("OVERLOAD_QUEUE_HIGH", "200"))
+# Выход: оба показателя ниже нижних порогов не менее OVERLOAD_RECOVERY_SECONDS подряд
+OVERLOAD_LAG_LOW = float(os.getenv("OVERLOAD_LAG_LOW", "0.1"))
+OVERLOAD_QUEUE_LOW = int(os.getenv("OVERLOAD_QUEUE_LOW", "50"))
+OVERLOAD_RECOVERY_SECONDS = float(os.getenv("OVERLOAD_RECOVERY_SECONDS", "30"))
+OVERLOAD_CHECK_INTERVAL = float(os.getenv("OVERLOAD_CHECK_INTERVAL", "0.5"))
+
+NORMAL = "normal"
+DEGRADED = "degraded"
+
+logger = logging.getLogger(__name__)
+
+
+class OverloadGuard:
+    """Переключение между обычным и упрощенным режимом с гистерезисом
+
+    В упрощенном режиме бот не пишет активность пользователей в хранилище,
+    отдает заранее подготовленные карточки EmergencyData и отключает
+    дорогие функции (статистика, ранжирование поиска), чтобы справки
+    продолжали уходить, пока хранилище или event loop не справляются.
+    Разные пороги входа и выхода и время восстановления не дают режиму
+    переключаться на каждом всплеске.
+    """
+
+    def __init__(self, lag_high: float = OVERLOAD_LAG_HIGH, lag_low: float = OVERLOAD_LAG_LOW,
+                 queue_high: int = OVERLOAD_QUEUE_HIGH, queue_low: int = OVERLOAD_QUEUE_LOW,
+                 recovery_seconds: float = OVERLOAD_RECOVERY_SECONDS):
+        self.lag_high = lag_high
+        self.lag_low = lag_low
+        self.queue_high = queue_high
+        self.queue_low = queue_low
+        self.recovery_seconds = recovery_seconds
+        self.degraded = False
+        self.since = time.monotonic()
+        self._healthy_since = None
+        # Источники глубины очередей (функции без аргументов), подключаются в main.py
+        self.queue_sources = []
+        overload_degraded.set(0)
+
+    @property
+    def mode(self) -> str:
+        return DEGRADED if self.degraded else NORMAL
+
+    def queue_depth(self) -> int:
+        return sum(source() for source in self.queue_sources)
+
+    def update(self, lag: float, queue_depth: int, now: float = None):
+        """Пересчет режима по очередному замеру"""
+        now = time.monotonic() if now is None else now
+        if not self.degraded:
+            if lag >= self.lag_high or queue_depth >= self.queue_high:
+                self._switch(True, now, f"отставание {lag * 1000:.0f}мс, очередь {queue_depth}")
+            return
+        if lag > self.lag_low or queue_depth > self.queue_low:
+            self._healthy_since = None
+            return
+        if self._healthy_since is None:
+            self._healthy_since = now
+        elif now - self._healthy_since >= self.recovery_seconds:
+            self._switch(False, now, f"отставание {lag * 1000:.0f}мс, очередь {queue_depth}")
+
+    def _switch(self, degraded: bool, now: float, reason: str):
+        duration = now - self.since
+        self.degraded = degraded
+        self.since = now
+        self._healthy_since = None
+        overload_degraded.set(1 if degraded else 0)
+        overload_transitions_total.inc(self.mode)
+        if degraded:
+            logger.warning(f"Перегрузка: упрощенный режим ({reason}), до этого обычный {duration:.0f}с")
+        else:
+            logger.warning(f"Нагрузка снизилась: обычный режим ({reason}), упрощенный длился {duration:.0f}с")
+
+    async def run(self, interval: float = OVERLOAD_CHECK_INTERVAL):
+        """Фоновая задача замера отставания event loop и глубины очередей"""
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + interval
+            await asyncio.sleep(interval)
+            lag = max(0.0, loop.time() - expected)
+            try:
+                self.update(lag, self.queue_depth())
+            except Exception as e:
+                logger.error(f"Ошибка проверки перегрузки: {e}")
+
+
+overload_guard = OverloadGuard()
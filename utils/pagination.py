@@ -0,0 +1,63 @@
+import os
+
+from aiogram.types import InlineKeyboardButton
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Записей каталога на одной странице
+CATALOG_PAGE_SIZE = int(os.getenv("CATALOG_PAGE_SIZE", "15"))
+# Размер страницы в символах: запас до лимита Telegram в 4096 символов
+CATALOG_PAGE_CHARS = 3500
+
+# callback_data страницы: pg:<раздел>:<номер>, состояние на сервере не хранится
+PAGE_PREFIX = "pg"
+
+
+def page_cursor(section: str, page: int) -> str:
+    return f"{PAGE_PREFIX}:{section}:{page}"
+
+
+def parse_cursor(data: str):
+    """Раздел и номер страницы из callback_data (None - не курсор страницы)"""
+    parts = (data or "").split(":")
+    if len(parts) != 3 or parts[0] != PAGE_PREFIX or not parts[2].isdigit():
+        return None
+    return parts[1], int(parts[2])
+
+
+def paginate(header: str, lines, footer: str, page_size: int = CATALOG_PAGE_SIZE,
+             max_chars: int = CATALOG_PAGE_CHARS):
+    """Разбиение строк списка на страницы с общим заголовком и подвалом
+
+    Страница закрывается после page_size строк или раньше, если следующая
+    строка не помещается в max_chars.
+    """
+    budget = max_chars - len(header) - len(footer)
+    pages = []
+    current = []
+    size = 0
+    for line in lines:
+        if current and (len(current) >= page_size or size + len(line) > budget):
+            pages.append(header + "".join(current) + footer)
+            current = []
+            size = 0
+        current.append(line)
+        size += len(line)
+    if current or not pages:
+        pages.append(header + "".join(current) + footer)
+    return pages
+
+
+def page_buttons(section: str, page: int, pages: int):
+    """Ряд кнопок ◀️ N/M ▶️ (пустой, если страница одна)"""
+    if pages <= 1:
+        return []
+    row = []
+    if page > 0:
+        row.append(InlineKeyboardButton(text="◀️", callback_data=page_cursor(section, page - 1)))
+    # Номер страницы ведет на ту же страницу - экран не изменится и edit_text не отправится
+    row.append(InlineKeyboardButton(text=f"{page + 1}/{pages}", callback_data=page_cursor(section, page)))
+    if page < pages - 1:
+        row.append(InlineKeyboardButton(text="▶️", callback_data=page_cursor(section, page + 1)))
+    return row
@@ -0,0 +1,106 @@
+import math
+import re
+from array import array
+from collections import Counter, defaultdict
+
+# Основа слова: без окончания и не длиннее STEM_LENGTH символов (грубый
+# стемминг для русского - "отравление", "отравлении" и "отравления",
+# "хлор" и "хлора" дают одну основу)
+STEM_LENGTH = 6
+_ENDINGS = (
+    "ами", "ями", "ого", "его", "ому", "ему", "ыми", "ими",
+    "ой", "ей", "ий", "ый", "ая", "яя", "ое", "ее", "ов", "ев", "ам", "ям", "ах", "ях", "ом", "ем", "ую", "юю",
+    "а", "я", "о", "е", "ы", "и", "у", "ю", "ь", "й"
+)
+# Ниже этого сходства результат не показывается
+MIN_SCORE = 0.05
+
+_WORD = re.compile(r"[а-яa-z0-9]+")
+STOP_WORDS = frozenset(
+    "и в во на с со по для при от до из к ко у о об а но или не ни что как это же ли бы "
+    "то так его ее их он она они мы вы я мне есть был была были без под над за через".split()
+)
+
+
+def stem(word: str) -> str:
+    for ending in _ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= 3:
+            word = word[:-len(ending)]
+            break
+    return word[:STEM_LENGTH]
+
+
+def tokenize(text: str) -> list:
+    """Основы слов текста без стоп-слов"""
+    words = _WORD.findall(text.lower().replace("ё", "е"))
+    return [stem(word) for word in words if word not in STOP_WORDS and len(word) > 1]
+
+
+class TfidfIndex:
+    """Поиск по справочным карточкам: TF-IDF и косинусное сходство
+
+    Векторы документов считаются один раз при запуске и нормируются;
+    хранится обратный индекс: основа -> номера документов и веса (array).
+    Запрос умножается только на списки своих основ, поэтому ответ
+    занимает доли миллисекунды и не требует сети.
+    """
+
+    def __init__(self):
+        self.documents = []
+        self.idf = {}
+        self.postings = {}
+
+    def __len__(self):
+        return len(self.documents)
+
+    def build(self, documents):
+        """Индексация документов: dict с полями kind, title, text (остальные хранятся как есть)
+
+        Заголовок учитывается дважды - совпадение в названии важнее описания.
+        """
+        self.documents = list(documents)
+        counts = [
+            Counter(tokenize(document["title"]) * 2 + tokenize(document["text"]))
+            for document in self.documents
+        ]
+        frequency = Counter(term for terms in counts for term in terms)
+        total = len(self.documents)
+        self.idf = {term: math.log((1 + total) / (1 + df)) + 1 for term, df in frequency.items()}
+        postings = defaultdict(lambda: (array("i"), array("d")))
+        for number, terms in enumerate(counts):
+            weights = {term: (1 + math.log(count)) * self.idf[term] for term, count in terms.items()}
+            norm = math.sqrt(sum(weight * weight for weight in weights.values())) or 1.0
+            for term, weight in weights.items():
+                ids, values = postings[term]
+                ids.append(number)
+                values.append(weight / norm)
+        self.postings = dict(postings)
+        return self
+
+    def search(self, query: str, kinds=None, limit: int = 5) -> list:
+        """Лучшие документы для запроса: список (документ, сходство от 0 до 1)"""
+        terms = Counter(term for term in tokenize(query) if term in self.idf)
+        if not terms:
+            return []
+        weights = {term: (1 + math.log(count)) * self.idf[term] for term, count in terms.items()}
+        norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+        scores = defaultdict(float)
+        for term, weight in weights.items():
+            ids, values = self.postings[term]
+            weight /= norm
+            for number, value in zip(ids, values):
+                scores[number] += weight * value
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        result = []
+        for number, score in ranked:
+            if score < MIN_SCORE:
+                break
+            document = self.documents[number]
+            if kinds is None or document["kind"] in kinds:
+                result.append((document, score))
+                if len(result) >= limit:
+                    break
+        return result
+
+
+knowledge_index = TfidfIndex()
@@ -0,0 +1,116 @@
+from aiogram.types import MessageEntity
+
+# Разметка в стиле parse_mode="Markdown": **жирный** или *жирный*, _курсив_,
+# `код`, ```блок```, [текст](ссылка); \ экранирует следующий символ разметки
+_ESCAPABLE = "_*`["
+
+
+def utf16_len(text: str) -> int:
+    """Длина строки в единицах UTF-16 (в них Telegram считает смещения сущностей)"""
+    return len(text.encode("utf-16-le")) // 2
+
+
+class RichText:
+    """Текст с готовыми сущностями: отправляется без parse_mode
+
+    Telegram не разбирает разметку при каждой отправке, а ошибка в
+    разметке обнаруживается при загрузке модуля, а не при ответе.
+    """
+
+    __slots__ = ("text", "entities")
+
+    def __init__(self, text: str, entities):
+        self.text = text
+        self.entities = entities
+
+    def as_kwargs(self) -> dict:
+        """Аргументы для answer/edit_text: text, entities, parse_mode=None"""
+        return {"text": self.text, "entities": self.entities or None, "parse_mode": None}
+
+    def __repr__(self):
+        return f"RichText({self.text[:40]!r}..., {len(self.entities)} entities)"
+
+
+def code_span(text: str) -> str:
+    """Произвольный текст пользователя как `код` для parse_mode="Markdown"
+
+    Внутри кода символы _*[ не разбираются; обратная кавычка закрыла бы
+    его раньше времени и заменяется апострофом.
+    """
+    return "`" + (str(text).replace("`", "'") or " ") + "`"
+
+
+def _line_of(source: str, position: int) -> int:
+    return source.count("\n", 0, position) + 1
+
+
+def compile_markdown(source: str) -> RichText:
+    """Разбор разметки в текст и список MessageEntity
+
+    Пробелы в начале и конце текста отбрасываются (как делает Telegram).
+    Незакрытая разметка - ValueError с номером строки.
+    """
+    source = source.strip()
+    parts = []
+    entities = []
+    offset = 0
+    position = 0
+    length = len(source)
+
+    def emit(text: str):
+        nonlocal offset
+        parts.append(text)
+        offset += utf16_len(text)
+
+    def add_entity(entity_type: str, text: str, **extra):
+        if text:
+            entities.append(MessageEntity(type=entity_type, offset=offset, length=utf16_len(text), **extra))
+        emit(text)
+
+    while position < length:
+        char = source[position]
+        if char == "\\" and position + 1 < length and source[position + 1] in _ESCAPABLE:
+            emit(source[position + 1])
+            position += 2
+        elif source.startswith("```", position):
+            end = source.find("```", position + 3)
+            if end < 0:
+                raise ValueError(f"незакрытый блок ``` (строка {_line_of(source, position)})")
+            add_entity("pre", source[position + 3:end].strip("\n"))
+            position = end + 3
+        elif char == "`":
+            end = source.find("`", position + 1)
+            if end < 0:
+                raise ValueError(f"незакрытый ` (строка {_line_of(source, position)})")
+            add_entity("code", source[position + 1:end])
+            position = end + 1
+        elif char in "*_":
+            marker = "**" if source.startswith("**", position) else char
+            end = source.find(marker, position + len(marker))
+            if end < 0:
+                raise ValueError(f"незакрытый {marker} (строка {_line_of(source, position)})")
+            inner = source[position + len(marker):end]
+            if "\n\n" in inner:
+                raise ValueError(f"{marker} захватывает несколько абзацев (строка {_line_of(source, position)})")
+            add_entity("bold" if char == "*" else "italic", inner)
+            position = end + len(marker)
+        elif char == "[":
+            close = source.find("]", position + 1)
+            if close < 0 or not source.startswith("(", close + 1):
+                # Квадратные скобки без адреса - обычный текст ("[Дата]" в шаблонах)
+                emit(char)
+                position += 1
+                continue
+            end = source.find(")", close + 2)
+            if end < 0:
+                raise ValueError(f"незакрытый адрес ссылки (строка {_line_of(source, position)})")
+            add_entity("text_link", source[position + 1:close], url=source[close + 2:end])
+            position = end + 1
+        else:
+            # Обычный текст до следующего символа разметки
+            end = position + 1
+            while end < length and source[end] not in "\\`*_[":
+                end += 1
+            emit(source[position:end])
+            position = end
+    return RichText("".join(parts), entities)
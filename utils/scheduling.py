@@ -0,0 +1,157 @@
+import asyncio
+import os
+import time
+from collections import deque
+
+from dotenv import load_dotenv
+
+from utils.metrics import scheduler_active, scheduler_latency, scheduler_wait, scheduler_waiting
+from utils.send_queue import PRIORITY_BULK, PRIORITY_EMERGENCY, PRIORITY_NORMAL, send_priority
+from utils.tracing import span
+
+load_dotenv()
+
+# Классы апдейтов в порядке приоритета
+EMERGENCY = "emergency"
+NAVIGATION = "navigation"
+ADMIN = "admin"
+CLASS_ORDER = (EMERGENCY, NAVIGATION, ADMIN)
+
+# Одновременно обрабатываемые апдейты: всего и по классам
+SCHEDULER_MAX_CONCURRENCY = int(os.getenv("SCHEDULER_MAX_CONCURRENCY", "32"))
+SCHEDULER_LIMITS = {
+    EMERGENCY: int(os.getenv("SCHEDULER_EMERGENCY_CONCURRENCY", "32")),
+    NAVIGATION: int(os.getenv("SCHEDULER_NAVIGATION_CONCURRENCY", "16")),
+    ADMIN: int(os.getenv("SCHEDULER_ADMIN_CONCURRENCY", "2")),
+}
+
+# Медицинские и токсикологические справки, экстренные инструкции
+EMERGENCY_COMMANDS = {"dose", "poison", "fire", "hazmat", "nearest", "ai_symptoms", "ai_checklist"}
+EMERGENCY_CALLBACKS = {
+    "med_resus", "med_algo", "med_dose", "med_poison", "fire_evac", "fire_extinguish",
+    "rescue_survival", "contacts", "nr"
+}
+# Статистика и администрирование (/admin - это справка по КоАП, не админ-панель)
+ADMIN_COMMANDS = {"export", "broadcast"}
+ADMIN_CALLBACK_PREFIX = "admin_"
+
+# Приоритет исходящих ответов для каждого класса
+SEND_PRIORITIES = {EMERGENCY: PRIORITY_EMERGENCY, NAVIGATION: PRIORITY_NORMAL, ADMIN: PRIORITY_BULK}
+
+
+def classify_update(update) -> str:
+    """Класс апдейта по команде или callback_data"""
+    if update.callback_query:
+        data = (update.callback_query.data or "").split(":", 1)[0]
+        if data in EMERGENCY_CALLBACKS:
+            return EMERGENCY
+        if data.startswith(ADMIN_CALLBACK_PREFIX):
+            return ADMIN
+        return NAVIGATION
+    message = update.message
+    if message and message.location:
+        # Местоположение присылают для поиска ближайших служб
+        return EMERGENCY
+    if message and message.text and message.text.startswith("/"):
+        parts = message.text[1:].split(maxsplit=1)
+        command = parts[0].split("@", 1)[0].lower() if parts else ""
+        if command in EMERGENCY_COMMANDS:
+            return EMERGENCY
+        if command in ADMIN_COMMANDS:
+            return ADMIN
+    return NAVIGATION
+
+
+class PriorityScheduler:
+    """Ограничение одновременной обработки апдейтов с приоритетом классов
+
+    Освободившийся слот получает ожидающий апдейт самого важного класса,
+    поэтому при перегрузке ждут в первую очередь админские операции,
+    а справки по дозировкам и ядам обрабатываются без очереди за ними.
+    Подключается как outer middleware апдейтов.
+    """
+
+    def __init__(self, limits: dict = None, max_concurrency: int = SCHEDULER_MAX_CONCURRENCY):
+        self.limits = dict(limits or SCHEDULER_LIMITS)
+        self.max_concurrency = max_concurrency
+        self.active = {update_class: 0 for update_class in CLASS_ORDER}
+        self.total_active = 0
+        self.waiters = {update_class: deque() for update_class in CLASS_ORDER}
+
+    @property
+    def depth(self) -> int:
+        """Количество апдейтов, ожидающих слота"""
+        return sum(len(queue) for queue in self.waiters.values())
+
+    def _can_run(self, update_class: str) -> bool:
+        return self.total_active < self.max_concurrency and self.active[update_class] < self.limits[update_class]
+
+    def _grant(self, update_class: str):
+        self.active[update_class] += 1
+        self.total_active += 1
+        scheduler_active.set(self.active[update_class], update_class)
+
+    def _wake(self):
+        for update_class in CLASS_ORDER:
+            queue = self.waiters[update_class]
+            while queue and self._can_run(update_class):
+                future = queue.popleft()
+                if future.done():
+                    continue
+                self._grant(update_class)
+                future.set_result(None)
+            scheduler_waiting.set(len(queue), update_class)
+
+    def _has_priority_waiters(self, update_class: str) -> bool:
+        for other in CLASS_ORDER:
+            if self.waiters[other]:
+                return True
+            if other == update_class:
+                return False
+        return False
+
+    async def acquire(self, update_class: str):
+        if self._can_run(update_class) and not self._has_priority_waiters(update_class):
+            self._grant(update_class)
+            return
+        future = asyncio.get_running_loop().create_future()
+        self.waiters[update_class].append(future)
+        self._wake()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Слот уже выдан, но апдейт отменен - возвращаем слот
+                self.release(update_class)
+            else:
+                try:
+                    self.waiters[update_class].remove(future)
+                except ValueError:
+                    pass
+                self._wake()
+            raise
+
+    def release(self, update_class: str):
+        self.active[update_class] -= 1
+        self.total_active -= 1
+        scheduler_active.set(self.active[update_class], update_class)
+        self._wake()
+
+    async def __call__(self, handler, event, data):
+        update_class = classify_update(event)
+        token = send_priority.set(SEND_PRIORITIES[update_class])
+        started = time.perf_counter()
+        try:
+            with span("scheduler", update_class):
+                await self.acquire(update_class)
+            scheduler_wait.observe(time.perf_counter() - started, update_class)
+            try:
+                return await handler(event, data)
+            finally:
+                self.release(update_class)
+                scheduler_latency.observe(time.perf_counter() - started, update_class)
+        finally:
+            send_priority.reset(token)
+
+
+scheduler = PriorityScheduler()
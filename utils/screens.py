@@ -0,0 +1,92 @@
+import os
+from collections import OrderedDict
+
+from aiogram.exceptions import TelegramBadRequest
+from dotenv import load_dotenv
+
+from utils.metrics import screen_edits_skipped_total
+
+load_dotenv()
+
+# Сообщений, для которых запоминается показанный экран
+SCREEN_CACHE_SIZE = int(os.getenv("SCREEN_CACHE_SIZE", "10000"))
+
+# Формулировка ошибки Telegram при редактировании без изменений
+NOT_MODIFIED = "message is not modified"
+
+
+def _dump(value):
+    """Значение параметра edit_text в хешируемом виде (модели aiogram - в JSON)"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_dump(item) for item in value)
+    if hasattr(value, "model_dump_json"):
+        return value.model_dump_json(exclude_none=True)
+    return value
+
+
+def screen_hash(text: str, reply_markup=None, **options) -> int:
+    """Хеш содержимого экрана: текст, клавиатура и остальные параметры edit_text
+
+    Сущности и parse_mode входят в хеш: тот же текст с другой разметкой -
+    другой экран. Не переданный parse_mode (режим бота по умолчанию) и
+    parse_mode=None (текст с готовыми сущностями) различаются.
+    """
+    return hash((text, _dump(reply_markup), tuple(sorted((name, _dump(value)) for name, value in options.items()))))
+
+
+class ScreenCache:
+    """Последний показанный экран каждого сообщения (LRU по chat_id и message_id)
+
+    Повторное нажатие той же кнопки перерисовывает экран тем же текстом
+    и клавиатурой - такой edit_text не отправляется, Telegram все равно
+    ответил бы "message is not modified".
+    """
+
+    def __init__(self, size: int = SCREEN_CACHE_SIZE):
+        self.size = size
+        self._screens = OrderedDict()
+
+    def is_shown(self, key, content: int) -> bool:
+        if self._screens.get(key) != content:
+            return False
+        self._screens.move_to_end(key)
+        return True
+
+    def remember(self, key, content: int):
+        self._screens[key] = content
+        self._screens.move_to_end(key)
+        if len(self._screens) > self.size:
+            self._screens.popitem(last=False)
+
+    def forget(self, key):
+        self._screens.pop(key, None)
+
+    def clear(self):
+        self._screens.clear()
+
+
+screen_cache = ScreenCache()
+
+
+async def edit_screen(message, text: str, reply_markup=None, **kwargs) -> bool:
+    """edit_text без запроса к Telegram, если экран не изменился
+
+    Возвращает True, если сообщение отредактировано.
+    """
+    key = (message.chat.id, message.message_id)
+    content = screen_hash(text, reply_markup, **kwargs)
+    if screen_cache.is_shown(key, content):
+        screen_edits_skipped_total.inc()
+        return False
+    try:
+        await message.edit_text(text, reply_markup=reply_markup, **kwargs)
+    except TelegramBadRequest as e:
+        if NOT_MODIFIED not in e.message:
+            screen_cache.forget(key)
+            raise
+        # Экран уже такой (например, отредактирован до перезапуска бота)
+        screen_cache.remember(key, content)
+        screen_edits_skipped_total.inc()
+        return False
+    screen_cache.remember(key, content)
+    return True
@@ -0,0 +1,194 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import time
+from contextvars import ContextVar
+
+from aiogram.exceptions import TelegramRetryAfter
+from dotenv import load_dotenv
+
+from utils.metrics import send_queue_depth, send_queue_wait, send_retries_total
+from utils.tracing import span
+
+load_dotenv()
+
+# Лимиты Telegram: ~30 сообщений/с на бота, ~1/с в личный чат, 20/мин в группу
+SEND_QUEUE_ENABLED = os.getenv("SEND_QUEUE_ENABLED", "true").lower() == "true"
+SEND_GLOBAL_RATE = float(os.getenv("SEND_GLOBAL_RATE", "30"))
+SEND_CHAT_RATE = float(os.getenv("SEND_CHAT_RATE", "1"))
+SEND_CHAT_BURST = float(os.getenv("SEND_CHAT_BURST", "3"))
+SEND_GROUP_RATE_PER_MINUTE = float(os.getenv("SEND_GROUP_RATE_PER_MINUTE", "20"))
+# Повторы после 429: количество и максимальный retry_after, который стоит ждать
+SEND_MAX_RETRIES = int(os.getenv("SEND_MAX_RETRIES", "3"))
+SEND_MAX_RETRY_AFTER = float(os.getenv("SEND_MAX_RETRY_AFTER", "60"))
+
+# Приоритеты отправки (меньше - раньше)
+PRIORITY_EMERGENCY = 0
+PRIORITY_NORMAL = 1
+PRIORITY_BULK = 2
+PRIORITY_NAMES = {PRIORITY_EMERGENCY: "emergency", PRIORITY_NORMAL: "normal", PRIORITY_BULK: "bulk"}
+
+# Приоритет ответов в рамках текущего апдейта (выставляет планировщик, utils/scheduling.py)
+send_priority = ContextVar("send_priority", default=PRIORITY_NORMAL)
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Ведро токенов с резервированием: отправка ждет, пока долг не погасится
+
+    reserve() сразу списывает токен и возвращает время ожидания, поэтому
+    ожидающие обслуживаются строго по порядку обращения.
+    """
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def pause(self, seconds: float):
+        """Запрет отправки на seconds секунд (ответ 429 с retry_after)"""
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens = min(self.tokens, -seconds * self.rate)
+
+    def idle(self) -> bool:
+        self._refill(time.monotonic())
+        return self.tokens >= self.capacity
+
+
+class SendQueue:
+    """Планировщик исходящих запросов к Telegram API
+
+    Подключается как middleware сессии бота. Запросы с chat_id (отправка и
+    редактирование сообщений) сначала ждут токен своего чата, затем -
+    глобальный токен; глобальные токены выдаются по приоритету, так что
+    ответы на экстренные команды обгоняют массовые рассылки.
+    """
+
+    # Ведра чатов, которые давно не использовались, удаляются при росте словаря
+    MAX_CHAT_BUCKETS = 10_000
+
+    def __init__(self, global_rate: float = SEND_GLOBAL_RATE, chat_rate: float = SEND_CHAT_RATE,
+                 chat_burst: float = SEND_CHAT_BURST, group_rate_per_minute: float = SEND_GROUP_RATE_PER_MINUTE,
+                 max_retries: int = SEND_MAX_RETRIES, max_retry_after: float = SEND_MAX_RETRY_AFTER):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate_per_minute / 60
+        self.max_retries = max_retries
+        self.max_retry_after = max_retry_after
+        self._chats = {}
+        self._heap = []
+        self._sequence = itertools.count()
+        self._waiting = 0
+        self._wakeup = None
+        self._pump_task = None
+        self._loop = None
+        send_queue_depth.set_function(lambda: self._waiting)
+
+    def set_global_rate(self, rate: float):
+        """Изменение общего лимита (доля лимита бота у процесса-обработчика)"""
+        self.global_bucket = TokenBucket(rate, max(1.0, rate))
+
+    @property
+    def depth(self) -> int:
+        """Количество запросов, ожидающих отправки"""
+        return self._waiting
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= self.MAX_CHAT_BUCKETS:
+                self._chats = {key: value for key, value in self._chats.items() if not value.idle()}
+            is_group = isinstance(chat_id, str) or chat_id < 0
+            rate = self.group_rate if is_group else self.chat_rate
+            bucket = self._chats[chat_id] = TokenBucket(rate, self.chat_burst if not is_group else 1)
+        return bucket
+
+    async def _pump(self):
+        """Выдача глобальных токенов ожидающим в порядке приоритета"""
+        while True:
+            while self._heap:
+                delay = self.global_bucket.reserve()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                _, _, future = heapq.heappop(self._heap)
+                if not future.done():
+                    future.set_result(None)
+            self._wakeup.clear()
+            await self._wakeup.wait()
+
+    async def _acquire_global(self, priority: int):
+        loop = asyncio.get_running_loop()
+        if self._pump_task is None or self._pump_task.done() or self._loop is not loop:
+            self._loop = loop
+            self._heap = []
+            self._wakeup = asyncio.Event()
+            self._pump_task = loop.create_task(self._pump())
+        future = loop.create_future()
+        heapq.heappush(self._heap, (priority, next(self._sequence), future))
+        self._wakeup.set()
+        await future
+
+    async def acquire(self, chat_id, priority: int = PRIORITY_NORMAL):
+        """Дождаться разрешения на отправку в чат"""
+        started = time.monotonic()
+        self._waiting += 1
+        try:
+            if chat_id is not None:
+                delay = self._chat_bucket(chat_id).reserve()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            await self._acquire_global(priority)
+        finally:
+            self._waiting -= 1
+            send_queue_wait.observe(time.monotonic() - started, PRIORITY_NAMES.get(priority, str(priority)))
+
+    async def __call__(self, make_request, bot, method):
+        """Middleware сессии: лимиты отправки и повтор после 429"""
+        limited = "chat_id" in type(method).model_fields
+        chat_id = getattr(method, "chat_id", None) if limited else None
+        priority = send_priority.get()
+        attempt = 0
+        while True:
+            if limited:
+                with span("send_queue", method.__api_method__):
+                    await self.acquire(chat_id, priority)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                attempt += 1
+                if attempt > self.max_retries or e.retry_after > self.max_retry_after:
+                    raise
+                send_retries_total.inc(method.__api_method__)
+                logger.warning(
+                    f"429 от Telegram для {method.__api_method__} (чат {chat_id}), "
+                    f"повтор через {e.retry_after}с ({attempt}/{self.max_retries})"
+                )
+                # 429 означает превышение лимита бота: паузу выдерживают все
+                # отправки, а не только повтор этого запроса
+                self.global_bucket.pause(e.retry_after)
+                if not limited:
+                    await asyncio.sleep(e.retry_after)
+                elif chat_id is not None:
+                    # Ожидание перенесено в ведро чата, чтобы не обгоняли и следующие ответы
+                    self._chat_bucket(chat_id).pause(e.retry_after)
+
+
+send_queue = SendQueue()
@@ -0,0 +1,34 @@
+import os
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Каталог изменяемого состояния: ряды активности, контрольная точка рассылки,
+# снимок базы опасных веществ. В службе systemd он, как и logs/, открыт на запись
+# (ReadWritePaths), остальное дерево проекта - только для чтения
+STATE_DIR = os.getenv("STATE_DIR", str(Path(__file__).resolve().parent.parent / "data" / "state"))
+
+
+def state_path(name: str) -> str:
+    """Путь к файлу в каталоге состояния"""
+    return os.path.join(STATE_DIR, name)
+
+
+def worker_path(path: str, worker) -> str:
+    """Файл процесса-обработчика рядом с общим: activity.bin -> activity_w2.bin ("*" - шаблон для glob)"""
+    stem, extension = os.path.splitext(path)
+    return f"{stem}_w{worker}{extension}"
+
+
+def write_atomic(path: str, data, mode: str = "wb"):
+    """Запись через временный файл и os.replace; каталог создается при необходимости"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = path + ".tmp"
+    encoding = None if "b" in mode else "utf-8"
+    with open(temp_path, mode, encoding=encoding) as f:
+        f.write(data)
+    os.replace(temp_path, path)
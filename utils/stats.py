@@ -0,0 +1,98 @@
+import asyncio
+import logging
+import os
+import time
+
+from dotenv import load_dotenv
+
+from database.models import User
+from utils.overload import overload_guard
+
+load_dotenv()
+
+# Период фонового пересчета статистики (секунды)
+STATS_REFRESH_INTERVAL = float(os.getenv("STATS_REFRESH_INTERVAL", "60"))
+# Старше этого возраста результат не показывается, а пересчитывается с ожиданием
+STATS_MAX_AGE = float(os.getenv("STATS_MAX_AGE", "900"))
+# Фоновый пересчет идет, только если статистику смотрели за этот период
+STATS_IDLE_TIMEOUT = float(os.getenv("STATS_IDLE_TIMEOUT", "900"))
+
+logger = logging.getLogger(__name__)
+
+
+class StatsService:
+    """Кэш статистики пользователей для админ-панели
+
+    Админ-панель получает последний результат сразу, вместе с его
+    возрастом. Пересчет идет в фоне по расписанию, пока панель
+    используется; одновременные запросы пересчета объединяются в одно
+    вычисление (single-flight), поэтому несколько админов, нажавших
+    "Обновить", не запускают параллельные проходы по хранилищу.
+    """
+
+    def __init__(self, compute, refresh_interval: float = STATS_REFRESH_INTERVAL,
+                 max_age: float = STATS_MAX_AGE, idle_timeout: float = STATS_IDLE_TIMEOUT):
+        self.compute = compute
+        self.refresh_interval = refresh_interval
+        self.max_age = max_age
+        self.idle_timeout = idle_timeout
+        self.clear()
+
+    def clear(self):
+        """Сброс кэша: следующий запрос дождется пересчета"""
+        self.stats = None
+        self.updated = None
+        self.last_request = None
+        self._inflight = None
+
+    def age(self) -> float:
+        """Возраст последнего результата в секундах (None - еще не считалась)"""
+        return None if self.updated is None else time.monotonic() - self.updated
+
+    async def _refresh(self):
+        try:
+            stats = await self.compute()
+        except Exception as e:
+            logger.error(f"Ошибка пересчета статистики: {e}")
+            return self.stats
+        # Ошибку хранилища не записываем поверх последнего удачного результата
+        if stats.get("error") and self.stats is not None:
+            return self.stats
+        self.stats = stats
+        self.updated = time.monotonic()
+        return stats
+
+    def refresh(self) -> asyncio.Future:
+        """Запуск пересчета или присоединение к уже идущему"""
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.ensure_future(self._refresh())
+        return self._inflight
+
+    async def get(self):
+        """Статистика и ее возраст в секундах
+
+        Устаревший результат обновляется в фоне и показывается как есть;
+        ожидание пересчета только при первом запросе или после простоя.
+        """
+        self.last_request = time.monotonic()
+        age = self.age()
+        if age is None or age > self.max_age:
+            # shield: отмена одного запроса не прерывает общий пересчет
+            await asyncio.shield(self.refresh())
+        elif age > self.refresh_interval:
+            self.refresh()
+        return self.stats, self.age()
+
+    async def run(self):
+        """Фоновая задача периодического пересчета"""
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            if self.last_request is None or time.monotonic() - self.last_request > self.idle_timeout:
+                continue
+            # При перегрузке статистика отключена, хранилище не нагружаем
+            if overload_guard.degraded:
+                continue
+            await self.refresh()
+
+
+user_stats = StatsService(User.get_user_stats)
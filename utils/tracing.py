@@ -0,0 +1,141 @@
+import contextvars
+import functools
+import inspect
+import logging
+import os
+import time
+
+from dotenv import load_dotenv
+
+from utils.logger import log_command_execution
+
+load_dotenv()
+
+# Порог медленного апдейта (мс), при превышении пишется строка с разбивкой по спанам
+SLOW_UPDATE_THRESHOLD_MS = float(os.getenv("SLOW_UPDATE_THRESHOLD_MS", "1000"))
+
+logger = logging.getLogger(__name__)
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+
+
+class Trace:
+    """Контекст трассировки одного апдейта"""
+
+    __slots__ = ("trace_id", "event", "user_id", "name", "started", "spans")
+
+    def __init__(self, event: str, user_id: int = None, name: str = None):
+        self.trace_id = os.urandom(8).hex()
+        self.event = event
+        self.user_id = user_id
+        self.name = name
+        self.started = time.perf_counter()
+        # (тип, имя, длительность в секундах)
+        self.spans = []
+
+    def breakdown(self) -> str:
+        """Сводка спанов: время и количество вызовов по каждому виду"""
+        totals = {}
+        for kind, name, duration in self.spans:
+            key = f"{kind}.{name}"
+            total, count = totals.get(key, (0.0, 0))
+            totals[key] = (total + duration, count + 1)
+        ordered = sorted(totals.items(), key=lambda item: item[1][0], reverse=True)
+        return ", ".join(f"{key}={total * 1000:.1f}мс×{count}" for key, (total, count) in ordered)
+
+
+class _Span:
+    """Замер одного участка внутри трассировки"""
+
+    __slots__ = ("trace", "kind", "name", "started")
+
+    def __init__(self, trace: Trace, kind: str, name: str):
+        self.trace = trace
+        self.kind = kind
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.trace.spans.append((self.kind, self.name, time.perf_counter() - self.started))
+        return False
+
+
+class _NoopSpan:
+    """Заглушка, когда апдейт не трассируется"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def current_trace():
+    """Текущая трассировка или None"""
+    return _current_trace.get()
+
+
+def span(kind: str, name: str):
+    """Контекстный менеджер спана (no-op вне трассировки)"""
+    trace = _current_trace.get()
+    if trace is None:
+        return _NOOP_SPAN
+    return _Span(trace, kind, name)
+
+
+def traced(kind: str, name: str = None):
+    """Декоратор: оборачивает вызов функции в спан"""
+    def decorator(func):
+        span_name = name or func.__name__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                trace = _current_trace.get()
+                if trace is None:
+                    return await func(*args, **kwargs)
+                with _Span(trace, kind, span_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            trace = _current_trace.get()
+            if trace is None:
+                return func(*args, **kwargs)
+            with _Span(trace, kind, span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def start_trace(event: str, user_id: int = None, name: str = None):
+    """Начало трассировки апдейта, возвращает токен для finish_trace"""
+    return _current_trace.set(Trace(event, user_id, name))
+
+
+def finish_trace(token, threshold_ms: float = None):
+    """Завершение трассировки и запись медленного апдейта в лог"""
+    trace = _current_trace.get()
+    _current_trace.reset(token)
+    if trace is None:
+        return None
+    elapsed = time.perf_counter() - trace.started
+    threshold = SLOW_UPDATE_THRESHOLD_MS if threshold_ms is None else threshold_ms
+    if elapsed * 1000 >= threshold:
+        log_command_execution(
+            logger,
+            trace.user_id,
+            trace.name or trace.event,
+            execution_time=elapsed,
+            details=f"МЕДЛЕННЫЙ АПДЕЙТ trace={trace.trace_id} event={trace.event} spans: {trace.breakdown() or 'нет'}"
+        )
+    return elapsed
@@ -0,0 +1,84 @@
+import asyncio
+import logging
+import os
+import secrets
+
+from aiohttp import web
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Режим получения апдейтов: polling (по умолчанию) или webhook
+BOT_MODE = os.getenv("BOT_MODE", "polling").lower()
+# Публичный адрес вебхука; пусто - set_webhook не вызывается (локальная проверка POST-запросами)
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+# Заголовок X-Telegram-Bot-Api-Secret-Token; без него при заданном WEBHOOK_URL генерируется случайный,
+# без WEBHOOK_URL (вебхук регистрируется вне бота) он обязателен
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+
+logger = logging.getLogger(__name__)
+
+
+def webhook_secret(url: str = WEBHOOK_URL, secret: str = WEBHOOK_SECRET) -> str:
+    """Секрет вебхука: заданный или случайный, если адрес в Telegram регистрирует сам бот
+
+    Вебхук без секрета не запускается: любой, кто достучится до порта,
+    мог бы прислать апдейт от имени администратора. Без WEBHOOK_URL
+    случайный секрет Telegram не узнает, поэтому нужен WEBHOOK_SECRET (ValueError).
+    """
+    if secret:
+        return secret
+    if url:
+        return secrets.token_urlsafe(32)
+    raise ValueError(
+        "BOT_MODE=webhook без WEBHOOK_URL требует WEBHOOK_SECRET - тот же секрет "
+        "укажите в secret_token при регистрации вебхука"
+    )
+
+
+def create_webhook_app(dp, bot, secret_token: str, path: str = WEBHOOK_PATH) -> web.Application:
+    """aiohttp приложение: POST {path} принимает апдейты, GET /healthz - проверка живости
+
+    Ответ 200 отдается сразу, апдейт обрабатывается отдельной задачей
+    (handle_in_background), поэтому Telegram не ждет ответа хэндлеров.
+    """
+    async def health_handler(request):
+        return web.Response(text="ok")
+
+    app = web.Application()
+    handler = SimpleRequestHandler(dispatcher=dp, bot=bot, handle_in_background=True, secret_token=secret_token)
+    handler.register(app, path=path)
+    app.router.add_get("/healthz", health_handler)
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+async def run_webhook(dp, bot, host: str = WEBHOOK_HOST, port: int = WEBHOOK_PORT,
+                      url: str = WEBHOOK_URL, path: str = WEBHOOK_PATH, secret_token: str = WEBHOOK_SECRET):
+    """Запуск встроенного сервера вебхука и регистрация адреса в Telegram"""
+    secret_token = webhook_secret(url, secret_token)
+
+    app = create_webhook_app(dp, bot, secret_token, path)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    logger.info(f"Вебхук слушает http://{host}:{port}{path}")
+
+    try:
+        if url:
+            await bot.set_webhook(
+                url=url.rstrip("/") + path,
+                secret_token=secret_token,
+                allowed_updates=dp.resolve_used_update_types()
+            )
+            logger.info(f"Вебхук зарегистрирован: {url.rstrip('/')}{path}")
+        else:
+            logger.warning("WEBHOOK_URL не задан - вебхук в Telegram не регистрируется")
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
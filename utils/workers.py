@@ -0,0 +1,390 @@
+import asyncio
+import functools
+import hmac
+import json
+import logging
+import multiprocessing
+import os
+import select
+import signal
+import socket
+import struct
+
+from aiohttp import web
+from aiogram.methods import GetUpdates
+from aiogram.types import Update
+from dotenv import load_dotenv
+
+from utils.webhook import WEBHOOK_HOST, WEBHOOK_PATH, WEBHOOK_PORT, WEBHOOK_SECRET, WEBHOOK_URL, webhook_secret
+
+load_dotenv()
+
+# Количество процессов-обработчиков; 1 - обычный режим в одном процессе
+WORKERS = int(os.getenv("WORKERS", "1"))
+# Сколько байт апдейтов может ждать отправки одному обработчику; сверх - апдейт отбрасывается
+WORKER_BUFFER_LIMIT = int(os.getenv("WORKER_BUFFER_LIMIT", str(8 * 1024 * 1024)))
+# Интервал сбора завершившихся обработчиков и пауза перед перезапуском (секунды)
+WORKER_CHECK_INTERVAL = 1.0
+POLLING_TIMEOUT = 30
+
+# Кадр канала: длина апдейта; в управляющем канале - номер обработчика или pid
+_FRAME = struct.Struct("!I")
+
+logger = logging.getLogger(__name__)
+
+
+def extract_user_id(update: dict) -> int:
+    """user_id отправителя апдейта (или id чата) из сырого JSON"""
+    for payload in update.values():
+        if isinstance(payload, dict):
+            user = payload.get("from") or payload.get("user")
+            if user:
+                return user["id"]
+            chat = payload.get("chat")
+            if chat:
+                return chat["id"]
+    return 0
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    """Ровно size байт из блокирующего сокета (короче - собеседник закрыл канал)"""
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+class WorkerPool:
+    """Процессы-обработчики с маршрутизацией апдейтов по user_id
+
+    Все апдейты одного пользователя попадают в один процесс, поэтому
+    антиспам, баны и кэши остаются локальными и не требуют блокировок
+    между процессами. Пользователи из pinned_users (администраторы)
+    закреплены за обработчиком 0: рассылка и ее контрольная точка
+    существуют в одном процессе, и любой админ видит и может остановить
+    рассылку, запущенную другим. Обработчики, в том числе перезапущенные, создает
+    процесс-заготовка, ответвленный до запуска event loop супервизора.
+    На время fork потоки записи логов и сжатия архивов останавливаются,
+    поэтому процесс однопоточный и ни одна блокировка не удерживается
+    чужим потоком; данные, построенные до запуска (EmergencyData),
+    разделяются копированием при записи.
+
+    Апдейты передаются через неблокирующие unix-сокеты (asyncio
+    транспорт): зависший обработчик копит только свой буфер до
+    WORKER_BUFFER_LIMIT и не останавливает прием апдейтов для остальных.
+    """
+
+    def __init__(self, count: int, target, pinned_users=()):
+        self.count = count
+        self.target = target
+        self.pinned_users = frozenset(pinned_users)
+        self.pids = [None] * count
+        self.sockets = [None] * count
+        self.writers = [None] * count
+        self.watchers = [None] * count
+        self.dropped = [0] * count
+        self._context = multiprocessing.get_context("fork")
+        self._control = None
+        self._zygote = None
+        self._stopping = False
+
+    def start(self):
+        """Запуск процесса-заготовки и обработчиков (до event loop супервизора)"""
+        from utils.logger import setup_logging, stop_logging
+
+        # Поток QueueListener и поток сжатия могли бы держать блокировку обработчика,
+        # очереди или gzip в момент fork - заготовка и все обработчики зависли бы
+        # на первой записи в лог. Останавливаем их с дозаписью и запускаем снова.
+        stop_logging(timeout=None)
+        control, zygote_control = socket.socketpair()
+        self._zygote = self._context.Process(
+            target=self._zygote_main, args=(zygote_control, control), name="112help-zygote"
+        )
+        try:
+            self._zygote.start()
+        finally:
+            setup_logging()
+        zygote_control.close()
+        self._control = control
+        for index in range(self.count):
+            self.start_worker(index)
+
+    def _zygote_main(self, control, supervisor_control):
+        """Процесс-заготовка: создает обработчики по запросу супервизора"""
+        supervisor_control.close()
+        # Остановку обрабатывает супервизор: заготовка завершается по закрытию канала
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        while True:
+            # Сбор завершившихся обработчиков, чтобы не оставались зомби
+            multiprocessing.active_children()
+            ready, _, _ = select.select([control], [], [], WORKER_CHECK_INTERVAL)
+            if not ready:
+                continue
+            request = _recv_exact(control, _FRAME.size)
+            if len(request) < _FRAME.size:
+                break
+            index = _FRAME.unpack(request)[0]
+            worker_socket, supervisor_socket = socket.socketpair()
+            process = self._context.Process(
+                target=self._child_main, args=(index, worker_socket, supervisor_socket, control),
+                name=f"112help-worker-{index}"
+            )
+            process.start()
+            worker_socket.close()
+            socket.send_fds(control, [_FRAME.pack(process.pid)], [supervisor_socket.fileno()])
+            supervisor_socket.close()
+        # Обработчики получили конец потока и дорабатывают начатые апдейты
+        for process in multiprocessing.active_children():
+            process.join(15)
+            if process.is_alive():
+                process.kill()
+
+    def _child_main(self, index: int, worker_socket, supervisor_socket, control):
+        # Конец канала супервизора и управляющий канал заготовки обработчику не нужны:
+        # иначе он не получит конец потока при остановке супервизора
+        supervisor_socket.close()
+        control.close()
+        self.target(index, self.count, worker_socket)
+
+    def start_worker(self, index: int):
+        """Новый обработчик через процесс-заготовку: сохраняется его pid и сокет канала"""
+        self._control.sendall(_FRAME.pack(index))
+        message, fds, _, _ = socket.recv_fds(self._control, _FRAME.size, 1)
+        if len(message) < _FRAME.size or not fds:
+            raise OSError("процесс-заготовка обработчиков не отвечает")
+        self.pids[index] = _FRAME.unpack(message)[0]
+        self.sockets[index] = socket.socket(fileno=fds[0])
+        logger.info(f"Запущен обработчик {index} (pid {self.pids[index]})")
+
+    async def attach(self):
+        """Подключение каналов к event loop супервизора и отслеживание завершения обработчиков"""
+        for index in range(self.count):
+            await self._connect(index)
+
+    async def _connect(self, index: int):
+        reader, writer = await asyncio.open_unix_connection(sock=self.sockets[index])
+        self.writers[index] = writer
+        self.watchers[index] = asyncio.create_task(self._watch(index, reader))
+
+    async def _watch(self, index: int, reader):
+        # Обработчик ничего не пишет в канал: конец потока - он завершился
+        await reader.read()
+        if self._stopping:
+            return
+        logger.error(f"Обработчик {index} (pid {self.pids[index]}) завершился, перезапуск")
+        self.writers[index].close()
+        self.writers[index] = None
+        await asyncio.sleep(WORKER_CHECK_INTERVAL)
+        try:
+            self.start_worker(index)
+        except OSError as e:
+            logger.critical(f"Обработчик {index} не перезапущен: {e}")
+            return
+        await self._connect(index)
+
+    def dispatch(self, raw: bytes, user_id: int) -> bool:
+        """Передача сырого апдейта процессу, отвечающему за пользователя
+
+        Запись не блокирует event loop. False - апдейт не принят: обработчик
+        перезапускается или не успевает читать канал.
+        """
+        index = 0 if user_id in self.pinned_users else user_id % self.count
+        writer = self.writers[index]
+        if writer is None or writer.is_closing():
+            return self._drop(index, "недоступен")
+        if writer.transport.get_write_buffer_size() > WORKER_BUFFER_LIMIT:
+            return self._drop(index, "не успевает читать апдейты")
+        writer.write(_FRAME.pack(len(raw)) + raw)
+        return True
+
+    def _drop(self, index: int, reason: str) -> bool:
+        # Первый и каждый сотый отброшенный апдейт - чтобы зависший обработчик не забил лог
+        self.dropped[index] += 1
+        if self.dropped[index] % 100 == 1:
+            logger.error(f"Обработчик {index} {reason}, отброшено апдейтов: {self.dropped[index]}")
+        return False
+
+    def alive(self) -> int:
+        return sum(1 for writer in self.writers if writer is not None and not writer.is_closing())
+
+    def detach(self):
+        """Отключение каналов от event loop: перезапуски прекращаются"""
+        self._stopping = True
+        for watcher in self.watchers:
+            if watcher is not None:
+                watcher.cancel()
+        for writer in self.writers:
+            if writer is not None:
+                writer.close()
+
+    def stop(self, timeout: float = 15.0):
+        """Закрытие каналов: обработчики дорабатывают начатые апдейты и выходят"""
+        self._stopping = True
+        for sock in self.sockets:
+            if sock is not None:
+                sock.close()
+        if self._control is not None:
+            self._control.close()
+        if self._zygote is not None:
+            self._zygote.join(timeout + 5)
+            if self._zygote.is_alive():
+                self._zygote.kill()
+
+
+def run_worker(index: int, count: int, sock, dp, bot, start_services, stop_services):
+    """Точка входа процесса-обработчика (после fork из процесса-заготовки)"""
+    from utils.logger import restart_logging
+
+    # Сигналы остановки обрабатывает супервизор, обработчики завершаются по закрытию канала
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    # Соединения HTTP-сессии родителя не используются: сессия создастся заново
+    if getattr(bot.session, "_session", None) is not None:
+        bot.session._session = None
+    restart_logging(error_prefix=f"errors_w{index}")
+    asyncio.run(_worker_loop(index, count, sock, dp, bot, start_services, stop_services))
+
+
+async def _feed(dp, bot, update):
+    try:
+        await dp.feed_update(bot, update)
+    except Exception as e:
+        logger.error(f"Ошибка обработки апдейта {update.update_id}: {e}", exc_info=True)
+
+
+async def _worker_loop(index, count, sock, dp, bot, start_services, stop_services):
+    tasks = await start_services(worker_index=index, workers=count)
+    reader, writer = await asyncio.open_unix_connection(sock=sock)
+    pending = set()
+    try:
+        while True:
+            try:
+                size = _FRAME.unpack(await reader.readexactly(_FRAME.size))[0]
+                raw = await reader.readexactly(size)
+            except asyncio.IncompleteReadError:
+                # Супервизор закрыл канал - остановка
+                break
+            try:
+                update = Update.model_validate_json(raw, context={"bot": bot})
+            except ValueError as e:
+                logger.error(f"Ошибка чтения апдейта в обработчике {index}: {e}")
+                continue
+            task = asyncio.create_task(_feed(dp, bot, update))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        if pending:
+            await asyncio.wait(pending, timeout=10)
+    finally:
+        writer.close()
+        await stop_services(tasks)
+        await bot.session.close()
+
+
+async def _poll_updates(pool: WorkerPool, bot, allowed_updates):
+    """Long polling в супервизоре с передачей апдейтов обработчикам"""
+    await bot.delete_webhook()
+    offset = None
+    backoff = 1.0
+    while True:
+        try:
+            updates = await bot(
+                GetUpdates(offset=offset, timeout=POLLING_TIMEOUT, allowed_updates=allowed_updates),
+                request_timeout=POLLING_TIMEOUT + 10
+            )
+        except Exception as e:
+            logger.error(f"Ошибка получения апдейтов: {e}, повтор через {backoff:.0f}с")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30.0)
+            continue
+        backoff = 1.0
+        for update in updates:
+            offset = update.update_id + 1
+            data = update.model_dump(mode="json", exclude_none=True, by_alias=True)
+            pool.dispatch(json.dumps(data, ensure_ascii=False).encode("utf-8"), extract_user_id(data))
+
+
+async def _serve_webhook(pool: WorkerPool, bot, allowed_updates, host: str = WEBHOOK_HOST,
+                         port: int = WEBHOOK_PORT, url: str = WEBHOOK_URL, path: str = WEBHOOK_PATH,
+                         secret_token: str = WEBHOOK_SECRET):
+    """Вебхук в супервизоре: тело запроса без разбора моделей уходит обработчику"""
+    secret_token = webhook_secret(url, secret_token)
+
+    async def webhook_handler(request):
+        received = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+        if not hmac.compare_digest(received, secret_token):
+            return web.Response(status=401, text="Unauthorized")
+        raw = await request.read()
+        try:
+            data = json.loads(raw)
+        except ValueError:
+            return web.Response(status=400)
+        if not pool.dispatch(raw, extract_user_id(data)):
+            # Telegram повторит апдейт позже
+            return web.Response(status=503)
+        return web.json_response({})
+
+    async def health_handler(request):
+        alive = pool.alive()
+        return web.Response(status=200 if alive == pool.count else 503, text=f"{alive}/{pool.count}")
+
+    app = web.Application()
+    app.router.add_post(path, webhook_handler)
+    app.router.add_get("/healthz", health_handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Вебхук слушает http://{host}:{port}{path}, обработчиков: {pool.count}")
+    try:
+        if url:
+            await bot.set_webhook(url=url.rstrip("/") + path, secret_token=secret_token, allowed_updates=allowed_updates)
+        else:
+            logger.warning("WEBHOOK_URL не задан - вебхук в Telegram не регистрируется")
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+async def _supervise(pool: WorkerPool, dp, bot, mode: str, on_startup=None):
+    # SIGTERM (systemd) завершает супервизор так же, как Ctrl+C
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    await pool.attach()
+    try:
+        if on_startup is not None:
+            await on_startup()
+        allowed_updates = dp.resolve_used_update_types()
+        if mode == "webhook":
+            await _serve_webhook(pool, bot, allowed_updates)
+        else:
+            await _poll_updates(pool, bot, allowed_updates)
+    finally:
+        pool.detach()
+        await bot.session.close()
+
+
+def run_workers(dp, bot, count: int, start_services, stop_services, mode: str = "polling", on_startup=None,
+                pinned_users=()) -> bool:
+    """Запуск супервизора с count обработчиками
+
+    pinned_users - user_id, апдейты которых всегда обрабатывает обработчик 0.
+    Возвращает False, если fork недоступен (Windows) - тогда бот
+    запускается в одном процессе.
+    """
+    if not hasattr(os, "fork"):
+        logger.warning("WORKERS > 1 требует fork (Linux/macOS), запуск в одном процессе")
+        return False
+    target = functools.partial(
+        run_worker, dp=dp, bot=bot, start_services=start_services, stop_services=stop_services
+    )
+    pool = WorkerPool(count, target, pinned_users)
+    pool.start()
+    try:
+        asyncio.run(_supervise(pool, dp, bot, mode, on_startup))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        logger.info("Остановка обработчиков...")
+    finally:
+        pool.stop()
+    return True